@@ -1,6 +1,6 @@
 
 from django.contrib import admin
-from .models import Product, InventoryItem, Sale
+from .models import Product, InventoryItem, Sale, Order
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -16,3 +16,15 @@ class InventoryAdmin(admin.ModelAdmin):
 class SaleAdmin(admin.ModelAdmin):
     list_display = ("product", "date", "units_sold", "revenue")
     list_filter = ("date", "product")
+
+
+class SaleLineInline(admin.TabularInline):
+    model = Sale
+    fields = ("product", "units_sold", "revenue")
+    extra = 0
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ("id", "date", "created_at", "line_count", "total_units", "total_revenue")
+    list_filter = ("date",)
+    inlines = [SaleLineInline]
@@ -5,6 +5,17 @@ class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
     def ready(self):
+        # Keep rollup tables in sync with sale writes
+        from . import signals  # noqa: F401
+
+        # Optional background forecast precompute (FORECAST_PRECOMPUTE_INTERVAL)
+        try:
+            from .services.forecast_snapshots import start_scheduler
+            start_scheduler()
+        except Exception:
+            import logging
+            logging.getLogger(__name__).exception('Failed to start forecast precompute scheduler')
+
         # Ensure media directories exist on startup to avoid runtime write errors
         try:
             from django.conf import settings
@@ -2,6 +2,8 @@ from functools import wraps
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
 
+from .services import roles
+
 def group_required(*group_names):
     """
     Requires user to be in any of the specified groups.
@@ -9,17 +11,20 @@ def group_required(*group_names):
     Special rules:
     - Users in the `Owner` group bypass group checks and may access any
       view decorated with `@group_required(...)`.
+
+    Group names come from the role cache (services/roles.py), so a guarded
+    request normally costs only the roles token read, no membership query.
     """
     def decorator(view_func):
         @login_required
         @wraps(view_func)
         def _wrapped(request, *args, **kwargs):
-            user = request.user
+            names = roles.role_names(request.user)
             # Owner users may access everything protected by this decorator
-            if user.groups.filter(name='Owner').exists():
+            if roles.OWNER in names:
                 return view_func(request, *args, **kwargs)
             # Otherwise require membership in one of the allowed groups
-            if user.groups.filter(name__in=group_names).exists():
+            if not names.isdisjoint(group_names):
                 return view_func(request, *args, **kwargs)
             return HttpResponseForbidden("You do not have permission to access this resource.")
         return _wrapped
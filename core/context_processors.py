@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .services.roles import role_names
+
+
+def roles(request):
+    """Expose the requesting user's group names as `user_roles` (resolved on first use, cached)."""
+    return {'user_roles': SimpleLazyObject(lambda: role_names(getattr(request, 'user', None)))}
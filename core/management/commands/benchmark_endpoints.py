@@ -0,0 +1,261 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+from core.models import Product
+from core.services import metrics, synthetic
+
+# name -> (method, path, form data); create_sale builds a fresh cart per run
+ENDPOINTS = {
+    'dashboard': ('GET', '/', None),
+    'sales_dashboard': ('GET', '/sales-dashboard/', None),
+    'forecast_view': ('GET', '/forecast/', None),
+    'forecast_data_api': ('GET', '/forecast/api/', None),
+    'product_forecast_api': ('GET', '/product-forecast/api/?horizon=7&top=10', None),
+    'hourly_demand_api': ('GET', '/api/sales/hourly/', None),
+    'create_sale': ('POST', '/sales/api/create/', None),
+    'record_sales_period': ('POST', '/sales/period/', {'period': 'month', 'action': 'view'}),
+}
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not values:
+        return None
+    rank = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def _parse_scales(text):
+    scales = []
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        try:
+            products, sales = (int(x) for x in part.split(':'))
+        except ValueError:
+            raise CommandError(f'Invalid scale "{part}"; use PRODUCTS:SALES, e.g. 50:10000')
+        if products <= 0 or sales <= 0:
+            raise CommandError('Scales must be positive')
+        scales.append((products, sales))
+    if not scales:
+        raise CommandError('--scales is empty')
+    return scales
+
+
+class Command(BaseCommand):
+    help = ('Benchmark the hot endpoints on deterministic synthetic data in a throwaway test database '
+            'and write latency percentiles, query counts and peak memory to a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=str,
+            help='Comma-separated PRODUCTS:SALES dataset sizes, e.g. 50:10000,500:100000,5000:1000000',
+            default='50:10000'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Spread the synthetic sales over this many days',
+            default=365
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for the dataset and the checkout carts',
+            default=42
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            help='Warm runs per endpoint used for the percentiles',
+            default=20
+        )
+        parser.add_argument(
+            '--endpoints',
+            type=str,
+            help=f'Comma-separated subset of: {", ".join(ENDPOINTS)}',
+            default=','.join(ENDPOINTS)
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Path of the JSON report',
+            default='benchmark-results.json'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Earlier JSON report to print a comparison against',
+            default=None
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the test database between runs (it is flushed before each scale)'
+        )
+
+    def handle(self, *args, **options):
+        scales = _parse_scales(options['scales'])
+        names = [n.strip() for n in options['endpoints'].split(',') if n.strip()]
+        unknown = [n for n in names if n not in ENDPOINTS]
+        if unknown:
+            raise CommandError(f'Unknown endpoints: {", ".join(unknown)}')
+        if options['repeat'] <= 0 or options['days'] <= 0:
+            raise CommandError('--repeat and --days must be positive')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["compare"]}: {e}')
+
+        # Never touch the configured database: everything runs in a test database
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb']
+        )
+        try:
+            results = [self._run_scale(products, sales, names, options) for products, sales in scales]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'environment': self._environment(),
+            'options': {k: options[k] for k in ('days', 'seed', 'repeat')},
+            'scales': results,
+        }
+        with open(options['output'], 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        if baseline:
+            self._compare(baseline, report)
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote benchmark report to {options["output"]}'))
+
+    def _run_scale(self, products, sales, names, options):
+        from django.contrib.auth.models import Group, User
+        from django.core.cache import cache
+        from django.test import Client
+
+        label = f'{products}x{sales}'
+        self.stdout.write(self.style.SUCCESS(f'\n== {products} products / {sales} sales =='))
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        log = (lambda line: self.stdout.write(f'  {line}')) if options['verbosity'] > 1 else None
+        dataset = synthetic.generate(products=products, sales=sales, days=options['days'],
+                                     seed=options['seed'], log=log)
+        self.stdout.write(f'  seeded {dataset["orders"]} orders in {dataset["seconds"]:.1f}s')
+
+        user = User.objects.create_user('bench', 'bench@example.com', 'bench')
+        for group in ('Admin', 'Owner'):
+            user.groups.add(Group.objects.get_or_create(name=group)[0])
+        client = Client()
+        client.force_login(user)
+        product_ids = list(Product.objects.values_list('id', 'price'))
+        rng = random.Random(options['seed'])
+
+        def request(name):
+            method, path, data = ENDPOINTS[name]
+            if name == 'create_sale':
+                items = [{'id': pid, 'quantity': rng.randint(1, 3), 'price': str(price)}
+                         for pid, price in rng.sample(product_ids, min(3, len(product_ids)))]
+                return client.post(path, data=json.dumps({'items': items}), content_type='application/json')
+            if method == 'POST':
+                return client.post(path, data or {})
+            return client.get(path)
+
+        endpoints = {}
+        for name in names:
+            cache.clear()
+            # Queries are counted with an execute wrapper (the test client resets
+            # connection.queries at every request)
+            with metrics.measure() as cold:
+                started = time.perf_counter()
+                response = request(name)
+                cold_ms = (time.perf_counter() - started) * 1000
+            size = 0 if response.streaming else len(response.content)
+
+            timings = []
+            with metrics.measure() as warm:
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    request(name)
+                    timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+
+            # Separate run: tracing allocations slows the request down
+            tracemalloc.start()
+            try:
+                request(name)
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+            endpoints[name] = {
+                'status': response.status_code,
+                'bytes': size,
+                'cold_ms': round(cold_ms, 2),
+                'cold_queries': cold.queries,
+                'queries': round(warm.queries / options['repeat'], 1),
+                'db_ms': round(warm.db_seconds * 1000 / options['repeat'], 2),
+                'p50_ms': round(_percentile(timings, 50), 2),
+                'p90_ms': round(_percentile(timings, 90), 2),
+                'p99_ms': round(_percentile(timings, 99), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'max_ms': round(timings[-1], 2),
+                'peak_kib': round(peak / 1024, 1),
+            }
+            row = endpoints[name]
+            self.stdout.write(
+                f'  {name:<22} {row["status"]} p50 {row["p50_ms"]:9.2f} ms  p90 {row["p90_ms"]:9.2f} ms  '
+                f'cold {row["cold_ms"]:9.2f} ms  queries {row["queries"]:>6} (cold {row["cold_queries"]})  '
+                f'peak {row["peak_kib"]:.0f} KiB'
+            )
+        return {'label': label, 'dataset': dataset, 'endpoints': endpoints}
+
+    def _environment(self):
+        import django
+        try:
+            revision = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            revision = None
+        return {
+            'git_revision': revision,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'machine': platform.machine(),
+        }
+
+    def _compare(self, baseline, report):
+        before = {s['label']: s['endpoints'] for s in baseline.get('scales', [])}
+        self.stdout.write(self.style.SUCCESS(
+            f'\n== Compared with {baseline.get("environment", {}).get("git_revision") or "baseline"} (p50 ms, queries) =='
+        ))
+        for scale in report['scales']:
+            old = before.get(scale['label'])
+            if not old:
+                continue
+            self.stdout.write(f'  {scale["label"]}')
+            for name, row in scale['endpoints'].items():
+                if name not in old:
+                    continue
+                a, b = old[name]['p50_ms'], row['p50_ms']
+                change = f'{(b - a) / a * 100:+.0f}%' if a else 'n/a'
+                self.stdout.write(
+                    f'    {name:<22} {a:9.2f} -> {b:9.2f} ({change})  '
+                    f'queries {old[name]["queries"]} -> {row["queries"]}'
+                )
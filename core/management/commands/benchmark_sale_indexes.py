@@ -0,0 +1,180 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum, Count
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+import random
+import time
+
+from core.models import Product, Sale
+
+# Created by migration 0014 on PostgreSQL only
+COVERING_INDEX = 'sale_date_product_cov_idx'
+COVERING_INDEX_SQL = f'CREATE INDEX {COVERING_INDEX} ON core_sale (date, product_id) INCLUDE (units_sold, revenue)'
+
+
+class Command(BaseCommand):
+    help = 'Compare Sale query plans and timings with and without the Sale indexes on a synthetic table in a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            help='Number of synthetic sale rows to insert',
+            default=1_000_000
+        )
+        parser.add_argument(
+            '--products',
+            type=int,
+            help='Number of synthetic products',
+            default=50
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Spread the synthetic sales over this many days',
+            default=730
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            help='Runs per query; the best time is reported',
+            default=5
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per insert batch',
+            default=5000
+        )
+
+    def handle(self, *args, **options):
+        if options['rows'] <= 0 or options['products'] <= 0 or options['days'] <= 0:
+            raise CommandError('--rows, --products and --days must be positive')
+
+        # Never touch the configured database: the synthetic rows and the
+        # dropped indexes live in a test database that is destroyed afterwards
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        self.stdout.write(self.style.SUCCESS('\n✓ Benchmark finished; test database removed'))
+
+    def _benchmark(self, options):
+        today = timezone.localdate()
+        products = self._seed(options, today)
+        queries = self._queries(products[0].id, today)
+
+        self.stdout.write(self.style.SUCCESS('\n== Without Sale indexes =='))
+        self._drop_indexes()
+        self._analyze()
+        before = self._run(queries, options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS('\n== With Sale indexes =='))
+        self._create_indexes()
+        self._analyze()
+        after = self._run(queries, options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS('\n== Summary (best of %d, ms) ==' % options['repeat']))
+        for name, _ in queries:
+            b, a = before[name], after[name]
+            speedup = (b / a) if a else 0.0
+            self.stdout.write(f'  {name:<28} {b:10.2f} -> {a:10.2f}  ({speedup:.1f}x)')
+
+    def _seed(self, options, today):
+        rng = random.Random(42)
+        products = Product.objects.bulk_create([
+            Product(name=f'__bench_product_{i}', category='Benchmark', price=Decimal('10.00'))
+            for i in range(options['products'])
+        ])
+        if any(p.pk is None for p in products):
+            products = list(Product.objects.filter(category='Benchmark', name__startswith='__bench_product_'))
+
+        self.stdout.write(f"Inserting {options['rows']} synthetic sales...")
+        started = time.monotonic()
+        now = timezone.now()
+        batch = []
+        # bulk_create skips the Sale signals, so the rollup table is untouched
+        for _ in range(options['rows']):
+            units = rng.randint(1, 5)
+            offset = rng.randrange(options['days'])
+            batch.append(Sale(
+                product=products[rng.randrange(len(products))],
+                date=today - timedelta(days=offset),
+                timestamp=now - timedelta(days=offset, minutes=rng.randrange(1440)),
+                units_sold=units,
+                revenue=Decimal(units * 10),
+            ))
+            if len(batch) >= options['batch_size']:
+                Sale.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Sale.objects.bulk_create(batch)
+        self.stdout.write(f'  inserted in {time.monotonic() - started:.1f}s')
+        return products
+
+    def _queries(self, product_id, today):
+        month_ago = today - timedelta(days=30)
+        quarter_ago = today - timedelta(days=90)
+        return [
+            ('today_totals', Sale.objects.filter(date=today).values('date').annotate(
+                revenue=Sum('revenue'), orders=Count('id')).order_by()),
+            ('daily_revenue_90d', Sale.objects.filter(date__gte=quarter_ago, date__lte=today).values('date').annotate(
+                total=Sum('revenue')).order_by('date')),
+            ('product_series_90d', Sale.objects.filter(product_id=product_id, date__gte=quarter_ago).values('date').annotate(
+                units=Sum('units_sold')).order_by('date')),
+            ('product_day_rollup_30d', Sale.objects.filter(date__gte=month_ago).values('product_id', 'date').annotate(
+                units=Sum('units_sold'), revenue=Sum('revenue')).order_by()),
+            ('recent_orders', Sale.objects.order_by('-date', '-id').values('id', 'date', 'product_id')[:50]),
+            ('timestamp_last_24h', Sale.objects.filter(timestamp__gte=timezone.now() - timedelta(days=1)).values('id')),
+        ]
+
+    def _run(self, queries, repeat):
+        results = {}
+        for name, qs in queries:
+            self.stdout.write(f'\n-- {name}')
+            for line in qs.explain().splitlines():
+                self.stdout.write(f'   {line}')
+            best = None
+            for _ in range(max(1, repeat)):
+                started = time.perf_counter()
+                list(qs.all())
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = best
+            self.stdout.write(f'   best: {best:.2f} ms')
+        return results
+
+    def _model_indexes(self):
+        return list(Sale._meta.indexes)
+
+    def _drop_indexes(self):
+        # Statements are executed directly so the same code also works when
+        # the caller holds a transaction (the schema editor context cannot be
+        # entered inside an atomic block on SQLite).
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in self._model_indexes():
+                cursor.execute(editor.sql_delete_index % {
+                    'table': editor.quote_name(Sale._meta.db_table),
+                    'name': editor.quote_name(index.name),
+                })
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {COVERING_INDEX}')
+
+    def _create_indexes(self):
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for index in self._model_indexes():
+                cursor.execute(str(index.create_sql(Sale, editor)))
+            if connection.vendor == 'postgresql':
+                cursor.execute(COVERING_INDEX_SQL)
+
+    def _analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_sale' if connection.vendor == 'postgresql' else 'ANALYZE')
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+import time
+
+from core.models import Product
+from core.services.images import process_image
+
+
+class Command(BaseCommand):
+    help = 'Fingerprint product images and build their resized / WebP derivatives'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild derivatives even for images that are already processed'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        started = time.monotonic()
+        built = skipped = failed = 0
+        for product in products.iterator():
+            if options['force']:
+                product.image_hash = ''
+            try:
+                if process_image(product):
+                    built += 1
+                else:
+                    skipped += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'  {product.pk} {product.name}: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Built derivatives for {built} images in {time.monotonic() - started:.1f}s '
+            f'({skipped} unchanged, {failed} failed)'
+        ))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+
+from core.services.bulk_import import DEFAULT_CHUNK_SIZE, Checkpoint, SalesImporter, open_source
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load sales history from pizzaplace.csv or a JSON sales export, in resumable chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--csv',
+            type=str,
+            help='Path to the source file (.csv in pizzaplace format, or .json)',
+            default='pizzaplace.csv'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Records inserted per transaction',
+            default=DEFAULT_CHUNK_SIZE
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after this many records (default: all)',
+            default=None
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue from the last committed chunk of a previous run'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use bulk_create even on PostgreSQL instead of COPY'
+        )
+
+    def handle(self, *args, **options):
+        path = options['csv']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        checkpoint = Checkpoint(path)
+        skip = checkpoint.load() if options['resume'] else 0
+        if skip:
+            self.stdout.write(f'Resuming after {skip} records')
+
+        def progress(done, inserted, rate):
+            self.stdout.write(f'  {done} records processed, {inserted} sales inserted ({rate:,.0f} rows/sec)')
+
+        importer = SalesImporter(
+            chunk_size=options['chunk_size'], use_copy=not options['no_copy'], progress=progress,
+        )
+        stats = importer.run(open_source(path), skip=skip, limit=options['limit'], checkpoint=checkpoint)
+
+        method = 'COPY' if importer.use_copy else 'bulk_create'
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Imported {stats['inserted']} sales via {method} in {stats['seconds']:.1f}s "
+            f"({stats['rows_per_sec']:,.0f} rows/sec)"
+        ))
+        if stats['products_created']:
+            self.stdout.write(self.style.SUCCESS(f"✓ Created {stats['products_created']} products"))
+        if stats['skipped']:
+            self.stdout.write(self.style.WARNING(f"Skipped {stats['skipped']} records with unknown products"))
+        if options['limit'] is None:
+            checkpoint.clear()
+        else:
+            self.stdout.write(f"Checkpoint at record {stats['position']}; rerun with --resume to continue")
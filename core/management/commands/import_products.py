@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from core.models import Product, Sale
+from django.db.models import Count
 from core.services.csv_forecasting import load_csv_data
 import os
 
@@ -141,8 +142,7 @@ class Command(BaseCommand):
         self.stdout.write(f'  Total Sales Records: {Sale.objects.count()}')
         
         # Show products by category
-        categories = Product.objects.values_list('category', flat=True).distinct()
+        counts = Product.objects.values('category').annotate(n=Count('id')).order_by('category')
         self.stdout.write(f'\n  Products by Category:')
-        for category in sorted(categories):
-            count = Product.objects.filter(category=category).count()
-            self.stdout.write(f'    - {category}: {count} products')
+        for row in counts:
+            self.stdout.write(f"    - {row['category']}: {row['n']} products")
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from core.models import Product, Sale
+from core.services import rollups
 from core.services.csv_forecasting import load_csv_data
 from django.utils import timezone
 import os
@@ -72,40 +73,42 @@ class Command(BaseCommand):
         skipped_count = 0
         
         # Get or create products and add sales
-        for product_name, sales_data in product_sales.items():
-            if imported_count >= limit:
-                break
-            
-            # Get or create product
-            product, created = Product.objects.get_or_create(
-                name=product_name,
-                defaults={
-                    'category': 'Pizza',
-                    'price': sales_data[0]['price'],
-                    'is_active': True
-                }
-            )
-            
-            # Add sales for this product (up to limit)
-            for sale_info in sales_data:
+        # Refresh the daily rollup once for all imported rows
+        with rollups.deferred():
+            for product_name, sales_data in product_sales.items():
                 if imported_count >= limit:
                     break
+            
+                # Get or create product
+                product, created = Product.objects.get_or_create(
+                    name=product_name,
+                    defaults={
+                        'category': 'Pizza',
+                        'price': sales_data[0]['price'],
+                        'is_active': True
+                    }
+                )
+            
+                # Add sales for this product (up to limit)
+                for sale_info in sales_data:
+                    if imported_count >= limit:
+                        break
                 
-                # Count how many times this product was sold in same transaction
-                # For simplicity, each row = 1 unit sold
-                try:
-                    sale = Sale.objects.create(
-                        product=product,
-                        date=sale_info['date'],
-                        units_sold=1,
-                        revenue=sale_info['price']
-                    )
-                    imported_count += 1
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.WARNING(f'Error creating sale for {product_name}: {e}')
-                    )
-                    skipped_count += 1
+                    # Count how many times this product was sold in same transaction
+                    # For simplicity, each row = 1 unit sold
+                    try:
+                        sale = Sale.objects.create(
+                            product=product,
+                            date=sale_info['date'],
+                            units_sold=1,
+                            revenue=sale_info['price']
+                        )
+                        imported_count += 1
+                    except Exception as e:
+                        self.stdout.write(
+                            self.style.WARNING(f'Error creating sale for {product_name}: {e}')
+                        )
+                        skipped_count += 1
         
         # Display results
         self.stdout.write(
@@ -11,6 +11,7 @@ from datetime import timedelta
 from decimal import Decimal
 
 from core.models import Sale, Product
+from core.services import rollups
 
 
 class Command(BaseCommand):
@@ -30,34 +31,36 @@ class Command(BaseCommand):
         created = 0
         skipped = 0
         
-        for sale_data in sales_data:
-            try:
-                product = Product.objects.get(name=sale_data['product_name'])
+        # Refresh the daily rollup once for all imported rows
+        with rollups.deferred():
+            for sale_data in sales_data:
+                try:
+                    product = Product.objects.get(name=sale_data['product_name'])
                 
-                # Check if this sale already exists to avoid duplicates
-                date = sale_data['date']
-                existing = Sale.objects.filter(
-                    product=product,
-                    date=date,
-                    units_sold=sale_data['units_sold']
-                ).exists()
-                
-                if not existing:
-                    Sale.objects.create(
+                    # Check if this sale already exists to avoid duplicates
+                    date = sale_data['date']
+                    existing = Sale.objects.filter(
                         product=product,
                         date=date,
-                        timestamp=timezone.now(),
-                        units_sold=sale_data['units_sold'],
-                        revenue=Decimal(sale_data['revenue'])
-                    )
-                    created += 1
-                else:
+                        units_sold=sale_data['units_sold']
+                    ).exists()
+                
+                    if not existing:
+                        Sale.objects.create(
+                            product=product,
+                            date=date,
+                            timestamp=timezone.now(),
+                            units_sold=sale_data['units_sold'],
+                            revenue=Decimal(sale_data['revenue'])
+                        )
+                        created += 1
+                    else:
+                        skipped += 1
+                except Product.DoesNotExist:
+                    self.stdout.write(self.style.WARNING(f"Product not found: {sale_data['product_name']}"))
+                    skipped += 1
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error importing sale: {e}"))
                     skipped += 1
-            except Product.DoesNotExist:
-                self.stdout.write(self.style.WARNING(f"Product not found: {sale_data['product_name']}"))
-                skipped += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error importing sale: {e}"))
-                skipped += 1
         
         self.stdout.write(self.style.SUCCESS(f'✓ Imported {created} sales, skipped {skipped}'))
@@ -0,0 +1,54 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+import time
+
+from core.services import startup
+
+
+class Command(BaseCommand):
+    help = 'One-time deploy setup (migrate, cache table, static files, admin user, warm data); skips work that is already done'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run every step even if the stored fingerprints match'
+        )
+        parser.add_argument(
+            '--skip-forecasts',
+            action='store_true',
+            help='Do not precompute forecast snapshots'
+        )
+        parser.add_argument(
+            '--skip-images',
+            action='store_true',
+            help='Do not build missing product image derivatives'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        log = lambda line: self.stdout.write(f'  {line}')
+        ran = startup.prestart(force=options['force'], log=log)
+
+        if not options['skip_images']:
+            if options['force'] or startup.images_pending():
+                call_command('build_image_derivatives', verbosity=0)
+                ran.append('images')
+            else:
+                log('image derivatives up to date')
+
+        if not options['skip_forecasts']:
+            if options['force'] or not startup.forecasts_fresh():
+                try:
+                    call_command('precompute_forecasts', verbosity=0)
+                    ran.append('forecasts')
+                except Exception as e:
+                    # Forecasts are computed on demand when no snapshot exists
+                    self.stderr.write(f'  forecast precompute failed: {e}')
+            else:
+                log('forecast snapshots fresh')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Prestart finished in {time.monotonic() - started:.1f}s '
+            f'(ran: {", ".join(ran) or "nothing"})'
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from datetime import date
+import time
+
+from core.models import DailyProductSales
+from core.services.rollups import rebuild_daily_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the DailyProductSales rollup table from raw Sale rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start',
+            type=str,
+            help='Only rebuild dates on or after this day (YYYY-MM-DD)',
+            default=None
+        )
+        parser.add_argument(
+            '--end',
+            type=str,
+            help='Only rebuild dates on or before this day (YYYY-MM-DD)',
+            default=None
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows per insert batch',
+            default=2000
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        label = f"{start or 'beginning'} -> {end or 'today'}"
+        self.stdout.write(f'Rebuilding daily sales rollups ({label})...')
+        started = time.monotonic()
+        with transaction.atomic():
+            written = rebuild_daily_rollups(start=start, end=end, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {written} rollup rows in {elapsed:.2f}s'))
+        self.stdout.write(f'  Total rollup rows: {DailyProductSales.objects.count()}')
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from core.services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record latency, DB queries/time, template time and response size per route.
+
+    Numbers are aggregated by core.services.metrics and served at /metrics.
+    Routes are labelled with their URL pattern (e.g. ``products/<int:pk>/edit/``)
+    so the number of series stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = metrics.enabled()
+        if self.enabled:
+            metrics.instrument_templates()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with metrics.measure() as sample:
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        try:
+            match = getattr(request, 'resolver_match', None)
+            route = (match.route or match.view_name) if match else '<unmatched>'
+            size = None if response.streaming else len(response.content)
+            metrics.collector.record(route, request.method, response.status_code, elapsed, sample, size)
+        except Exception:
+            # Metrics must never break the response
+            logger.exception('Failed to record request metrics')
+        return response
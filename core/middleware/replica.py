@@ -0,0 +1,24 @@
+from core.services import replica
+
+
+class AnalyticsPinMiddleware:
+    """Track database writes per request for the analytics replica router.
+
+    Requests from a client that wrote recently stay on the primary, and a
+    response to a request that wrote sets the pin cookie, so cashiers see
+    their own sales on the dashboards (see core.services.replica). Does
+    nothing unless a replica is configured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica.configured():
+            return self.get_response(request)
+
+        with replica.request_scope(replica.is_pinned(request)) as scope:
+            response = self.get_response(request)
+        if scope.pin:
+            replica.pin(response)
+        return response
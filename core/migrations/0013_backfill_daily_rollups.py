@@ -0,0 +1,54 @@
+# Data migration to backfill DailyProductSales from existing Sale rows
+
+from django.db import migrations
+from django.db.models import Sum, Count, Case, When, Value, IntegerField
+
+# Mirrors core.services.forecasting.MAX_UNITS_PER_SALE at the time of writing
+MAX_UNITS_PER_SALE = 100
+
+
+def backfill_rollups(apps, schema_editor):
+    """Aggregate all sales per (product, date) into the rollup table"""
+    Sale = apps.get_model('core', 'Sale')
+    DailyProductSales = apps.get_model('core', 'DailyProductSales')
+    rows = (
+        Sale.objects.values('product_id', 'date')
+        .annotate(
+            units=Sum('units_sold'),
+            capped=Sum(Case(
+                When(units_sold__gt=MAX_UNITS_PER_SALE, then=Value(MAX_UNITS_PER_SALE)),
+                default='units_sold',
+                output_field=IntegerField()
+            )),
+            revenue=Sum('revenue'),
+            lines=Count('id'),
+        )
+        .order_by()
+    )
+    batch = []
+    for r in rows.iterator(chunk_size=2000):
+        batch.append(DailyProductSales(
+            product_id=r['product_id'], date=r['date'], units=r['units'] or 0,
+            capped_units=r['capped'] or 0, revenue=r['revenue'] or 0, order_count=r['lines'] or 0,
+        ))
+        if len(batch) >= 2000:
+            DailyProductSales.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        DailyProductSales.objects.bulk_create(batch)
+
+
+def clear_rollups(apps, schema_editor):
+    """Reverse - empty the rollup table"""
+    apps.get_model('core', 'DailyProductSales').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_dailyproductsales'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, clear_rollups),
+    ]
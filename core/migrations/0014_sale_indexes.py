@@ -0,0 +1,46 @@
+# Generated migration adding indexes for the Sale access patterns
+
+from django.db import migrations, models
+
+
+# Covering index so date-range aggregates grouped by product can be answered
+# from the index alone. INCLUDE columns are PostgreSQL-only, so other
+# backends rely on the regular indexes above it.
+COVERING_INDEX = 'sale_date_product_cov_idx'
+
+
+def create_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {COVERING_INDEX} ON core_sale (date, product_id) INCLUDE (units_sold, revenue)'
+    )
+
+
+def drop_covering_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {COVERING_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_backfill_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['product', 'date'], name='sale_product_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-date', '-id'], name='sale_date_id_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['timestamp'], name='sale_timestamp_idx'),
+        ),
+        migrations.RunPython(create_covering_index, drop_covering_index),
+    ]
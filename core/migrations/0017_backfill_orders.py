@@ -0,0 +1,50 @@
+# Data migration to give every existing Sale its own Order header
+#
+# Baskets were never recorded before Order existed, so each legacy sale line
+# becomes a single-line order. This keeps order counts equal to the old
+# "one sale = one order" figures.
+
+from django.db import migrations
+from django.utils import timezone
+
+BATCH_SIZE = 2000
+
+
+def backfill_orders(apps, schema_editor):
+    Sale = apps.get_model('core', 'Sale')
+    Order = apps.get_model('core', 'Order')
+    while True:
+        sales = list(Sale.objects.filter(order__isnull=True).order_by('id')[:BATCH_SIZE])
+        if not sales:
+            break
+        orders = [
+            Order(date=s.date, created_at=s.timestamp or timezone.now(), total_revenue=s.revenue,
+                  total_units=s.units_sold, line_count=1)
+            for s in sales
+        ]
+        if schema_editor.connection.features.can_return_rows_from_bulk_insert:
+            orders = Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+        for sale, order in zip(sales, orders):
+            sale.order_id = order.pk
+        Sale.objects.bulk_update(sales, ['order'])
+
+
+def clear_orders(apps, schema_editor):
+    Sale = apps.get_model('core', 'Sale')
+    Order = apps.get_model('core', 'Order')
+    Sale.objects.update(order=None)
+    Order.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_order'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_orders, clear_orders),
+    ]
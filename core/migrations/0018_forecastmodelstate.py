@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_backfill_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastModelState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('method', models.CharField(max_length=10)),
+                ('params', models.JSONField(default=dict)),
+                ('level', models.FloatField(default=0.0)),
+                ('trend', models.FloatField(default=0.0)),
+                ('residual_var', models.FloatField(default=0.0)),
+                ('observations', models.IntegerField(default=0)),
+                ('window', models.JSONField(default=list)),
+                ('window_size', models.IntegerField(default=0)),
+                ('last_label', models.CharField(max_length=20)),
+                ('last_date', models.DateField()),
+                ('steps_since_fit', models.IntegerField(default=0)),
+                ('stale', models.BooleanField(default=False)),
+                ('diagnostics', models.JSONField(blank=True, default=dict)),
+                ('fitted_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_date'], name='forecast_state_last_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 22:59
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_forecastmodelstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('store', 'Store'), ('category', 'Category'), ('product', 'Product')], max_length=10)),
+                ('key', models.CharField(blank=True, default='', max_length=100)),
+                ('horizon', models.PositiveIntegerField(default=0)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-generated_at'],
+                'indexes': [models.Index(fields=['scope', 'key', 'horizon', '-generated_at'], name='forecast_snapshot_lookup_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Data migration to backfill HourlyProductDemand from existing Sale rows
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+
+def backfill_hourly_demand(apps, schema_editor):
+    """Aggregate all sales per (product, local weekday, hour) into the cube.
+
+    Mirrors core.services.intraday.rebuild_hourly_demand at the time of
+    writing; without it the cube starts empty and later edits or deletes of
+    older sales would subtract from cells that never counted them.
+    """
+    Sale = apps.get_model('core', 'Sale')
+    HourlyProductDemand = apps.get_model('core', 'HourlyProductDemand')
+    tz = timezone.get_current_timezone()
+    rows = (
+        Sale.objects.annotate(
+            iso_weekday=ExtractIsoWeekDay('timestamp', tzinfo=tz),
+            hour_of_day=ExtractHour('timestamp', tzinfo=tz),
+        )
+        .values('product_id', 'iso_weekday', 'hour_of_day')
+        .annotate(units=Sum('units_sold'), revenue=Sum('revenue'), lines=Count('id'))
+        .order_by()
+    )
+    batch = []
+    for r in rows.iterator(chunk_size=2000):
+        batch.append(HourlyProductDemand(
+            product_id=r['product_id'], weekday=r['iso_weekday'] - 1, hour=r['hour_of_day'],
+            units=r['units'] or 0, revenue=r['revenue'] or 0, line_count=r['lines'] or 0,
+        ))
+        if len(batch) >= 2000:
+            HourlyProductDemand.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        HourlyProductDemand.objects.bulk_create(batch)
+
+
+def clear_hourly_demand(apps, schema_editor):
+    """Reverse - empty the cube"""
+    apps.get_model('core', 'HourlyProductDemand').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_hourlyproductdemand'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hourly_demand, clear_hourly_demand),
+    ]
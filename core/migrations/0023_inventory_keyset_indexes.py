@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-17 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_backfill_hourly_demand'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['quantity', 'id'], name='inventory_quantity_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['-updated_at', '-id'], name='inventory_updated_desc_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 # core/models.py
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -17,6 +18,9 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     is_active = models.BooleanField(default=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Content hash of `image` and the resized copies built from it (services/images.py)
+    image_hash = models.CharField(max_length=64, blank=True, default='')
+    image_derivatives = models.JSONField(default=dict, blank=True)
     size = models.CharField(max_length=20, choices=SIZE_CHOICES, blank=True, null=True, help_text="Leave blank if product doesn't have sizes")
     
     # Size-specific prices (only used if size is set)
@@ -30,6 +34,12 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+    @property
+    def thumbnail_url(self):
+        """Content-hashed URL of the grid thumbnail, or None without an image."""
+        from .services.images import image_url
+        return image_url(self, 'thumb')
     
     def get_price_for_size(self, size):
         """Return the price for a given size, or fallback to base price"""
@@ -63,14 +73,46 @@ class InventoryItem(models.Model):
     ])
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pages of the inventory list (views.INVENTORY_SORTS); sku is unique
+            models.Index(fields=["quantity", "id"], name="inventory_quantity_id_idx"),
+            models.Index(fields=["-updated_at", "-id"], name="inventory_updated_desc_idx"),
+        ]
+
     def is_low_stock(self):
         return self.quantity <= self.reorder_point
 
     def __str__(self):
         return f"{self.sku} - {self.product.name}"
 
+class Order(models.Model):
+    """Header row for one checkout; its Sale rows are the line items.
+
+    Totals are stored so order counts, revenue and average order value can be
+    read without grouping sale lines.
+    """
+    date = models.DateField(default=timezone.localdate)
+    created_at = models.DateTimeField(default=timezone.now)
+    total_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_units = models.PositiveIntegerField(default=0)
+    line_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["date"], name="order_date_idx"),
+            models.Index(fields=["-created_at", "-id"], name="order_created_desc_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.pk} - {self.date} - {self.total_revenue}"
+
+
 class Sale(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales")
+    # Legacy and imported rows may have no order
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True, related_name="lines")
     date = models.DateField(default=timezone.now)
     timestamp = models.DateTimeField(default=timezone.now)
     units_sold = models.PositiveIntegerField()
@@ -78,6 +120,150 @@ class Sale(models.Model):
 
     class Meta:
         ordering = ["-date"]
+        indexes = [
+            # Per-product series and rollup refreshes filter on both columns
+            models.Index(fields=["product", "date"], name="sale_product_date_idx"),
+            # Date ranges / date=today lookups and "newest first" listings
+            models.Index(fields=["-date", "-id"], name="sale_date_id_desc_idx"),
+            models.Index(fields=["timestamp"], name="sale_timestamp_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.date} - {self.units_sold}"
+
+
+class DailyProductSales(models.Model):
+    """Per-product, per-day rollup of Sale rows.
+
+    Kept current on every Sale write (see core.signals / core.services.rollups)
+    so dashboards and forecasts read at most products x days rows instead of
+    scanning every sale line. Rebuild with `manage.py rebuild_rollups`.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="daily_sales")
+    date = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    # units with each sale line capped at MAX_UNITS_PER_SALE (forecasting input)
+    capped_units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # number of Sale lines that day
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "date"], name="uniq_daily_product_sales"),
+        ]
+        indexes = [
+            models.Index(fields=["date"], name="dailysales_date_idx"),
+        ]
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.date} - {self.units}"
+
+
+class HourlyProductDemand(models.Model):
+    """Per-product sales by local weekday and hour of Sale.timestamp, over all history.
+
+    At most products x 7 x 24 rows, updated with deltas on every Sale write
+    (see core.services.intraday) so intraday heatmaps and hourly forecasts
+    never scan raw timestamps. Rebuild with `manage.py rebuild_hourly_demand`
+    (also needed after changing TIME_ZONE).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="hourly_demand")
+    # 0 = Monday ... 6 = Sunday, like date.weekday()
+    weekday = models.PositiveSmallIntegerField()
+    hour = models.PositiveSmallIntegerField()
+    # Plain integers: a delta applied out of order must not violate a CHECK constraint
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    line_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "weekday", "hour"], name="uniq_hourly_product_demand"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} - {self.weekday}@{self.hour:02d} - {self.units}"
+
+
+class DataVersion(models.Model):
+    """Opaque token that changes whenever a family of data is written.
+
+    Caches include the token in their keys, so bumping it invalidates every
+    entry derived from that data without having to enumerate the keys.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    token = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.key}={self.token}"
+
+
+class ForecastModelState(models.Model):
+    """Fitted forecasting state for one series, advanced one period at a time.
+
+    Method selection runs once per refit; afterwards each newly closed period
+    only updates the Holt level/trend and the trailing window, so producing a
+    forecast no longer replays the whole history or the parameter grid.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    method = models.CharField(max_length=10)
+    params = models.JSONField(default=dict)
+    level = models.FloatField(default=0.0)
+    trend = models.FloatField(default=0.0)
+    # Mean squared one-step residual of the Holt fit
+    residual_var = models.FloatField(default=0.0)
+    observations = models.IntegerField(default=0)
+    # Trailing closed values used by the linear / moving-average methods
+    window = models.JSONField(default=list)
+    window_size = models.IntegerField(default=0)
+    last_label = models.CharField(max_length=20)
+    last_date = models.DateField()
+    steps_since_fit = models.IntegerField(default=0)
+    stale = models.BooleanField(default=False)
+    diagnostics = models.JSONField(default=dict, blank=True)
+    fitted_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_date'], name='forecast_state_last_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.method} through {self.last_label})"
+
+
+class ForecastSnapshot(models.Model):
+    """A forecast payload computed ahead of time by `precompute_forecasts`.
+
+    Views serve the newest snapshot for a (scope, key, horizon) while it is
+    younger than FORECAST_SNAPSHOT_MAX_AGE and compute on demand otherwise.
+    """
+    SCOPE_STORE = 'store'
+    SCOPE_CATEGORY = 'category'
+    SCOPE_PRODUCT = 'product'
+    SCOPE_CHOICES = [
+        (SCOPE_STORE, 'Store'),
+        (SCOPE_CATEGORY, 'Category'),
+        (SCOPE_PRODUCT, 'Product'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    # Payload name for store scope, category name or product id otherwise
+    key = models.CharField(max_length=100, blank=True, default='')
+    horizon = models.PositiveIntegerField(default=0)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    generated_at = models.DateTimeField(default=timezone.now)
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-generated_at"]
+        indexes = [
+            models.Index(fields=['scope', 'key', 'horizon', '-generated_at'], name='forecast_snapshot_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key or '-'} h{self.horizon} @ {self.generated_at:%Y-%m-%d %H:%M}"
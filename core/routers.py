@@ -0,0 +1,36 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .services import replica
+
+
+class AnalyticsRouter:
+    """Route analytics reads to the read replica and everything else to the primary.
+
+    Whether a read may use the replica is decided by core.services.replica;
+    without a replica configured every method defers to Django's defaults.
+    """
+
+    def db_for_read(self, model, **hints):
+        return replica.db_for_read()
+
+    def db_for_write(self, model, **hints):
+        if not replica.configured():
+            return None
+        replica.note_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        name = replica.alias()
+        if name is None:
+            return None
+        same_data = {DEFAULT_DB_ALIAS, name}
+        if obj1._state.db in same_data and obj2._state.db in same_data:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive their schema from the primary
+        if db == replica.alias():
+            return False
+        return None
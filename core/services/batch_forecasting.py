@@ -0,0 +1,176 @@
+"""Batched per-product forecasting.
+
+`product_forecast_summary` works on one product at a time, which makes
+`product_forecast_api` issue several queries per product. The helpers here
+fetch every product's daily unit series for the lookback window with a single
+(product_id, date) query against the rollup table, lay it out as a dense products x days
+matrix and derive horizons, window sums and growth rates for all products at
+once. The figures match `product_forecast_summary` and the per-product window
+queries the API used before.
+"""
+from datetime import timedelta
+import logging
+
+from ..models import DailyProductSales, InventoryItem
+
+logger = logging.getLogger(__name__)
+
+# The API needs last-7 / last-30 windows plus the 30 days before those, so the
+# matrix must cover at least 60 days even when a shorter lookback is requested.
+MIN_WINDOW_DAYS = 60
+
+# Above this many products the id list is not sent to the database (SQLite caps
+# the number of bound parameters); rows for other products are skipped instead.
+MAX_ID_FILTER = 500
+
+
+def _accuracy_label(confidence):
+    if confidence >= 70:
+        return 'High'
+    if confidence >= 40:
+        return 'Medium'
+    return 'Low'
+
+
+def product_daily_matrix(product_ids, lookback_days=180, today=None):
+    """Return (days, capped, raw) for `product_ids` over the lookback window.
+
+    `days` is the list of dates (oldest -> newest, ending today). `capped` and
+    `raw` are numpy arrays of shape (len(product_ids), len(days)) holding the
+    per-day units with and without the MAX_UNITS_PER_SALE per-sale cap. Rows
+    follow the order of `product_ids`. All products are read from the
+    DailyProductSales rollup with a single query.
+    """
+    import numpy as np
+    from django.utils import timezone
+
+    if today is None:
+        try:
+            today = timezone.localdate()
+        except Exception:
+            today = timezone.now().date()
+    span = max(int(lookback_days), MIN_WINDOW_DAYS)
+    start = today - timedelta(days=span - 1)
+    days = [start + timedelta(days=i) for i in range(span)]
+
+    index = {pid: i for i, pid in enumerate(product_ids)}
+    day_index = {d: j for j, d in enumerate(days)}
+    capped = np.zeros((len(index), span), dtype=float)
+    raw = np.zeros((len(index), span), dtype=float)
+    if not index:
+        return days, capped, raw
+
+    qs = DailyProductSales.objects.filter(date__gte=start, date__lte=today)
+    if len(index) <= MAX_ID_FILTER:
+        qs = qs.filter(product_id__in=list(index))
+    for pid, d, units, capped_units in qs.order_by().values_list('product_id', 'date', 'units', 'capped_units'):
+        i = index.get(pid)
+        j = day_index.get(d)
+        if i is None or j is None:
+            continue
+        capped[i, j] += float(capped_units or 0)
+        raw[i, j] += float(units or 0)
+    return days, capped, raw
+
+
+def batch_product_forecasts(products, lookback_days=180, today=None):
+    """Compute forecast summaries for many products with a constant number of queries.
+
+    `products` is a list of Product instances (already filtered by the caller).
+    Returns dict product_id -> {
+        'horizons': {'h_1': {...}, 'h_7': {...}, 'h_30': {...}},
+        'avg', 'trend', 'last_7_days', 'past_30_days', 'prev_7_days', 'prev_30_days',
+        'in_stock'
+    }
+    Horizon figures follow `product_forecast_summary` (capped series over
+    `lookback_days`); window sums use raw units like the old per-product queries.
+    """
+    products = list(products)
+    if not products:
+        return {}
+
+    import numpy as np
+
+    ids = [p.id for p in products]
+    days, capped, raw = product_daily_matrix(ids, lookback_days=lookback_days, today=today)
+    index = {pid: i for i, pid in enumerate(ids)}
+
+    # Series used for the horizons: the trailing `lookback_days` columns
+    lookback = min(int(lookback_days), len(days))
+    series = capped[:, -lookback:]
+
+    last_7 = series[:, -7:]
+    avg_7 = last_7.mean(axis=1)
+    if lookback >= 14:
+        prev_avg = series[:, -14:-7].mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend_factor = np.where(prev_avg > 0, avg_7 / np.where(prev_avg > 0, prev_avg, 1.0), 1.0)
+    else:
+        trend_factor = np.ones(len(ids))
+
+    forecast_1d = np.round(avg_7).astype(int)
+    forecast_7d = np.trunc(last_7.sum(axis=1) * trend_factor).astype(int)
+    forecast_30d = np.round(avg_7 * 30 * trend_factor).astype(int)
+
+    if lookback < 7:
+        confidence_7d = np.full(len(ids), 20)
+    elif lookback < 30:
+        confidence_7d = np.full(len(ids), 40)
+    else:
+        std_7 = np.sqrt(((last_7 - avg_7[:, None]) ** 2).mean(axis=1))
+        cv = np.where(avg_7 > 0, std_7 / (avg_7 + 1e-9), 1.0)
+        confidence_7d = np.clip(np.trunc(100 * (1 - np.minimum(cv, 1.0))), 60, 95).astype(int)
+    confidence_30d = np.maximum(50, confidence_7d - 10)
+
+    avg_all = series.mean(axis=1)
+    first, last = series[:, 0], series[:, -1]
+
+    # Raw-unit window sums (inclusive of today) and the windows right before them
+    raw_last_7 = raw[:, -7:].sum(axis=1)
+    raw_prev_7 = raw[:, -14:-7].sum(axis=1)
+    raw_last_30 = raw[:, -30:].sum(axis=1)
+    raw_prev_30 = raw[:, -60:-30].sum(axis=1)
+
+    stock_qs = InventoryItem.objects.filter(quantity__gt=0)
+    if len(ids) <= MAX_ID_FILTER:
+        stock_qs = stock_qs.filter(product_id__in=ids)
+    in_stock_ids = set(stock_qs.values_list('product_id', flat=True).distinct())
+
+    results = {}
+    for pid, i in index.items():
+        c7 = int(confidence_7d[i])
+        c30 = int(confidence_30d[i])
+        f1 = int(forecast_1d[i])
+        f7 = int(forecast_7d[i])
+        f30 = int(forecast_30d[i])
+        if last[i] > first[i] * 1.1:
+            trend = 'increasing'
+        elif last[i] < first[i] * 0.9:
+            trend = 'decreasing'
+        else:
+            trend = 'stable'
+        results[pid] = {
+            'horizons': {
+                'h_1': {'forecast': f1, 'upper': int(f1 * 1.3), 'lower': max(0, int(f1 * 0.7)),
+                        'confidence': c7, 'accuracy': _accuracy_label(c7)},
+                'h_7': {'forecast': f7, 'upper': int(f7 * 1.3), 'lower': max(0, int(f7 * 0.7)),
+                        'confidence': c7, 'accuracy': _accuracy_label(c7)},
+                'h_30': {'forecast': f30, 'upper': int(f30 * 1.5), 'lower': max(0, int(f30 * 0.5)),
+                         'confidence': c30, 'accuracy': _accuracy_label(c30)},
+            },
+            'avg': float(avg_all[i]),
+            'trend': trend,
+            'last_7_days': int(raw_last_7[i]),
+            'past_30_days': int(raw_last_30[i]),
+            'prev_7_days': int(raw_prev_7[i]),
+            'prev_30_days': int(raw_prev_30[i]),
+            'in_stock': pid in in_stock_ids,
+        }
+    return results
+
+
+def growth_rate(current, previous):
+    """Percent change used by the product forecast API (0.0 when there is no baseline)."""
+    if previous > 0:
+        return round((current - previous) / float(previous) * 100.0, 1)
+    return 0.0
@@ -0,0 +1,245 @@
+"""Chunked bulk importer for sales history.
+
+Sources (the pizzaplace CSV, JSON sales exports) are read as a stream of
+normalized records and processed in chunks. Each chunk:
+
+* resolves product names through an in-memory name -> id map, creating all
+  missing products with one bulk insert,
+* inserts its sale rows with PostgreSQL COPY when available, otherwise
+  `bulk_create`,
+* refreshes the daily rollup cells it touched and adds its rows to the
+  hourly demand cube,
+
+all inside one transaction. After every committed chunk the number of records
+done is written to a checkpoint file, so an interrupted import can resume
+where it stopped.
+"""
+import csv
+from datetime import datetime, date, time as dt_time
+from decimal import Decimal
+import io
+from itertools import islice
+import json
+import logging
+import os
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Product, Sale
+from . import intraday, rollups, versioning
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def read_pizzaplace_csv(path):
+    """Yield one record per pizzaplace.csv line (each line is one pizza sold)."""
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        for row in csv.DictReader(fh):
+            day = date.fromisoformat(row['date'])
+            try:
+                clock = dt_time.fromisoformat(row['time']) if row.get('time') else dt_time.min
+            except ValueError:
+                clock = dt_time.min
+            price = Decimal(row['price'])
+            yield {
+                'product_name': row['name'],
+                'category': row.get('type') or '',
+                'price': price,
+                'date': day,
+                'timestamp': datetime.combine(day, clock),
+                'units_sold': 1,
+                'revenue': price,
+            }
+
+
+def read_sales_json(path):
+    """Yield records from a {"sales": [...]} export or a Django core.sale fixture."""
+    with open(path, encoding='utf-8') as fh:
+        data = json.load(fh)
+    items = data.get('sales', []) if isinstance(data, dict) else data
+    for item in items:
+        fields = item.get('fields', item)
+        day = date.fromisoformat(str(fields['date'])[:10])
+        units = int(fields['units_sold'])
+        revenue = Decimal(str(fields['revenue']))
+        record = {
+            'date': day,
+            'timestamp': fields.get('timestamp') or datetime.combine(day, dt_time(12)),
+            'units_sold': units,
+            'revenue': revenue,
+            'price': (revenue / units) if units else revenue,
+            'category': fields.get('category') or '',
+        }
+        if 'product_name' in fields:
+            record['product_name'] = fields['product_name']
+        else:
+            record['product_id'] = int(fields['product'])
+        yield record
+
+
+def open_source(path):
+    """Pick a reader from the file extension."""
+    if path.lower().endswith('.json'):
+        return read_sales_json(path)
+    return read_pizzaplace_csv(path)
+
+
+class Checkpoint:
+    """Records how many source records have been committed for one input file.
+
+    The file's size and mtime are stored alongside, so a changed input never
+    resumes from a stale position.
+    """
+
+    def __init__(self, source_path, path=None):
+        self.source_path = os.path.abspath(source_path)
+        self.path = path or f'{source_path}.import-checkpoint.json'
+
+    def _fingerprint(self):
+        st = os.stat(self.source_path)
+        return {'source': self.source_path, 'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return 0
+        fp = self._fingerprint()
+        if any(data.get(k) != v for k, v in fp.items()):
+            logger.warning('Ignoring checkpoint %s: source file changed', self.path)
+            return 0
+        return int(data.get('done', 0))
+
+    def save(self, done):
+        data = dict(self._fingerprint(), done=done, updated_at=timezone.now().isoformat())
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class SalesImporter:
+    """Insert sale records in chunks; see the module docstring."""
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, use_copy=True, default_category='Pizza', progress=None):
+        self.chunk_size = chunk_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.default_category = default_category
+        self.progress = progress
+        self.product_ids = dict(Product.objects.values_list('name', 'id'))
+        self.known_ids = set(self.product_ids.values())
+        self.products_created = 0
+
+    def _resolve_products(self, records):
+        missing = {}
+        for r in records:
+            name = r.get('product_name')
+            if name is not None and name not in self.product_ids and name not in missing:
+                missing[name] = Product(
+                    name=name,
+                    category=r.get('category') or self.default_category,
+                    price=r.get('price') or 0,
+                    is_active=True,
+                    created_at=timezone.now(),
+                )
+        if missing:
+            Product.objects.bulk_create(list(missing.values()))
+            # Not every backend returns ids from bulk inserts; re-read them
+            self.product_ids.update(Product.objects.filter(name__in=list(missing)).values_list('name', 'id'))
+            self.known_ids.update(self.product_ids[n] for n in missing)
+            self.products_created += len(missing)
+
+    def _rows(self, records):
+        tz = timezone.get_current_timezone()
+        rows = []
+        for r in records:
+            pid = self.product_ids.get(r['product_name']) if 'product_name' in r else r.get('product_id')
+            if pid not in self.known_ids:
+                continue
+            ts = r['timestamp']
+            if isinstance(ts, str):
+                ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            if timezone.is_naive(ts):
+                ts = timezone.make_aware(ts, tz)
+            rows.append((pid, r['date'], ts, r['units_sold'], r['revenue']))
+        return rows
+
+    def _copy(self, rows):
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for pid, day, ts, units, revenue in rows:
+            writer.writerow([pid, day.isoformat(), ts.isoformat(), units, revenue])
+        buf.seek(0)
+        sql = 'COPY core_sale (product_id, date, "timestamp", units_sold, revenue) FROM STDIN WITH (FORMAT csv)'
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buf)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buf.getvalue())
+
+    def _insert(self, rows):
+        if self.use_copy:
+            self._copy(rows)
+        else:
+            Sale.objects.bulk_create(
+                [Sale(product_id=pid, date=day, timestamp=ts, units_sold=units, revenue=revenue)
+                 for pid, day, ts, units, revenue in rows],
+                batch_size=1000,
+            )
+
+    def run(self, records, skip=0, limit=None, checkpoint=None):
+        """Import `records`, skipping the first `skip`; returns a stats dict."""
+        it = iter(records)
+        if skip:
+            for _ in islice(it, skip):
+                pass
+        done = skip
+        inserted = 0
+        started = time.monotonic()
+        while True:
+            size = self.chunk_size if limit is None else min(self.chunk_size, skip + limit - done)
+            if size <= 0:
+                break
+            chunk = list(islice(it, size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                self._resolve_products(chunk)
+                rows = self._rows(chunk)
+                if rows:
+                    self._insert(rows)
+                    # Neither COPY nor bulk_create fires Sale signals
+                    rollups.refresh_daily_rollups({(pid, day) for pid, day, _, _, _ in rows})
+                    intraday.record(added=[(pid, ts, units, revenue) for pid, _, ts, units, revenue in rows])
+            done += len(chunk)
+            inserted += len(rows)
+            if checkpoint:
+                checkpoint.save(done)
+            if self.progress:
+                elapsed = time.monotonic() - started
+                self.progress(done, inserted, (done - skip) / elapsed if elapsed else 0.0)
+        if self.products_created:
+            versioning.bump(versioning.CATALOG)
+        elapsed = time.monotonic() - started
+        return {
+            'records': done - skip,
+            'inserted': inserted,
+            'skipped': (done - skip) - inserted,
+            'products_created': self.products_created,
+            'seconds': elapsed,
+            'rows_per_sec': (done - skip) / elapsed if elapsed else 0.0,
+            'position': done,
+        }
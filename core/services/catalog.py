@@ -0,0 +1,114 @@
+"""Serialized product catalog for the POS dashboard.
+
+The cashier landing page needs every product with its display name, size
+price table, stock level and image URL. Building that walks the whole catalog,
+so the serialized structure is cached under the current "catalog" data
+version (bumped on every Product / InventoryItem write, see signals.py);
+page loads in between are a single cache read. Cache errors fall back to
+building the snapshot directly.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from ..models import Product, InventoryItem
+from . import images, versioning
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'catalog'
+DEFAULT_TIMEOUT = 24 * 60 * 60
+
+# Size surcharges relative to the base (Regular) price
+SIZE_OFFSETS = {
+    'S': -5,
+    'M': 5,
+    'L': 10,
+    'XL': 15,
+    'XXL': 20,
+    'Regular': 0,
+}
+
+
+def size_prices(base_price, size):
+    """Price per size for sized products; empty for products without a size."""
+    if not size:
+        return {}
+    return {code: max(0, base_price + offset) for code, offset in SIZE_OFFSETS.items()}
+
+
+def low_stock_items():
+    """Inventory rows at or below their reorder point, filtered in the database."""
+    return (
+        InventoryItem.objects.filter(quantity__lte=F('reorder_point'))
+        .select_related('product')
+        .order_by('quantity', 'sku')
+    )
+
+
+def build_snapshot():
+    """Serialize the catalog: products with price/stock, categories and low-stock rows."""
+    # The first inventory row (lowest pk) per product carries its stock level
+    stock = {}
+    for pid, quantity, reorder_point in (
+        InventoryItem.objects.order_by('product_id', 'id').values_list('product_id', 'quantity', 'reorder_point')
+    ):
+        stock.setdefault(pid, (quantity, reorder_point))
+
+    products = []
+    categories = set()
+    for product in Product.objects.order_by('id'):
+        base_price = float(product.price)
+        quantity, reorder_point = stock.get(product.id, (None, None))
+        products.append({
+            'id': product.id,
+            # Normalize name display (replace underscores, title case)
+            'name': product.name.replace('_', ' ').title(),
+            'price': base_price,
+            'category': product.category,
+            'size': product.size,
+            'size_prices': size_prices(base_price, product.size),
+            'quantity': quantity if quantity is not None else 0,
+            'is_low_stock': quantity is not None and quantity <= reorder_point,
+            # Grid tiles load the thumbnail variant from its content-hashed URL
+            'image': images.image_url(product, 'thumb'),
+        })
+        categories.add(product.category)
+
+    low_stock = [
+        {
+            'id': item.id,
+            'sku': item.sku,
+            'product': item.product.name,
+            'quantity': item.quantity,
+            'reorder_point': item.reorder_point,
+        }
+        for item in low_stock_items()
+    ]
+    return {
+        'products': products,
+        'categories': sorted(c for c in categories if c),
+        'low_stock': low_stock,
+    }
+
+
+def catalog_snapshot():
+    """Return the cached catalog snapshot, rebuilding it after catalog writes."""
+    try:
+        token = versioning.tokens([versioning.CATALOG])[versioning.CATALOG]
+        key = f'{KEY_PREFIX}:snapshot:{token}'
+        hit = cache.get(key)
+    except Exception:
+        logger.exception('Catalog cache lookup failed')
+        return build_snapshot()
+    if hit is not None:
+        return hit
+
+    snapshot = build_snapshot()
+    try:
+        cache.set(key, snapshot, getattr(settings, 'CATALOG_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    except Exception:
+        logger.exception('Catalog cache store failed')
+    return snapshot
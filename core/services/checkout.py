@@ -0,0 +1,150 @@
+"""Cart checkout: validate and record a whole cart in one transaction.
+
+Each cart becomes one Order header (with precomputed totals) plus one Sale
+line per cart item. All products and inventory rows are loaded up front (inventory locked with
+SELECT ... FOR UPDATE where the backend supports it), sale lines are written
+with a single bulk insert and stock is decremented with conditional F()
+updates, so a cart costs a handful of queries regardless of its size and two
+tills can never sell the same last unit.
+"""
+from decimal import Decimal, InvalidOperation
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import Product, InventoryItem, Order, Sale
+from . import intraday, live, rollups, versioning
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be recorded; nothing has been written.
+
+    `line_errors` lists every failing line as {'line', 'product_id', 'error'}
+    and `status` is the HTTP status the first failure maps to.
+    """
+
+    def __init__(self, line_errors, status=400):
+        self.line_errors = line_errors
+        self.status = status
+        super().__init__(line_errors[0]['error'] if line_errors else 'Checkout failed')
+
+
+def _parse_lines(items):
+    lines, errors = [], []
+    for n, item in enumerate(items):
+        pid = item.get('id') if isinstance(item, dict) else None
+        try:
+            pid = int(pid)
+            quantity = int(item['quantity'])
+            price = Decimal(str(item['price']))
+        except (TypeError, ValueError, KeyError, InvalidOperation):
+            errors.append({'line': n, 'product_id': pid, 'error': f'Invalid cart line (id: {pid})', 'status': 400})
+            continue
+        lines.append({'line': n, 'product_id': pid, 'quantity': quantity, 'price': price})
+    return lines, errors
+
+
+def _fail(errors):
+    status = errors[0].pop('status', 400)
+    for e in errors[1:]:
+        e.pop('status', None)
+    raise CheckoutError(errors, status=status)
+
+
+def checkout(items):
+    """Record `items` ([{'id', 'quantity', 'price'}, ...]) as one Order with a Sale per line.
+
+    Returns the created Order. Raises CheckoutError listing every bad
+    line when any line fails validation; in that case nothing is written.
+    """
+    lines, errors = _parse_lines(items)
+
+    with transaction.atomic():
+        products = Product.objects.in_bulk({line['product_id'] for line in lines})
+
+        # First inventory row per product (by pk), matching product.inventory_items.first()
+        inventory = {}
+        locked = (
+            InventoryItem.objects.select_for_update()
+            .filter(product_id__in=list(products))
+            .order_by('product_id', 'pk')
+        )
+        for inv in locked:
+            inventory.setdefault(inv.product_id, inv)
+
+        requested = {}
+        for line in lines:
+            product = products.get(line['product_id'])
+            if product is None:
+                errors.append({'line': line['line'], 'product_id': line['product_id'],
+                               'error': f"Product not found (id: {line['product_id']})", 'status': 404})
+                continue
+            if line['quantity'] <= 0:
+                errors.append({'line': line['line'], 'product_id': product.id,
+                               'error': f'Invalid quantity for {product.name}', 'status': 400})
+                continue
+            requested[product.id] = requested.get(product.id, 0) + line['quantity']
+
+        # Stock is checked against the cart total per product, not line by line
+        for line in lines:
+            product = products.get(line['product_id'])
+            inv = inventory.get(line['product_id'])
+            if product is None or inv is None or line['quantity'] <= 0:
+                continue
+            wanted = requested[product.id]
+            if inv.quantity < wanted:
+                errors.append({'line': line['line'], 'product_id': product.id, 'status': 400,
+                               'error': f'Insufficient inventory for {product.name}. Available: {inv.quantity}, Requested: {wanted}'})
+
+        if errors:
+            errors.sort(key=lambda e: e['line'])
+            _fail(errors)
+
+        now = timezone.now()
+        today = timezone.localdate(now)
+        sales = [
+            Sale(
+                product=products[line['product_id']],
+                date=today,
+                timestamp=now,
+                units_sold=line['quantity'],
+                revenue=(line['price'] * line['quantity']).quantize(Decimal('0.01')),
+            )
+            for line in lines
+        ]
+        order = Order.objects.create(
+            date=today,
+            created_at=now,
+            total_revenue=sum((s.revenue for s in sales), Decimal('0')),
+            total_units=sum(s.units_sold for s in sales),
+            line_count=len(sales),
+        )
+        for sale in sales:
+            sale.order = order
+        Sale.objects.bulk_create(sales)
+
+        for pid, quantity in requested.items():
+            inv = inventory.get(pid)
+            if inv is None:
+                continue
+            updated = InventoryItem.objects.filter(pk=inv.pk, quantity__gte=quantity).update(
+                quantity=F('quantity') - quantity, updated_at=now
+            )
+            if not updated:
+                # Only reachable on backends without row locks; roll the cart back
+                _fail([{'line': next(line['line'] for line in lines if line['product_id'] == pid), 'product_id': pid,
+                        'error': f'Insufficient inventory for {products[pid].name}', 'status': 400}])
+
+        # bulk_create and update() skip model signals, so refresh derived data here
+        rollups.refresh_daily_rollups({(pid, today) for pid in requested})
+        intraday.record(added=[intraday.sale_entry(s) for s in sales])
+        versioning.bump(versioning.CATALOG)
+        # Push the new totals to open dashboards once the cart is committed
+        transaction.on_commit(live.publish_sales)
+
+    logger.info('checkout: recorded order %s with %d sale lines for %d products', order.pk, len(sales), len(requested))
+    return order
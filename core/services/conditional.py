@@ -0,0 +1,74 @@
+"""Conditional GET for JSON endpoints, validated by data versions.
+
+The JSON APIs only change when the data behind them is written, and every
+write bumps a data version (see versioning.py). `condition(*keys)` wraps a
+view so that a GET first reads those version rows (one query) and derives:
+
+  * a strong ETag from the tokens, the URL, the user and today's date
+    (payloads are per user and several of them depend on the date),
+  * Last-Modified from the newest bump, but never earlier than the start
+    of today.
+
+If the client's If-None-Match / If-Modified-Since still matches, a 304 is
+returned before the view runs, so no aggregation or forecasting happens.
+Otherwise the view runs and its 200 response carries the validators with
+"Cache-Control: private, no-cache", so browsers keep the body and
+revalidate it on the next request.
+"""
+from datetime import datetime, time
+from functools import wraps
+import hashlib
+import logging
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from . import versioning
+
+logger = logging.getLogger(__name__)
+
+
+def validators(request, keys):
+    """(etag, last_modified timestamp) for `request` against the data families in `keys`."""
+    stamps = versioning.stamps(keys)
+    today = timezone.localdate()
+    user = getattr(request, 'user', None)
+    parts = [
+        request.get_full_path(),
+        str(getattr(user, 'pk', None) or ''),
+        today.isoformat(),
+    ]
+    parts.extend(f'{key}={stamps[key][0]}' for key in sorted(stamps))
+    etag = '"%s"' % hashlib.sha256('|'.join(parts).encode()).hexdigest()[:32]
+
+    start_of_day = timezone.make_aware(datetime.combine(today, time.min))
+    modified = max([start_of_day] + [updated for _, updated in stamps.values() if updated])
+    return etag, int(modified.timestamp())
+
+
+def condition(*keys):
+    """Answer GET/HEAD with 304 while none of the data families in `keys` changed."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            try:
+                etag, modified = validators(request, keys)
+            except Exception:
+                # A missing versions table must never take the endpoint down
+                logger.exception('Computing validators for %s failed', request.path)
+                return view(request, *args, **kwargs)
+
+            response = get_conditional_response(request, etag=etag, last_modified=modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -1,29 +1,19 @@
 from datetime import date, timedelta
-import os
-import pandas as pd
-import numpy as np
-from sklearn.linear_model import LinearRegression
+import logging
+from .csv_store import aggregate_counts, load_frame, load_table
+from .regression import fit_lines
 
 """Legacy CSV-based forecasting helpers.
 These are kept separate from `forecasting.py` so the main forecasting
 pipeline can rely only on DB historical sales. Management commands and
 ad hoc tools that still need CSV processing can import from here.
 """
+logger = logging.getLogger(__name__)
 
 
 def load_csv_data(csv_path=None):
-    """Load sales data from CSV file"""
-    if csv_path is None:
-        csv_path = os.path.join(os.path.dirname(__file__), '../../pizzaplace.csv')
-    if not os.path.exists(csv_path):
-        return None
-    try:
-        df = pd.read_csv(csv_path)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    except Exception as e:
-        print(f"Error loading CSV: {e}")
-        return None
+    """Load sales data from CSV file (served from the columnar cache in services/csv_store.py)"""
+    return load_frame(csv_path)
 
 
 def csv_aggregate_series(limit=100):
@@ -32,40 +22,12 @@ def csv_aggregate_series(limit=100):
     Returns dict with keys 'daily', 'weekly', 'monthly' where each value is a list of
     (label, units) tuples ordered chronologically (oldest -> newest).
     """
-    df = load_csv_data()
-    if df is None or df.empty:
+    try:
+        return aggregate_counts(load_table(), limit=limit)
+    except Exception:
+        logger.exception('Aggregating CSV series failed')
         return {'daily': [], 'weekly': [], 'monthly': []}
 
-    # Ensure date column is datetime and sort by date
-    df = df.sort_values('date')
-
-    # Limit to `limit` most recent rows
-    if limit is not None:
-        df = df.tail(limit)
-
-    # DAILY: count rows per date
-    daily = df.groupby(df['date'].dt.date).size().reset_index(name='units')
-    # Fill missing days between min and max date with zeros for nicer charts
-    min_d = daily['date'].min()
-    max_d = daily['date'].max()
-    all_dates = pd.date_range(start=min_d, end=max_d, freq='D')
-    daily = daily.set_index('date').reindex(all_dates, fill_value=0).rename_axis('date').reset_index()
-    daily_series = [(row['date'].date().isoformat(), int(row['units'])) for _, row in daily.iterrows()]
-
-    # WEEKLY: group by week starting Monday
-    df_week = df.copy()
-    df_week['week_start'] = df_week['date'].dt.to_period('W').apply(lambda r: r.start_time.date())
-    weekly = df_week.groupby('week_start').size().reset_index(name='units')
-    weekly_series = [(row['week_start'].isoformat(), int(row['units'])) for _, row in weekly.iterrows()]
-
-    # MONTHLY: group by year-month
-    df_month = df.copy()
-    df_month['month'] = df_month['date'].dt.to_period('M').apply(lambda r: r.start_time.date())
-    monthly = df_month.groupby('month').size().reset_index(name='units')
-    monthly_series = [(row['month'].strftime('%Y-%m'), int(row['units'])) for _, row in monthly.iterrows()]
-
-    return {'daily': daily_series, 'weekly': weekly_series, 'monthly': monthly_series}
-
 
 def get_csv_forecast(csv_path=None, limit=100):
     """
@@ -89,25 +51,25 @@ def get_csv_forecast(csv_path=None, limit=100):
     results = {}
 
     # Group by product name
+    groups = []
     for product_name, group in df.groupby('name'):
         # Count units sold per day
         daily_sales = group.groupby('date').size().reset_index(name='units')
-        if len(daily_sales) < 3:
-            continue
-        X = np.arange(len(daily_sales)).reshape(-1, 1)
+        if len(daily_sales) >= 3:
+            groups.append((product_name, daily_sales))
+    lines = fit_lines([daily_sales['units'].tolist() for _, daily_sales in groups])
+
+    for (product_name, daily_sales), line in zip(groups, lines):
         y = daily_sales['units'].values
-        model = LinearRegression()
-        model.fit(X, y)
-        next_day = np.array([[len(daily_sales)]])
-        forecast = max(1, int(model.predict(next_day)[0]))
-        slope = model.coef_[0]
+        forecast = max(1, int(line.predict(len(daily_sales))))
+        slope = line.slope
         if slope > 0.5:
             trend = "increasing"
         elif slope < -0.5:
             trend = "decreasing"
         else:
             trend = "stable"
-        r_squared = model.score(X, y)
+        r_squared = line.r2
         confidence = 0.0 if r_squared < 0 else round(r_squared * 100, 2)
         if confidence == 0 and len(daily_sales) >= 3:
             variance = float(y.var())
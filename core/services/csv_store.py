@@ -0,0 +1,225 @@
+"""Columnar cache of the legacy sales CSV (pizzaplace.csv).
+
+Parsing the 50k-line CSV with pandas takes far longer than the work done
+with it, and the CSV helpers used to parse it on every call. Here it is
+parsed once into columns and written to an uncompressed .npz file under
+CSV_CACHE_DIR:
+  * numeric columns are stored as arrays,
+  * text columns as integer codes plus their distinct values,
+  * the date column as datetime64.
+Later loads read the .npz (or reuse the copy already in this process) as
+long as the source file's mtime and size still match the stamp stored with
+it. Replacing the CSV invalidates the cache automatically.
+
+`aggregate_counts()` produces the daily/weekly/monthly row counts used by
+the diagnostics pages with numpy group-bys on the date column.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CSV = os.path.normpath(os.path.join(os.path.dirname(__file__), '../../pizzaplace.csv'))
+DATE_COLUMN = 'date'
+# Bump when the stored layout changes so old cache files are rebuilt
+FORMAT = 1
+
+_memo = {}
+_lock = threading.Lock()
+
+
+def cache_dir():
+    return str(getattr(settings, 'CSV_CACHE_DIR', '') or os.path.join(tempfile.gettempdir(), 'koki-foodhub-csv'))
+
+
+def _stamp(path):
+    stat = os.stat(path)
+    return [FORMAT, stat.st_mtime_ns, stat.st_size]
+
+
+def _cache_path(path):
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir(), f'{digest}.npz')
+
+
+class Table:
+    """Columns of one CSV file, in file order."""
+
+    def __init__(self, columns, data):
+        self.columns = list(columns)
+        # name -> ('num', values) | ('text', codes, uniques) | ('date', values)
+        self.data = data
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        first = self.data[self.columns[0]]
+        return len(first[1])
+
+    def dates(self):
+        """The date column as datetime64[D]."""
+        return self.data[DATE_COLUMN][1].astype('datetime64[D]')
+
+    def column(self, name):
+        import numpy as np
+
+        kind, *arrays = self.data[name]
+        if kind == 'text':
+            codes, uniques = arrays
+            if not uniques.size:
+                return np.full(len(codes), np.nan, dtype=object)
+            values = uniques.astype(object)[np.maximum(codes, 0)]
+            values[codes < 0] = np.nan
+            return values
+        return arrays[0]
+
+    def to_frame(self):
+        """DataFrame equal to pd.read_csv with the date column parsed."""
+        import pandas as pd
+
+        return pd.DataFrame({name: self.column(name) for name in self.columns}, columns=self.columns)
+
+    @classmethod
+    def from_frame(cls, df):
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name in df.columns:
+            series = df[name]
+            if name == DATE_COLUMN:
+                data[name] = ('date', pd.to_datetime(series).to_numpy())
+            elif pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                data[name] = ('num', series.to_numpy())
+            else:
+                codes, uniques = pd.factorize(series)
+                data[name] = ('text', codes.astype(np.int32), np.asarray(uniques, dtype=str))
+        return cls(df.columns, data)
+
+    def save(self, path, stamp):
+        import numpy as np
+
+        arrays = {'stamp': np.asarray(stamp, dtype=np.int64), 'columns': np.asarray(self.columns, dtype=str)}
+        kinds = []
+        for i, name in enumerate(self.columns):
+            kind, *values = self.data[name]
+            kinds.append(kind)
+            for j, array in enumerate(values):
+                arrays[f'c{i}_{j}'] = array
+        arrays['kinds'] = np.asarray(kinds, dtype=str)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path, stamp):
+        """Table stored at `path`, or None when it is missing or was built from another version."""
+        import numpy as np
+
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                if npz['stamp'].tolist() != stamp:
+                    return None
+                columns = npz['columns'].tolist()
+                kinds = npz['kinds'].tolist()
+                data = {}
+                for i, (name, kind) in enumerate(zip(columns, kinds)):
+                    count = 2 if kind == 'text' else 1
+                    data[name] = (kind, *(npz[f'c{i}_{j}'] for j in range(count)))
+        except (OSError, ValueError, KeyError):
+            return None
+        return cls(columns, data)
+
+
+def load_table(csv_path=None):
+    """Columnar Table of `csv_path` (default pizzaplace.csv), or None if it can't be read."""
+    path = os.path.abspath(csv_path or DEFAULT_CSV)
+    try:
+        stamp = _stamp(path)
+    except OSError:
+        return None
+
+    with _lock:
+        hit = _memo.get(path)
+    if hit and hit[0] == stamp:
+        return hit[1]
+
+    cached = _cache_path(path)
+    try:
+        table = Table.load(cached, stamp)
+    except ImportError:
+        logger.warning('numpy unavailable; CSV cache disabled')
+        return None
+    if table is None:
+        try:
+            import pandas as pd
+            table = Table.from_frame(pd.read_csv(path))
+        except Exception:
+            logger.exception('Error loading CSV %s', path)
+            return None
+        try:
+            table.save(cached, stamp)
+        except OSError:
+            # Read-only or full disk: keep serving from this process's copy
+            logger.warning('Could not write CSV cache %s', cached, exc_info=True)
+    with _lock:
+        _memo[path] = (stamp, table)
+    return table
+
+
+def load_frame(csv_path=None):
+    """pandas DataFrame of the CSV (date column parsed), or None if it can't be read."""
+    table = load_table(csv_path)
+    return table.to_frame() if table is not None else None
+
+
+def aggregate_counts(table, limit=None):
+    """Row counts per day, week (starting Monday) and month over the newest `limit` rows.
+
+    Returns {'daily', 'weekly', 'monthly'} lists of (label, count), oldest
+    first; days without rows inside the range are included with 0.
+    """
+    import numpy as np
+
+    empty = {'daily': [], 'weekly': [], 'monthly': []}
+    if table is None or not len(table):
+        return empty
+    days = np.sort(table.dates())
+    if limit is not None:
+        days = days[-limit:] if limit > 0 else days[:0]
+    if not days.size:
+        return empty
+
+    first = days[0]
+    daily = np.bincount((days - first).astype(np.int64))
+    labels = np.datetime_as_string(first + np.arange(daily.size), unit='D')
+
+    # 1970-01-01 was a Thursday; shift so Monday is weekday 0
+    weeks = days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+    week_starts, week_counts = np.unique(weeks, return_counts=True)
+
+    months, month_counts = np.unique(days.astype('datetime64[M]'), return_counts=True)
+
+    return {
+        'daily': list(zip(labels.tolist(), daily.tolist())),
+        'weekly': list(zip(np.datetime_as_string(week_starts, unit='D').tolist(), week_counts.tolist())),
+        'monthly': list(zip(np.datetime_as_string(months, unit='M').tolist(), month_counts.tolist())),
+    }
+
+
+def clear():
+    """Forget this process's loaded tables (the .npz files stay)."""
+    with _lock:
+        _memo.clear()
@@ -0,0 +1,126 @@
+"""Streaming exports of sales, products and inventory.
+
+Rows are read with `.values_list(...).iterator(chunk_size=...)` (a server-side
+cursor on PostgreSQL) and encoded one at a time, so an export uses constant
+memory and the first bytes go out before the last row has been read. The same
+generators back the export views and the `export_data` command.
+"""
+import csv
+import json
+import zlib
+
+from ..models import Product, InventoryItem, Sale
+
+CHUNK_SIZE = 2000
+# Flush compressed output roughly this often so clients see steady progress
+GZIP_FLUSH_BYTES = 64 * 1024
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# dataset -> (model, [(column name, ORM path)], date lookup, product lookup)
+DATASETS = {
+    'sales': (
+        Sale,
+        [('id', 'id'), ('date', 'date'), ('timestamp', 'timestamp'), ('product_id', 'product_id'),
+         ('product', 'product__name'), ('category', 'product__category'), ('units_sold', 'units_sold'),
+         ('revenue', 'revenue'), ('order_id', 'order_id')],
+        'date', 'product',
+    ),
+    'products': (
+        Product,
+        [('id', 'id'), ('name', 'name'), ('category', 'category'), ('price', 'price'), ('size', 'size'),
+         ('is_active', 'is_active'), ('created_at', 'created_at')],
+        'created_at__date', None,
+    ),
+    'inventory': (
+        InventoryItem,
+        [('id', 'id'), ('sku', 'sku'), ('product_id', 'product_id'), ('product', 'product__name'),
+         ('quantity', 'quantity'), ('reorder_point', 'reorder_point'), ('size', 'size'),
+         ('updated_at', 'updated_at')],
+        'updated_at__date', 'product',
+    ),
+}
+
+
+def export_queryset(dataset, start=None, end=None, product=None):
+    """Return (column names, values_list queryset) for `dataset` with the filters applied.
+
+    `product` is a product id or exact name; it is ignored for datasets that
+    are not tied to a product. Raises KeyError for an unknown dataset.
+    """
+    model, columns, date_lookup, product_lookup = DATASETS[dataset]
+    qs = model.objects.all()
+    if start:
+        qs = qs.filter(**{f'{date_lookup}__gte': start})
+    if end:
+        qs = qs.filter(**{f'{date_lookup}__lte': end})
+    if product:
+        if dataset == 'products':
+            qs = qs.filter(pk=product) if str(product).isdigit() else qs.filter(name=product)
+        elif product_lookup:
+            if str(product).isdigit():
+                qs = qs.filter(**{f'{product_lookup}_id': int(product)})
+            else:
+                qs = qs.filter(**{f'{product_lookup}__name': product})
+    names = [name for name, _ in columns]
+    return names, qs.order_by('pk').values_list(*[path for _, path in columns])
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line for the csv writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(names, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names).encode('utf-8')
+    for row in rows:
+        yield writer.writerow([_text(v) for v in row]).encode('utf-8')
+
+
+def iter_ndjson(names, rows):
+    for row in rows:
+        record = {}
+        for name, value in zip(names, row):
+            record[name] = value if value is None or isinstance(value, (bool, int)) else _text(value)
+        yield (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def gzip_stream(chunks):
+    """Compress an iterable of byte chunks into a gzip stream on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    pending = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= GZIP_FLUSH_BYTES:
+            out += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream_export(dataset, fmt='csv', compress=False, start=None, end=None, product=None, chunk_size=CHUNK_SIZE):
+    """Yield the encoded export as byte chunks."""
+    names, qs = export_queryset(dataset, start=start, end=end, product=product)
+    rows = qs.iterator(chunk_size=chunk_size)
+    chunks = iter_ndjson(names, rows) if fmt == 'ndjson' else iter_csv(names, rows)
+    return gzip_stream(chunks) if compress else chunks
+
+
+def export_filename(dataset, fmt='csv', compress=False):
+    return f"{dataset}.{FORMATS[fmt][1]}{'.gz' if compress else ''}"
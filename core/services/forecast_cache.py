@@ -0,0 +1,71 @@
+"""Versioned cache for forecast results.
+
+Forecast payloads only change when sales or catalog data change (or the day
+rolls over), so they are cached under a key built from the endpoint, its
+parameters, the current data-version tokens and today's date. Writes bump the
+tokens (see `versioning.bump`) which makes older entries unreachable; they then
+expire via FORECAST_CACHE_TIMEOUT.
+
+Cache backend errors are logged and treated as misses so a broken cache never
+takes the forecast pages down.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import versioning
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'forecast'
+DEFAULT_TIMEOUT = 6 * 60 * 60
+DATA_KEYS = (versioning.SALES, versioning.CATALOG)
+
+
+def _today():
+    try:
+        return timezone.localdate()
+    except Exception:
+        return timezone.now().date()
+
+
+def cache_key(endpoint, params=None):
+    """Build the cache key for `endpoint` called with `params` against the current data."""
+    parts = {
+        'endpoint': endpoint,
+        'params': params or {},
+        'versions': versioning.tokens(DATA_KEYS),
+        'today': _today().isoformat(),
+    }
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}:{endpoint}:{digest}'
+
+
+def get_or_compute(endpoint, params, compute, timeout=None, cacheable=None):
+    """Return the cached result for (endpoint, params) or compute and store it.
+
+    `cacheable(result)` may reject results that should not be stored, such as
+    error payloads.
+    """
+    try:
+        key = cache_key(endpoint, params)
+        hit = cache.get(key)
+    except Exception:
+        logger.exception('Forecast cache lookup failed for %s', endpoint)
+        return compute()
+    if hit is not None:
+        return hit
+
+    result = compute()
+    if result is not None and (cacheable is None or cacheable(result)):
+        if timeout is None:
+            timeout = getattr(settings, 'FORECAST_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+        try:
+            cache.set(key, result, timeout)
+        except Exception:
+            logger.exception('Forecast cache store failed for %s', endpoint)
+    return result
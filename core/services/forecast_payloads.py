@@ -0,0 +1,488 @@
+"""Forecast API payload builders.
+
+The forecast views and the `precompute_forecasts` job build their JSON
+payloads here, so the same code serves an on-demand request and a stored
+ForecastSnapshot.
+"""
+import logging
+
+from ..models import Product
+from .kpis import window_totals
+
+logger = logging.getLogger(__name__)
+
+
+class PayloadError(Exception):
+    """A payload could not be built; `body` is the JSON error to return."""
+
+    def __init__(self, body, status=500, trace=None):
+        super().__init__(body.get('error'))
+        self.body = body
+        self.status = status
+        self.trace = trace
+
+
+def slice_product_payload(payload, top_n):
+    """Cut a payload built with top=None down to the `top_n` a client asked for."""
+    result = dict(payload)
+    result['top'] = payload['top'][:top_n]
+    result['trending'] = payload['trending'][:max(10, top_n)]
+    return result
+
+
+def forecast_data_payload(params):
+    """Build the forecast_data_api payload.
+
+    `params` may hold 'start', 'end' (YYYY-MM-DD) and 'product' (name) filters.
+    Returns the payload dict; raises PayloadError describing the JSON error
+    response otherwise.
+    """
+    # Wrap main API logic so unexpected exceptions return a controlled JSON error
+    try:
+        try:
+            from .forecasting import aggregate_sales, forecast_time_series, moving_average_forecast
+        except Exception as e:
+            logger.exception('Forecast API import failed: %s', str(e))
+            raise PayloadError({'error': 'Forecasting libraries unavailable', 'details': str(e)})
+
+        import json
+
+        # Build per-product forecasts from DB historical sales only
+        products = []
+        try:
+            db_results = moving_average_forecast(window=3)
+            db_forecasts = db_results.get('db_forecasts', {})
+            for pid, r in db_forecasts.items():
+                try:
+                    product_obj = Product.objects.get(pk=pid)
+                except Product.DoesNotExist:
+                    continue
+                conf = r.get('confidence', 0)
+                if conf and conf <= 1.0:
+                    conf = conf * 100
+                accuracy = r.get('accuracy') or ('High' if conf >= 70 else 'Medium' if conf >= 40 else 'Low')
+                history = r.get('history', []) or []
+                products.append({
+                    'product': product_obj.name,
+                    'product_id': pid,
+                    'forecast': int(r.get('forecast', 0)),
+                    'avg': float(r.get('avg', 0)),
+                    'trend': r.get('trend', 'unknown'),
+                    'confidence': int(conf or 0),
+                    'accuracy': accuracy,
+                    'last_7_days': int(sum([u for _, u in history[-7:]]))
+                })
+        except Exception as e:
+            logger.exception('Error building DB product forecasts: %s', str(e))
+            products = []
+    except PayloadError:
+        raise
+    except Exception as e:
+        # Catch-all: report a JSON error; the view adds the traceback for admins asking for debug=1
+        import traceback, uuid
+        tb = traceback.format_exc()
+        error_id = uuid.uuid4().hex[:8]
+        logger.exception('Unexpected error in forecast_data_api (id=%s): %s\n%s', error_id, str(e), tb)
+        raise PayloadError({'error': 'Internal Server Error', 'id': error_id}, trace=tb)
+
+    # Use DB aggregates for series (daily/weekly/monthly) — CSV is not used for forecasts
+    daily_series = aggregate_sales('daily', lookback=60)
+    weekly_series = aggregate_sales('weekly', lookback=12)
+    monthly_series = aggregate_sales('monthly', lookback=12)
+
+    # Optional filters from query params: start (YYYY-MM-DD), end (YYYY-MM-DD), product
+    start = params.get('start')
+    end = params.get('end')
+    product_filter = params.get('product')
+
+    def filter_series_by_range(series, granularity):
+        if not series or not (start or end):
+            return series
+        out = []
+        for label, val in series:
+            try:
+                if granularity == 'monthly':
+                    # label like 'YYYY-MM'
+                    lab_key = label
+                    if start:
+                        if lab_key < start[:7]:
+                            continue
+                    if end:
+                        if lab_key > end[:7]:
+                            continue
+                else:
+                    # daily/weekly ISO date
+                    lab_date = label
+                    if start and lab_date < start:
+                        continue
+                    if end and lab_date > end:
+                        continue
+                out.append((label, val))
+            except Exception:
+                continue
+        return out
+
+    daily_series = filter_series_by_range(daily_series, 'daily')
+    weekly_series = filter_series_by_range(weekly_series, 'weekly')
+    monthly_series = filter_series_by_range(monthly_series, 'monthly')
+
+    if product_filter:
+        products = [p for p in products if p.get('product') == product_filter]
+
+    # CRITICAL FIX: Generate forecasts from UNFILTERED series to ensure we have proper forecast
+    # We need to use the full historical data for forecast generation, not just the filtered range
+    try:
+        # Get unfiltered series for forecast generation
+        daily_series_unfiltered = aggregate_sales('daily', lookback=60)
+        weekly_series_unfiltered = aggregate_sales('weekly', lookback=12)
+        monthly_series_unfiltered = aggregate_sales('monthly', lookback=12)
+        
+        logger.info('API: Unfiltered daily_series length: %d, weekly: %d, monthly: %d', 
+                    len(daily_series_unfiltered) if daily_series_unfiltered else 0, 
+                    len(weekly_series_unfiltered) if weekly_series_unfiltered else 0, 
+                    len(monthly_series_unfiltered) if monthly_series_unfiltered else 0)
+        
+        # Generate forecasts from full historical data
+        daily_fore = forecast_time_series(daily_series_unfiltered, horizon=30, state_key='revenue:daily', period='daily')
+        weekly_fore = forecast_time_series(weekly_series_unfiltered, horizon=12, state_key='revenue:weekly', period='weekly')
+        monthly_fore = forecast_time_series(monthly_series_unfiltered, horizon=6, state_key='revenue:monthly', period='monthly')
+        
+        try:
+            logger.info('API: Generated forecasts - daily: %d, weekly: %d, monthly: %d', 
+                        len(daily_fore.get('forecast', []) or []), 
+                        len(weekly_fore.get('forecast', []) or []), 
+                        len(monthly_fore.get('forecast', []) or []))
+        except Exception as e:
+            logger.exception('Error logging forecast lengths: %s', e)
+        
+        # Ensure we always have arrays (even if empty)
+        daily_fore = {
+            'forecast': daily_fore.get('forecast') or [],
+            'upper': daily_fore.get('upper') or [],
+            'lower': daily_fore.get('lower') or [],
+            'confidence': daily_fore.get('confidence') or 0,
+            'accuracy': daily_fore.get('accuracy', '')
+        }
+        weekly_fore = {
+            'forecast': weekly_fore.get('forecast') or [],
+            'upper': weekly_fore.get('upper') or [],
+            'lower': weekly_fore.get('lower') or [],
+            'confidence': weekly_fore.get('confidence') or 0,
+            'accuracy': weekly_fore.get('accuracy', '')
+        }
+        monthly_fore = {
+            'forecast': monthly_fore.get('forecast') or [],
+            'upper': monthly_fore.get('upper') or [],
+            'lower': monthly_fore.get('lower') or [],
+            'confidence': monthly_fore.get('confidence') or 0,
+            'accuracy': monthly_fore.get('accuracy', '')
+        }
+
+        # Server-side fallback: if model returned empty or trivial forecasts (all zeros),
+        # compute a simple fallback using recent actuals so the API always provides a usable projection.
+        def _ensure_forecast_non_empty(fore, series, horizon, label='series'):
+            try:
+                preds = fore.get('forecast') or []
+                valid = sum(1 for v in preds if v is not None and v != 0)
+                if not preds or valid == 0:
+                    vals = [v for _, v in series]
+                    recent = vals[-14:] if vals else []
+                    if not recent:
+                        preds2 = [0] * horizon
+                    else:
+                        # simple slope + mean baseline
+                        baseline = sum(recent) / len(recent)
+                        slope = (recent[-1] - recent[0]) / max(1, len(recent) - 1)
+                        preds2 = [max(0, int(round(baseline + slope * (i + 1)))) for i in range(horizon)]
+                    fore['forecast'] = preds2
+                    fore['upper'] = [int(round(p * 1.2 + 10)) for p in preds2]
+                    fore['lower'] = [max(0, int(round(p * 0.8 - 10))) for p in preds2]
+                    # mark as fallback so clients can show a notice
+                    fore['fallback'] = True
+                else:
+                    fore['fallback'] = False
+            except Exception:
+                fore['fallback'] = True
+            return fore
+
+        # Ensure we have non-empty forecasts for clients (daily:30, weekly:12, monthly:6)
+        # IMPORTANT: Use the UNFILTERED series for fallback generation so clients that request
+        # a narrow date range still receive a full forecast computed from the complete history.
+        daily_fore = _ensure_forecast_non_empty(daily_fore, daily_series_unfiltered, horizon=30, label='daily')
+        weekly_fore = _ensure_forecast_non_empty(weekly_fore, weekly_series_unfiltered, horizon=12, label='weekly')
+        monthly_fore = _ensure_forecast_non_empty(monthly_fore, monthly_series_unfiltered, horizon=6, label='monthly')
+    except Exception as e:
+        # If forecast computation fails, just log it and keep the default empty forecasts
+        # The view will still render with empty/fallback data
+        logger.warning('Forecast computation failed (will use defaults): %s', str(e))
+    try:
+        from .forecasting import compute_period_overview, generate_insight
+
+        # Build summary for overview cards and AI insights
+        daily_summary = compute_period_overview(daily_series)
+        weekly_summary = compute_period_overview(weekly_series)
+        monthly_summary = compute_period_overview(monthly_series)
+
+        daily_insight = generate_insight('daily', daily_series, daily_fore)
+        weekly_insight = generate_insight('weekly', weekly_series, weekly_fore)
+        monthly_insight = generate_insight('monthly', monthly_series, monthly_fore)
+
+        # compute average unit price over the last 30 days so clients can scale unit-based series into revenue
+        try:
+            from django.utils import timezone as _tz
+            from datetime import timedelta as _td
+            try:
+                _today = _tz.localdate()
+            except Exception:
+                _today = _tz.now().date()
+            _lookback = 30
+            _start = _today - _td(days=_lookback)
+            _kpi = window_totals({'last_30': (_start, _today)})['last_30']
+            _rev = _kpi['revenue']
+            _units = _kpi['units']
+            avg_unit_price = (_rev / _units) if _units > 0 else 0.0
+        except Exception:
+            avg_unit_price = 0.0
+
+        payload = {
+            'products': products,
+            'data_source': 'db',
+            'avg_unit_price': avg_unit_price,
+            'currency': '₱',
+            'summary': {
+                'daily': daily_summary,
+                'weekly': weekly_summary,
+                'monthly': monthly_summary
+            },
+            'ai_insights': [ins for ins in (daily_insight, weekly_insight, monthly_insight) if ins],
+            'daily': {
+                'labels': [d for d, _ in daily_series],
+                'actual': [v for _, v in daily_series],
+                'forecast': daily_fore['forecast'],
+                'upper': daily_fore['upper'],
+                'lower': daily_fore['lower'],
+                'confidence': daily_fore['confidence'],
+                'accuracy': daily_fore.get('accuracy', ''),
+                'fallback': bool(daily_fore.get('fallback', False))
+            },
+
+            'weekly': {
+                'labels': [d for d, _ in weekly_series],
+                'actual': [v for _, v in weekly_series],
+                'forecast': weekly_fore['forecast'],
+                'upper': weekly_fore['upper'],
+                'lower': weekly_fore['lower'],
+                'confidence': weekly_fore['confidence'],
+                'accuracy': weekly_fore.get('accuracy', ''),
+                'fallback': bool(weekly_fore.get('fallback', False))
+            },
+            'monthly': {
+                'labels': [d for d, _ in monthly_series],
+                'actual': [v for _, v in monthly_series],
+                'forecast': monthly_fore['forecast'],
+                'upper': monthly_fore['upper'],
+                'lower': monthly_fore['lower'],
+                'confidence': monthly_fore['confidence'],
+                'accuracy': monthly_fore.get('accuracy', ''),
+                'fallback': bool(monthly_fore.get('fallback', False))
+            }
+        }
+
+        # Also include server-side revenue series (now direct from DB since aggregate_sales returns revenue)
+        # No need to convert anymore since aggregate_sales() now returns revenue directly
+        try:
+            # Daily actuals are already in revenue form from aggregate_sales()
+            daily_dates = [d for d, _ in daily_series]
+            daily_actual = [v for _, v in daily_series]
+
+            logger.info('API: daily_revenue - dates: %d, actual values: %d, sample actual: %s', 
+                        len(daily_dates), len(daily_actual), daily_actual[:3] if daily_actual else 'EMPTY')
+
+            payload['daily_revenue'] = {
+                'labels': daily_dates,
+                'actual': daily_actual,
+                'forecast': daily_fore.get('forecast', []),
+                'upper': daily_fore.get('upper', []),
+                'lower': daily_fore.get('lower', []),
+                'confidence': daily_fore.get('confidence', 0),
+                'fallback': bool(daily_fore.get('fallback', False))
+            }
+            
+            # Log what we're returning (safely)
+            try:
+                logger.info('API: Payload daily_revenue contains - labels:%d, actual:%d, forecast:%d',
+                            len(payload['daily_revenue'].get('labels', [])),
+                            len(payload['daily_revenue'].get('actual', [])),
+                            len(payload['daily_revenue'].get('forecast', [])))
+            except Exception as e:
+                logger.exception('Error logging daily_revenue: %s', e)
+
+            # Weekly/monthly: values are already in revenue form
+            payload['weekly_revenue'] = {
+                'labels': [d for d, _ in weekly_series],
+                'actual': [v for _, v in weekly_series],
+                'forecast': weekly_fore.get('forecast', []),
+                'upper': weekly_fore.get('upper', []),
+                'lower': weekly_fore.get('lower', []),
+                'confidence': weekly_fore.get('confidence', 0),
+                'fallback': bool(weekly_fore.get('fallback', False))
+            }
+            payload['monthly_revenue'] = {
+                'labels': [d for d, _ in monthly_series],
+                'actual': [v for _, v in monthly_series],
+                'forecast': monthly_fore.get('forecast', []),
+                'upper': monthly_fore.get('upper', []),
+                'lower': monthly_fore.get('lower', []),
+                'confidence': monthly_fore.get('confidence', 0),
+                'fallback': bool(monthly_fore.get('fallback', False))
+            }
+
+            # Yearly: aggregated forecast across next 12 months (sum of monthly forecasts)
+            payload['yearly_revenue'] = {
+                'labels': [d for d, _ in monthly_series],
+                'actual': [v for _, v in monthly_series],
+                'forecast': year_fore.get('forecast', []),
+                'upper': year_fore.get('upper', []),
+                'lower': year_fore.get('lower', []),
+                'confidence': year_fore.get('confidence', 0),
+                'fallback': bool(year_fore.get('fallback', False))
+            }
+        except Exception:
+            # Best-effort: if construction fails, fall back to plain series already present
+            pass
+
+        return payload
+    except Exception as out_exc:
+        logger.exception('Error building forecast API response: %s', str(out_exc))
+        raise PayloadError({'error': 'Failed to build forecast response', 'details': str(out_exc)})
+
+
+def product_forecast_payload(params):
+    """Build the product_forecast_api payload for a filter set, or None on failure.
+
+    `params` keys: horizon (1, 7 or 30), top (None keeps every product in
+    'top' and 'trending'), product_id, category, search, active, in_stock,
+    min_price, max_price.
+    """
+    from .forecasting import product_forecast_summary
+    from .batch_forecasting import batch_product_forecasts, growth_rate
+
+    horizon = params.get('horizon', 7)
+    top_n = params.get('top')
+    product_id = params.get('product_id')
+    category = params.get('category')
+    search = params.get('search')
+    active_only = params.get('active')
+    in_stock_only = params.get('in_stock')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+
+    products_payload = []
+    try:
+        # Build base queryset with optional filters
+        qs = Product.objects.all().order_by('name')
+        if category:
+            qs = qs.filter(category=category)
+        if search:
+            qs = qs.filter(name__icontains=search)
+        # Apply active filter
+        if active_only in ('1', 'true', 'True'):
+            qs = qs.filter(is_active=True)
+        # Apply price filters
+        if min_price is not None:
+            qs = qs.filter(price__gte=min_price)
+        if max_price is not None:
+            qs = qs.filter(price__lte=max_price)
+        # If in_stock filter requested, narrow queryset to products with inventory quantity > 0
+        if in_stock_only in ('1', 'true', 'True'):
+            qs = qs.filter(inventory_items__quantity__gt=0).distinct()
+
+        # One grouped query for every product's daily series plus one stock probe,
+        # instead of several queries per product.
+        products = list(qs)
+        logger.debug('product_forecast_api: Processing %d products for horizon %d', len(products), horizon)
+        summaries = batch_product_forecasts(products, lookback_days=180)
+
+        h_key = f'h_{horizon}'
+        for p in products:
+            try:
+                summ = summaries.get(p.id)
+                if summ is None:
+                    continue
+                hinfo = summ['horizons'].get(h_key, {'forecast': 0, 'confidence': 0})
+                forecast_h = int(hinfo.get('forecast', 0))
+                last_7 = summ['last_7_days']
+                past_30 = summ['past_30_days']
+
+                # growth: compare the current window to the window right before it
+                if horizon == 30:
+                    growth = growth_rate(past_30, summ['prev_30_days'])
+                else:
+                    growth = growth_rate(last_7, summ['prev_7_days'])
+
+                price = float(p.price) if p.price is not None else 0.0
+                projected_revenue = round(forecast_h * price, 2)
+
+                # Log the first few products to help debug
+                if len(products_payload) < 3:
+                    logger.info('Product %s: forecast_h=%d, last_7=%d, past_30=%d, confidence=%f', 
+                               p.name, forecast_h, last_7, past_30, hinfo.get('confidence', 0))
+            
+                products_payload.append({
+                    'product_id': p.id,
+                    'product': p.name,
+                    'forecast_h': forecast_h,
+                    'confidence': float(hinfo.get('confidence', 0)),
+                    'trend': summ.get('trend', 'stable'),
+                    'last_7_days': last_7,
+                    'past_30_days': past_30,
+                    'avg': summ.get('avg', 0.0),
+                    'growth_rate': growth,
+                    'price': price,
+                    'projected_revenue': projected_revenue,
+                    'category': p.category or '',
+                    'is_active': bool(p.is_active),
+                    'in_stock': bool(summ['in_stock'])
+                })
+            except Exception:
+                logger.exception('Error computing product summary for product id %s', p.id)
+                continue
+    except Exception as e:
+        logger.exception('Error building product forecast payload: %s', str(e))
+        return None
+
+    # Sort by forecast descending
+    products_sorted = sorted(products_payload, key=lambda x: x['forecast_h'], reverse=True)
+
+    # Summary aggregates (respecting filters)
+    total_forecast_units = sum(p['forecast_h'] for p in products_sorted)
+    total_projected_revenue = round(sum(p['projected_revenue'] for p in products_sorted), 2)
+
+    # Trending: sort by growth_rate descending
+    trending_sorted = sorted(products_payload, key=lambda x: x.get('growth_rate', 0.0), reverse=True)
+
+    logger.info('product_forecast_api returning %d/%d top products for horizon %d, total forecast=%d', 
+               len(products_sorted) if top_n is None else min(top_n, len(products_sorted)), len(products_sorted), horizon, total_forecast_units)
+
+    result = {
+        'horizon': horizon,
+        'top': products_sorted if top_n is None else products_sorted[:top_n],
+        'trending': trending_sorted if top_n is None else trending_sorted[:max(10, top_n)],
+        'best': products_sorted[0] if products_sorted else None,
+        'summary': {
+            'total_forecast_units': total_forecast_units,
+            'projected_revenue': total_projected_revenue,
+            'count': len(products_sorted)
+        }
+    }
+
+    # If product_id requested, include detailed series and forecasts
+    if product_id:
+        try:
+            pid = int(product_id)
+            summ = product_forecast_summary(pid, horizons=(1, 7, 30), lookback_days=180)
+            result['product_detail'] = summ
+        except Exception:
+            result['product_detail'] = None
+
+    return result
@@ -0,0 +1,190 @@
+"""Precomputed forecast snapshots.
+
+`precompute()` builds the store-level forecast payloads, the product ranking
+for every category and horizon, and the per-product detail, and stores each
+one as a ForecastSnapshot row. The forecast views read the newest snapshot
+that is younger than FORECAST_SNAPSHOT_MAX_AGE seconds (one indexed
+lookup), and fall back to computing on demand when there is none.
+
+Snapshots are produced by the `precompute_forecasts` command (cron / nightly
+job) or by the optional in-process scheduler started from CoreConfig.ready()
+when FORECAST_PRECOMPUTE_INTERVAL is set.
+"""
+from datetime import timedelta
+import logging
+import random
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import ForecastSnapshot, Product
+
+logger = logging.getLogger(__name__)
+
+HORIZONS = (1, 7, 30)
+# Older snapshots per (scope, key, horizon) beyond this many are deleted
+KEEP = 3
+
+STORE = ForecastSnapshot.SCOPE_STORE
+CATEGORY = ForecastSnapshot.SCOPE_CATEGORY
+PRODUCT = ForecastSnapshot.SCOPE_PRODUCT
+
+
+def max_age():
+    return int(getattr(settings, 'FORECAST_SNAPSHOT_MAX_AGE', 3600))
+
+
+def latest(scope, key='', horizon=0, max_age_seconds=None):
+    """Payload of the newest fresh snapshot, or None."""
+    age = max_age() if max_age_seconds is None else max_age_seconds
+    if age <= 0:
+        return None
+    cutoff = timezone.now() - timedelta(seconds=age)
+    try:
+        return (
+            ForecastSnapshot.objects
+            .filter(scope=scope, key=key, horizon=horizon, generated_at__gte=cutoff)
+            .order_by('-generated_at')
+            .values_list('payload', flat=True)
+            .first()
+        )
+    except Exception:
+        logger.exception('Failed to read forecast snapshot %s:%s', scope, key)
+        return None
+
+
+def store(scope, key, horizon, payload, duration_ms=0):
+    """Save a snapshot and prune older ones for the same slot."""
+    snapshot = ForecastSnapshot.objects.create(
+        scope=scope, key=key, horizon=horizon, payload=payload, duration_ms=duration_ms,
+    )
+    older = list(
+        ForecastSnapshot.objects.filter(scope=scope, key=key, horizon=horizon)
+        .order_by('-generated_at', '-id')
+        .values_list('id', flat=True)[KEEP:]
+    )
+    if older:
+        ForecastSnapshot.objects.filter(id__in=older).delete()
+    return snapshot
+
+
+def forecast_view_payload():
+    """The expensive parts of the forecast page: per-product averages and the three model fits."""
+    from .forecasting import aggregate_sales, forecast_time_series, moving_average_forecast
+
+    daily = aggregate_sales('daily', lookback=60)
+    weekly = aggregate_sales('weekly', lookback=12)
+    monthly = aggregate_sales('monthly', lookback=12)
+    return {
+        'products': moving_average_forecast(window=3),
+        'forecasts': [
+            forecast_time_series(daily, horizon=7, state_key='revenue:daily', period='daily'),
+            forecast_time_series(weekly, horizon=12, state_key='revenue:weekly', period='weekly'),
+            forecast_time_series(monthly, horizon=6, state_key='revenue:monthly', period='monthly'),
+        ],
+    }
+
+
+def precompute(horizons=HORIZONS, products=True, log=None):
+    """Build and store every snapshot; returns the number written.
+
+    `log` is an optional callable receiving one progress line per snapshot.
+    """
+    from .forecast_payloads import forecast_data_payload, product_forecast_payload, PayloadError
+    from .forecasting import product_forecast_summary
+
+    written = 0
+
+    def run(scope, key, horizon, build):
+        nonlocal written
+        started = time.monotonic()
+        try:
+            payload = build()
+        except PayloadError as exc:
+            logger.warning('Skipping snapshot %s:%s h%s: %s', scope, key, horizon, exc.body)
+            return
+        except Exception:
+            logger.exception('Failed to build snapshot %s:%s h%s', scope, key, horizon)
+            return
+        if payload is None:
+            return
+        elapsed = int((time.monotonic() - started) * 1000)
+        store(scope, key, horizon, payload, duration_ms=elapsed)
+        written += 1
+        if log:
+            log(f'{scope}:{key or "*"} h{horizon} ({elapsed} ms)')
+
+    run(STORE, 'forecast_data_api', 0, lambda: forecast_data_payload({}))
+    run(STORE, 'forecast_view', 0, forecast_view_payload)
+
+    categories = sorted(c for c in Product.objects.values_list('category', flat=True).distinct() if c)
+    # '' is the ranking across all categories
+    for category in [''] + categories:
+        for horizon in horizons:
+            run(CATEGORY, category, horizon, lambda c=category, h=horizon: product_forecast_payload(
+                {'horizon': h, 'category': c or None, 'top': None}
+            ))
+
+    if products:
+        for pid in Product.objects.order_by('id').values_list('id', flat=True):
+            run(PRODUCT, str(pid), 0, lambda p=pid: product_forecast_summary(p, horizons=(1, 7, 30), lookback_days=180))
+    return written
+
+
+# ------------------------
+# In-process scheduler
+# ------------------------
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+# Commands that serve requests; everything else (migrate, test, shell, ...) never starts the scheduler
+_SERVER_COMMANDS = ('runserver',)
+
+
+def _is_server_process():
+    # gunicorn workers start it from gunicorn.conf.py (post_worker_init) instead:
+    # with --preload, CoreConfig.ready() runs in the master before the fork.
+    argv0 = sys.argv[0] if sys.argv else ''
+    if 'uwsgi' in argv0:
+        return True
+    return len(sys.argv) > 1 and sys.argv[1] in _SERVER_COMMANDS
+
+
+def _loop(interval):
+    # Spread workers out so they do not all precompute at the same moment
+    time.sleep(random.uniform(0, min(60, interval)))
+    while True:
+        try:
+            close_old_connections()
+            # With a shared cache backend only one worker per interval does the work
+            if cache.add('forecast_snapshots:precompute', 1, timeout=max(1, interval - 5)):
+                count = precompute()
+                logger.info('Scheduled forecast precompute wrote %d snapshots', count)
+        except Exception:
+            logger.exception('Scheduled forecast precompute failed')
+        finally:
+            close_old_connections()
+        time.sleep(interval)
+
+
+def start_scheduler(interval=None, server=None):
+    """Start the background precompute thread once per process (no-op if disabled).
+
+    `server=True` skips the process detection (used by the gunicorn worker hook).
+    """
+    global _scheduler
+    interval = int(getattr(settings, 'FORECAST_PRECOMPUTE_INTERVAL', 0) if interval is None else interval)
+    if interval <= 0 or not (_is_server_process() if server is None else server):
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=_loop, args=(interval,), name='forecast-precompute', daemon=True)
+            _scheduler.start()
+            logger.info('Forecast precompute scheduler running every %ss', interval)
+    return _scheduler
@@ -0,0 +1,259 @@
+"""Persisted, incrementally updated forecast models.
+
+`forecast_time_series(..., method='auto')` used to re-run method selection
+(a 12-point Holt grid plus a regression fit) over the whole series on every
+call. Here the selection runs once per refit and the result is stored in a
+ForecastModelState row: chosen method and parameters, Holt level/trend,
+residual variance and the trailing window of values. When new periods close,
+only those periods are folded into the state, so a forecast costs a handful
+of arithmetic steps per horizon step.
+
+The last point of a series is the current, still-open period (today, this
+week, this month). It is applied to a copy of the state when forecasting and
+never persisted, because its value keeps changing until the period ends.
+
+States are refitted when:
+  * they have been advanced `REFIT_EVERY[period]` times since the last fit,
+  * the requested window differs from the stored one or history has a gap,
+  * a write touched a period the state has already consumed
+    (`invalidate`, called from the rollup refresh).
+
+States are always read from the primary. Inside an analytics scope the
+series may come from a lagging read replica (see replica.py), so the state
+advanced from it is used for that forecast but not saved; otherwise it
+could overwrite a newer `invalidate()` with state built from old data.
+"""
+from datetime import date, timedelta
+import logging
+import math
+
+from dateutil.relativedelta import relativedelta
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils import timezone
+
+from ..models import ForecastModelState
+from . import replica
+from .regression import fit_line
+
+logger = logging.getLogger(__name__)
+
+REFIT_EVERY = {'daily': 28, 'weekly': 8, 'monthly': 3}
+
+# Holt parameters tracked for methods other than 'holt', so switching method
+# at the next refit starts from a warm level/trend
+DEFAULT_HOLT = {'alpha': 0.6, 'beta': 0.1}
+
+
+def period_end(label, period):
+    """Last calendar day covered by a series label."""
+    if period == 'monthly':
+        start = date.fromisoformat(f'{label}-01')
+        return start + relativedelta(months=1) - timedelta(days=1)
+    start = date.fromisoformat(label)
+    return start + timedelta(days=6) if period == 'weekly' else start
+
+
+def invalidate(since):
+    """Mark states that already consumed data dated on/after `since` for refit."""
+    if since is None:
+        qs = ForecastModelState.objects.all()
+    else:
+        qs = ForecastModelState.objects.filter(last_date__gte=since)
+    try:
+        with transaction.atomic():
+            return qs.filter(stale=False).update(stale=True)
+    except Exception:
+        # Never let forecast bookkeeping break the write that triggered it
+        logger.exception('Failed to invalidate forecast states since %s', since)
+        return 0
+
+
+class _Model:
+    """In-memory view of a state row; `advance` folds in one observation."""
+
+    def __init__(self, method, params, window_size, level=0.0, trend=0.0, residual_var=0.0,
+                 observations=0, window=None):
+        self.method = method
+        self.params = dict(params or {})
+        self.window_size = window_size
+        self.level = level
+        self.trend = trend
+        self.residual_var = residual_var
+        self.observations = observations
+        self.window = list(window or [])
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.method, row.params, row.window_size, row.level, row.trend, row.residual_var,
+                   row.observations, row.window)
+
+    def to_row(self, row):
+        row.method = self.method
+        row.params = self.params
+        row.window_size = self.window_size
+        row.level = self.level
+        row.trend = self.trend
+        row.residual_var = self.residual_var
+        row.observations = self.observations
+        row.window = self.window
+
+    def advance(self, value):
+        value = float(value)
+        alpha = self.params.get('alpha', DEFAULT_HOLT['alpha'])
+        beta = self.params.get('beta', DEFAULT_HOLT['beta'])
+        # Same recursion and initialisation as _holt_linear_forecast
+        if self.observations == 0:
+            self.level, self.trend, residual = value, 0.0, 0.0
+        else:
+            if self.observations == 1:
+                self.trend = value - self.level
+            prev_level = self.level
+            self.level = alpha * value + (1 - alpha) * (prev_level + self.trend)
+            self.trend = beta * (self.level - prev_level) + (1 - beta) * self.trend
+            residual = value - self.level
+        self.observations += 1
+        self.residual_var += (residual * residual - self.residual_var) / self.observations
+        self.window.append(value)
+        if len(self.window) > self.window_size:
+            del self.window[:len(self.window) - self.window_size]
+
+    def copy(self):
+        return _Model(self.method, self.params, self.window_size, self.level, self.trend,
+                      self.residual_var, self.observations, self.window)
+
+
+def _accuracy(confidence):
+    if confidence >= 70:
+        return 'High'
+    if confidence >= 40:
+        return 'Medium'
+    return 'Low'
+
+
+def _dispersion_confidence(std, values):
+    avg = (sum(values) / len(values)) if values else 0.0
+    if avg <= 0:
+        return 0.0
+    return max(0.0, min(100.0, (1.0 - std / (avg + 1e-9)) * 100.0))
+
+
+def _band(preds, std):
+    upper = [int(round(p + 1.5 * std)) for p in preds]
+    lower = [max(0, int(round(p - 1.5 * std))) for p in preds]
+    return upper, lower
+
+
+def _predict(model, horizon):
+    """Forecast payload in the shape returned by forecast_time_series."""
+    values = model.window
+    method = model.method if len(values) >= 2 else 'ma'
+
+    if method == 'holt':
+        preds = [max(0, int(round(model.level + model.trend * (i + 1)))) for i in range(horizon)]
+        std = math.sqrt(model.residual_var)
+        confidence = round(_dispersion_confidence(std, values), 2)
+    elif method == 'linear':
+        n = len(values)
+        line = fit_line(values)
+        preds = [max(0, int(round(p))) for p in line.predict_range(n, n + horizon)]
+        std = line.std
+        confidence = max(0.0, min(100.0, line.r2 * 100))
+    else:
+        window = int(model.params.get('window', 3) or 3)
+        recent = values[-window:]
+        if len(recent) >= 2:
+            line = fit_line(recent)
+            slope = line.slope
+            ordered = sorted(recent)
+            mid = len(ordered) // 2
+            base = ordered[mid] if len(ordered) % 2 else (ordered[mid - 1] + ordered[mid]) / 2.0
+            std = line.std
+        else:
+            base = sum(values) / len(values) if values else 0.0
+            slope = 0.0
+            residuals = [v - base for v in values]
+            std = math.sqrt(sum(r * r for r in residuals) / len(residuals)) if residuals else 0.0
+        preds = [max(0, int(round(base + slope * (i + 1)))) for i in range(horizon)]
+        confidence = round(_dispersion_confidence(std, values), 2)
+
+    upper, lower = _band(preds, std)
+    return {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': confidence,
+            'accuracy': _accuracy(confidence), 'method': method}
+
+
+def _fit(row, key, closed, window_size, period):
+    from .forecasting import select_best_forecasting_method
+
+    values = [float(v) for _, v in closed]
+    try:
+        method, params, diagnostics = select_best_forecasting_method(values)
+    except Exception:
+        logger.exception('Method selection failed for %s; using moving average', key)
+        method, params, diagnostics = 'ma', {'window': 3}, {}
+    model_params = dict(DEFAULT_HOLT)
+    model_params.update(params or {})
+    model = _Model(method, model_params, window_size)
+    for v in values:
+        model.advance(v)
+
+    if row is None:
+        row = ForecastModelState(key=key)
+    model.to_row(row)
+    row.last_label = closed[-1][0]
+    row.last_date = period_end(closed[-1][0], period)
+    row.steps_since_fit = 0
+    row.stale = False
+    row.diagnostics = {k: (v if v != float('inf') else None) for k, v in (diagnostics.get('scores') or {}).items()}
+    row.fitted_at = timezone.now()
+    return row, model
+
+
+def _save(row):
+    try:
+        with transaction.atomic():
+            row.save()
+    except IntegrityError:
+        # A concurrent request stored the same series first; its state is as good
+        logger.debug('Forecast state %s was created concurrently', row.key)
+
+
+def incremental_forecast(key, series, horizon=7, period='daily'):
+    """Forecast `series` ((label, value) pairs, oldest first) from the stored state `key`.
+
+    Returns None when the series is too short to keep state for; callers
+    then fall back to the stateless path.
+    """
+    if not series or len(series) < 2:
+        return None
+    closed, current = series[:-1], series[-1]
+    window_size = len(series)
+
+    row = ForecastModelState.objects.using(DEFAULT_DB_ALIAS).filter(key=key).first()
+    # A series read from the replica must not become the stored state
+    persist = not replica.active()
+    refit = row is None or row.stale or row.window_size != window_size or row.last_label < closed[0][0]
+    new_points = []
+    if not refit:
+        new_points = [(label, v) for label, v in closed if label > row.last_label]
+        refit = row.steps_since_fit + len(new_points) >= REFIT_EVERY.get(period, REFIT_EVERY['daily'])
+
+    if refit:
+        row, model = _fit(row, key, closed, window_size, period)
+        if persist:
+            _save(row)
+    else:
+        model = _Model.from_row(row)
+        if new_points:
+            for _, v in new_points:
+                model.advance(v)
+            model.to_row(row)
+            row.last_label = new_points[-1][0]
+            row.last_date = period_end(row.last_label, period)
+            row.steps_since_fit += len(new_points)
+            if persist:
+                _save(row)
+
+    # The open period is applied to a throwaway copy only
+    model = model.copy()
+    model.advance(current[1])
+    return _predict(model, horizon)
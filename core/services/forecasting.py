@@ -2,66 +2,28 @@ from datetime import date, timedelta
 from collections import defaultdict
 import os
 import logging
-from ..models import Sale, Product
+from ..models import Sale, Product, DailyProductSales
 from django.db.models import Sum
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
-
-# NOTE: numpy, pandas and scikit-learn are optional runtime dependencies used
-# for CSV-based helpers and linear-regression forecasts. Importing them at
-# module import time caused some deployed instances to raise ImportError and
-# produce a Server Error (500) when those packages weren't available. To be
-# resilient we import heavy numeric libs only inside the functions that need
-# them and provide safe fallbacks when they're missing.
+from .regression import fit_line, fit_lines
+
+# NOTE: numpy and pandas are optional runtime dependencies used for CSV-based
+# helpers. Importing them at module import time caused some deployed instances
+# to raise ImportError and produce a Server Error (500) when those packages
+# weren't available. To be resilient we import heavy numeric libs only inside
+# the functions that need them and provide safe fallbacks when they're missing.
+# Trend lines are fitted in closed form by services/regression.py, which needs
+# neither numpy nor scikit-learn.
 logger = logging.getLogger(__name__)
 
-# Attempt to detect scikit-learn availability lazily in a safe, cached way.
-# Some environments may not have compiled sklearn or importing it can be heavy
-# and cause worker memory spikes — detect availability once and gracefully
-# fall back to light-weight methods when unavailable.
-_SKLEARN_AVAILABLE = None
-_LinearRegression = None
-
-def _check_sklearn_available():
-    global _SKLEARN_AVAILABLE, _LinearRegression
-    if _SKLEARN_AVAILABLE is not None:
-        return _SKLEARN_AVAILABLE
-    try:
-        # Perform a lightweight import and cache the class reference.
-        from sklearn.linear_model import LinearRegression as _LR
-        _LinearRegression = _LR
-        _SKLEARN_AVAILABLE = True
-    except Exception as exc:  # pragma: no cover - environment dependent
-        _SKLEARN_AVAILABLE = False
-        _LinearRegression = None
-        logger.warning('scikit-learn unavailable or failed to import: %s', exc)
-    return _SKLEARN_AVAILABLE
-
 # Cap per-sale units so single bad rows don't dominate forecasts
 MAX_UNITS_PER_SALE = 100
 
 def load_csv_data(csv_path=None):
-    """Load sales data from CSV file"""
-    if csv_path is None:
-        csv_path = os.path.join(os.path.dirname(__file__), '../../pizzaplace.csv')
-    
-    if not os.path.exists(csv_path):
-        return None
-    
-    try:
-        # Import pandas only when CSV helpers are invoked
-        import pandas as pd
-    except Exception as exc:  # pragma: no cover - environment-dependent
-        logger.exception('Pandas unavailable; CSV helpers disabled: %s', exc)
-        return None
-
-    try:
-        df = pd.read_csv(csv_path)
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-    except Exception as e:
-        logger.exception('Error loading CSV: %s', e)
-        return None
+    """Load sales data from CSV file (served from the columnar cache in services/csv_store.py)"""
+    from .csv_store import load_frame
+    return load_frame(csv_path)
 
 
 def csv_aggregate_series(limit=100):
@@ -70,40 +32,13 @@ def csv_aggregate_series(limit=100):
     Returns dict with keys 'daily', 'weekly', 'monthly' where each value is a list of
     (label, units) tuples ordered chronologically (oldest -> newest).
     """
-    df = load_csv_data()
-    if df is None or df.empty:
+    from .csv_store import aggregate_counts, load_table
+    try:
+        return aggregate_counts(load_table(), limit=limit)
+    except Exception:
+        logger.exception('Aggregating CSV series failed')
         return {'daily': [], 'weekly': [], 'monthly': []}
 
-    # Ensure date column is datetime and sort by date
-    df = df.sort_values('date')
-
-    # Limit to `limit` most recent rows
-    if limit is not None:
-        df = df.tail(limit)
-
-    # DAILY: count rows per date
-    daily = df.groupby(df['date'].dt.date).size().reset_index(name='units')
-    # Fill missing days between min and max date with zeros for nicer charts
-    min_d = daily['date'].min()
-    max_d = daily['date'].max()
-    all_dates = pd.date_range(start=min_d, end=max_d, freq='D')
-    daily = daily.set_index('date').reindex(all_dates, fill_value=0).rename_axis('date').reset_index()
-    daily_series = [(row['date'].date().isoformat(), int(row['units'])) for _, row in daily.iterrows()]
-
-    # WEEKLY: group by week starting Monday
-    df_week = df.copy()
-    df_week['week_start'] = df_week['date'].dt.to_period('W').apply(lambda r: r.start_time.date())
-    weekly = df_week.groupby('week_start').size().reset_index(name='units')
-    weekly_series = [(row['week_start'].isoformat(), int(row['units'])) for _, row in weekly.iterrows()]
-
-    # MONTHLY: group by year-month
-    df_month = df.copy()
-    df_month['month'] = df_month['date'].dt.to_period('M').apply(lambda r: r.start_time.date())
-    monthly = df_month.groupby('month').size().reset_index(name='units')
-    monthly_series = [(row['month'].strftime('%Y-%m'), int(row['units'])) for _, row in monthly.iterrows()]
-
-    return {'daily': daily_series, 'weekly': weekly_series, 'monthly': monthly_series}
-
 def get_csv_forecast(csv_path=None, limit=100):
     """
     Train ML model on CSV data and return forecasts for each product.
@@ -125,36 +60,25 @@ def get_csv_forecast(csv_path=None, limit=100):
     
     results = {}
     
-    # Group by product name
-    # Try to import numeric libs lazily; if they're not present return empty results
-    try:
-        import numpy as np
-        from sklearn.linear_model import LinearRegression
-    except Exception as exc:  # pragma: no cover - only triggers when libs absent
-        logger.exception('Numeric libs unavailable for CSV forecasting: %s', exc)
-        return {}
-
+    # Group by product name; products with fewer than 3 days are skipped
+    groups = []
     for product_name, group in df.groupby('name'):
         # Count units sold per day
         daily_sales = group.groupby('date').size().reset_index(name='units')
-        
-        if len(daily_sales) < 3:
-            continue
-        
-        # Prepare training data
-        X = np.arange(len(daily_sales)).reshape(-1, 1)
-        y = daily_sales['units'].values
+        if len(daily_sales) >= 3:
+            groups.append((product_name, daily_sales))
+
+    # One batched closed-form fit for every product's trend line
+    lines = fit_lines([daily_sales['units'].tolist() for _, daily_sales in groups])
 
-        # Train linear regression model
-        model = LinearRegression()
-        model.fit(X, y)
+    for (product_name, daily_sales), line in zip(groups, lines):
+        y = daily_sales['units'].values
 
         # Get forecast for next day
-        next_day = np.array([[len(daily_sales)]])
-        forecast = max(1, int(model.predict(next_day)[0]))
+        forecast = max(1, int(line.predict(len(daily_sales))))
         
         # Calculate trend
-        slope = model.coef_[0]
+        slope = line.slope
         if slope > 0.5:
             trend = "increasing"
         elif slope < -0.5:
@@ -163,7 +87,7 @@ def get_csv_forecast(csv_path=None, limit=100):
             trend = "stable"
         
         # Calculate confidence (R² score as percentage, with minimum threshold)
-        r_squared = model.score(X, y)
+        r_squared = line.r2
         
         # Convert R² to percentage (0-100)
         # If R² is negative, it means the model is worse than a simple mean, so set to 0
@@ -213,6 +137,8 @@ def moving_average_forecast(window=3, lookback_days=21):
     Simple moving average over last `window` sales entries within `lookback_days`.
     Outlier protection: cap per-sale units at `MAX_UNITS_PER_SALE` before averaging so a
     single large sale doesn't dominate the forecast.
+    Reads the DailyProductSales rollup: each day stands for its `order_count` sale
+    lines, each with the day's average units per line.
     """
     from django.utils import timezone
     try:
@@ -220,11 +146,15 @@ def moving_average_forecast(window=3, lookback_days=21):
     except Exception:
         today = timezone.now().date()
     start = today - timedelta(days=lookback_days)
-    sales = Sale.objects.filter(date__gte=start).order_by("product_id", "date")
+    rows = DailyProductSales.objects.filter(date__gte=start).order_by("product_id", "date").values_list(
+        "product_id", "date", "units", "order_count"
+    )
     series = defaultdict(list)
 
-    for s in sales:
-        series[s.product_id].append((s.date, s.units_sold))
+    for pid, d, units, lines in rows:
+        lines = max(int(lines or 0), 1)
+        per_line = units // lines if units % lines == 0 else units / lines
+        series[pid].extend([(d, per_line)] * lines)
 
     results = {}
     for pid, hist in series.items():
@@ -269,9 +199,9 @@ def moving_average_forecast(window=3, lookback_days=21):
 
         # Apply cap if determined, otherwise use raw values
         if cap:
-            capped = [min(int(u), cap) for u in recent]
+            capped = [min(u, cap) for u in recent]
         else:
-            capped = [int(u) for u in recent]
+            capped = list(recent)
 
         # Use trimmed mean when there are at least 3 points for robustness
         if len(capped) >= 3:
@@ -324,6 +254,7 @@ def moving_average_forecast(window=3, lookback_days=21):
 def aggregate_sales(period='daily', lookback=90):
     """
     Aggregate sales into time series returning REVENUE (not units).
+    Reads the DailyProductSales rollup rather than raw Sale rows.
     period: 'daily', 'weekly', or 'monthly'
     lookback: number of days (for daily), weeks (for weekly), months (for monthly)
     Returns list of (label, revenue) ordered chronologically.
@@ -342,9 +273,9 @@ def aggregate_sales(period='daily', lookback=90):
         # Initialize dict with zeros for all dates in range
         counts = { (start + timedelta(days=i)): 0.0 for i in range(lookback) }
         # Aggregate REVENUE (sum of revenue field)
-        qs = Sale.objects.filter(date__gte=start).values('date').annotate(
+        qs = DailyProductSales.objects.filter(date__gte=start).values('date').annotate(
             total=Sum('revenue')
-        )
+        ).order_by()
         for row in qs:
             d = row['date']
             counts[d] = float(row['total'] or 0.0)
@@ -365,9 +296,9 @@ def aggregate_sales(period='daily', lookback=90):
             weeks.append(wk_start)
         counts = { w: 0.0 for w in weeks }
         # Aggregate REVENUE instead of units
-        qs = Sale.objects.filter(date__gte=weeks[0]).values('date').annotate(
+        qs = DailyProductSales.objects.filter(date__gte=weeks[0]).values('date').annotate(
             total=Sum('revenue')
-        )
+        ).order_by()
         for row in qs:
             d = row['date']
             wk_start = d - timedelta(days=d.weekday())
@@ -386,9 +317,9 @@ def aggregate_sales(period='daily', lookback=90):
             cur = (cur + relativedelta(months=1)).replace(day=1)
         counts = { m: 0.0 for m in months }
         # Aggregate REVENUE instead of units
-        qs = Sale.objects.filter(date__gte=months[0]).values('date').annotate(
+        qs = DailyProductSales.objects.filter(date__gte=months[0]).values('date').annotate(
             total=Sum('revenue')
-        )
+        ).order_by()
         for row in qs:
             d = row['date']
             m = d.replace(day=1)
@@ -401,7 +332,7 @@ def aggregate_sales(period='daily', lookback=90):
     return series
 
 
-def forecast_time_series(series, horizon=7, method='auto', window=3):
+def forecast_time_series(series, horizon=7, method='auto', window=3, state_key=None, period='daily'):
     """
     Given a time series list of (label, value), produce a forecast for `horizon` steps ahead.
 
@@ -411,22 +342,21 @@ def forecast_time_series(series, horizon=7, method='auto', window=3):
       - 'holt': Holt's linear exponential smoothing (captures trend)
       - 'ma': moving-average style (robust to outliers)
 
+    With `state_key` (and method 'auto') the fitted model is persisted under
+    that key and only advanced by newly closed periods on later calls; see
+    services/forecast_state.py. `period` ('daily', 'weekly', 'monthly')
+    describes the series labels.
+
     Returns dict with keys: 'forecast' (list), 'upper', 'lower', 'confidence', 'accuracy'
     """
-    # Import numeric libs lazily and tolerate their absence
-    try:
-        import numpy as np
-    except Exception:
-        np = None
-
-    # Use cached sklearn availability checker to avoid expensive imports per-request
-    sklearn_ok = False
-    try:
-        sklearn_ok = _check_sklearn_available()
-    except Exception as exc:
-        sklearn_ok = False
-        logger.warning('Error checking sklearn availability: %s', exc)
-    LinearRegression = _LinearRegression if sklearn_ok else None
+    if state_key and method == 'auto':
+        try:
+            from .forecast_state import incremental_forecast
+            result = incremental_forecast(state_key, series, horizon=horizon, period=period)
+            if result is not None:
+                return result
+        except Exception:
+            logger.exception('Incremental forecast for %s failed; fitting from scratch', state_key)
 
     values = [v for _, v in series]
     n = len(values)
@@ -434,6 +364,7 @@ def forecast_time_series(series, horizon=7, method='auto', window=3):
         return {'forecast': [0] * horizon, 'upper': [0] * horizon, 'lower': [0] * horizon, 'confidence': 0}
 
     # If the caller asked for 'auto', perform a lightweight model selection
+    params = {}
     if method == 'auto':
         try:
             chosen, params, diag = select_best_forecasting_method(values, horizon=horizon)
@@ -445,47 +376,35 @@ def forecast_time_series(series, horizon=7, method='auto', window=3):
     if n < 2:
         method = 'ma'
 
-    # Linear regression approach
+    # Linear regression approach (closed-form least squares, see services/regression.py)
     if method == 'linear':
-        # If numpy or sklearn is not available, fall back to MA and log
-        if (np is None) or (LinearRegression is None):
-            logger.info('Linear method requested but numpy/sklearn unavailable; falling back to moving-average')
+        try:
+            line = fit_line(values)
+            preds = [max(0, int(round(p))) for p in line.predict_range(n, n + horizon)]
+            std = line.std
+            upper = [int(round(p + 1.5 * std)) for p in preds]
+            lower = [max(0, int(round(p - 1.5 * std))) for p in preds]
+
+            confidence = max(0.0, min(100.0, line.r2 * 100))
+            if confidence >= 70:
+                accuracy = 'High'
+            elif confidence >= 40:
+                accuracy = 'Medium'
+            else:
+                accuracy = 'Low'
+
+            return {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': confidence, 'accuracy': accuracy}
+        except Exception as exc:
+            logger.exception('Linear model failed; falling back to moving-average: %s', exc)
             method = 'ma'
-        else:
-            try:
-                X = np.arange(n).reshape(-1, 1)
-                y = np.array(values, dtype=float)
-                model = LinearRegression()
-                model.fit(X, y)
-                r2 = model.score(X, y)
-
-                future_X = np.arange(n, n + horizon).reshape(-1, 1)
-                preds = model.predict(future_X)
-                preds = [max(0, int(round(float(p)))) for p in preds]
-
-                resid = y - model.predict(X)
-                std = float(resid.std()) if len(resid) > 1 else max(1.0, float(y.std() if y.size else 1.0))
-                upper = [int(round(p + 1.5 * std)) for p in preds]
-                lower = [max(0, int(round(p - 1.5 * std))) for p in preds]
-
-                confidence = max(0.0, min(100.0, r2 * 100))
-                if confidence >= 70:
-                    accuracy = 'High'
-                elif confidence >= 40:
-                    accuracy = 'Medium'
-                else:
-                    accuracy = 'Low'
-
-                return {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': confidence, 'accuracy': accuracy}
-            except Exception as exc:
-                logger.exception('Linear model failed; falling back to moving-average: %s', exc)
-                method = 'ma'
 
     # Holt's method
     if method == 'holt':
         try:
-            # Allow params from selection by re-running a short grid if desired
-            preds, residuals = _holt_linear_forecast(values, horizon=horizon, alpha=0.6, beta=0.1)
+            # Reuse the parameters chosen by the selection backtest
+            preds, residuals = _holt_linear_forecast(
+                values, horizon=horizon, alpha=params.get('alpha', 0.6), beta=params.get('beta', 0.1)
+            )
             std = (sum([r * r for r in residuals]) / len(residuals)) ** 0.5 if residuals else 0.0
             upper = [int(round(p + 1.5 * std)) for p in preds]
             lower = [max(0, int(round(p - 1.5 * std))) for p in preds]
@@ -511,22 +430,14 @@ def forecast_time_series(series, horizon=7, method='auto', window=3):
         # Use median of recent values and estimate a simple slope if possible
         recent = values[-window:] if window and len(values) >= 1 else values
         if recent and len(recent) >= 2:
-            # try a small trend estimate
+            # try a small trend estimate around the median of the recent values
             try:
-                if np is not None and LinearRegression is not None:
-                    rx = np.arange(len(recent)).reshape(-1, 1)
-                    ry = np.array(recent, dtype=float)
-                    tm = LinearRegression(); tm.fit(rx, ry)
-                    slope = float(tm.coef_[0])
-                    base = float(np.median(recent)) if np is not None else (sum(recent) / len(recent))
-                    preds = [max(0, int(round(base + slope * (i + 1)))) for i in range(horizon)]
-                    residuals = (ry - tm.predict(rx)).tolist()
-                else:
-                    # fallback simple slope estimate
-                    slope = float(recent[-1] - recent[0]) / (len(recent) - 1)
-                    base = sum(recent) / len(recent)
-                    preds = [max(0, int(round(base + slope * (i + 1)))) for i in range(horizon)]
-                    residuals = [float(v - base) for v in recent]
+                import statistics
+                tm = fit_line(recent)
+                slope = tm.slope
+                base = float(statistics.median(recent))
+                preds = [max(0, int(round(base + slope * (i + 1)))) for i in range(horizon)]
+                residuals = tm.residuals(recent)
             except Exception:
                 base = sum(recent) / len(recent)
                 preds = [max(0, int(round(base))) for _ in range(horizon)]
@@ -554,11 +465,7 @@ def forecast_time_series(series, horizon=7, method='auto', window=3):
         else:
             accuracy = 'Low'
 
-        result = {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': round(confidence, 2), 'accuracy': accuracy}
-        if not sklearn_ok:
-            result['fallback'] = True
-            result['fallback_reason'] = 'sklearn_unavailable'
-        return result
+        return {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': round(confidence, 2), 'accuracy': accuracy}
     except Exception:
         return {'forecast': [0] * horizon, 'upper': [0] * horizon, 'lower': [0] * horizon, 'confidence': 0}
 
@@ -625,7 +532,6 @@ def product_daily_series(product_id, lookback_days=90):
     Fills missing days with zeros for the requested lookback window.
     """
     from datetime import timedelta
-    from django.db.models import Sum, Case, When, Value, IntegerField
     from django.utils import timezone
     
     try:
@@ -637,17 +543,10 @@ def product_daily_series(product_id, lookback_days=90):
     # Initialize all days to zero
     counts = { (start + timedelta(days=i)): 0 for i in range(lookback_days) }
 
-    qs = Sale.objects.filter(product_id=product_id, date__gte=start).values('date').annotate(
-        total=Sum(Case(
-            When(units_sold__gt=MAX_UNITS_PER_SALE, then=Value(MAX_UNITS_PER_SALE)),
-            default='units_sold',
-            output_field=IntegerField()
-        ))
-    )
-    for row in qs:
-        d = row['date']
-        if d >= start and d <= end:
-            counts[d] = counts.get(d, 0) + int(row.get('total') or 0)
+    # capped_units already applies the MAX_UNITS_PER_SALE cap per sale line
+    qs = DailyProductSales.objects.filter(product_id=product_id, date__gte=start, date__lte=end).values_list('date', 'capped_units')
+    for d, units in qs:
+        counts[d] = counts.get(d, 0) + int(units or 0)
     series = [(d.isoformat(), counts[d]) for d in sorted(counts.keys())]
     return series
 
@@ -815,12 +714,23 @@ def _moving_average_forecast_simple(values, horizon=7, window=3):
 def select_best_forecasting_method(values, horizon=7):
     """Simple backtest to select among ['linear', 'holt', 'ma'] using MAPE on a holdout.
     Returns tuple (best_method_name, best_params_dict, diagnostics)
+
+    Uses the vectorised kernel in services/model_selection.py when numpy is
+    available and the loop below otherwise.
     """
     # require at least 4 points to meaningfully evaluate; otherwise prefer MA
     n = len(values)
     if n < 4:
         return 'ma', {'window': 3}, {'reason': 'too short, using MA'}
 
+    try:
+        import numpy  # noqa: F401
+    except Exception:
+        pass
+    else:
+        from .model_selection import select_methods
+        return select_methods([values])[0]
+
     # holdout size: min( max(1, int(20% of n)), 7 )
     holdout = min(max(1, int(round(n * 0.2))), 7)
     train = values[:-holdout]
@@ -828,16 +738,9 @@ def select_best_forecasting_method(values, horizon=7):
 
     results = {}
 
-    # Try linear regression if available
+    # Linear trend fitted in closed form
     try:
-        import numpy as _np  # noqa: N813 - local import
-        from sklearn.linear_model import LinearRegression as _LR
-        X_train = _np.arange(len(train)).reshape(-1, 1)
-        y_train = _np.array(train, dtype=float)
-        model = _LR()
-        model.fit(X_train, y_train)
-        X_test = _np.arange(len(train), len(train) + holdout).reshape(-1, 1)
-        preds = model.predict(X_test).tolist()
+        preds = fit_line(train).predict_range(len(train), len(train) + holdout)
         preds = [max(0, int(round(float(p)))) for p in preds]
         results['linear'] = _mape(test, preds)
     except Exception:
@@ -0,0 +1,154 @@
+"""Product image derivatives.
+
+Uploads are fingerprinted (SHA-256 of the original) and resized with Pillow
+into a small set of variants, each stored as WebP plus a JPEG/PNG fallback
+under products/derivatives/<hash>/. The hash and the stored names live on
+the product (image_hash / image_derivatives), so URLs built from them change
+whenever the image does and can be cached by browsers indefinitely.
+
+Pillow is optional at runtime: without it (or for files it cannot decode)
+only the hash is recorded and the original is served for every variant.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> longest edge in pixels
+VARIANTS = {
+    'thumb': 320,
+    'medium': 800,
+}
+ORIGINAL = 'original'
+DERIVATIVE_DIR = 'products/derivatives'
+WEBP_QUALITY = 80
+JPEG_QUALITY = 85
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+
+def content_hash(fileobj, chunk_size=64 * 1024):
+    """Hex SHA-256 of a file object, read in chunks."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def short_hash(product):
+    """The part of the image hash used in URLs and ETags."""
+    return (product.image_hash or '')[:16]
+
+
+def _encode(img, fmt):
+    buf = io.BytesIO()
+    if fmt == 'webp':
+        img.save(buf, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'png':
+        img.save(buf, 'PNG', optimize=True)
+    else:
+        img.convert('RGB').save(buf, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _build(fileobj, digest):
+    """Resize every variant; returns {variant: {format: storage name}}."""
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        logger.warning('Pillow is not installed; serving original product images only')
+        return {}
+
+    with Image.open(fileobj) as source:
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+        source = source.convert('RGBA' if has_alpha else 'RGB')
+        formats = (['webp'] if features.check('webp') else []) + ['png' if has_alpha else 'jpeg']
+
+        derivatives = {}
+        for variant, edge in VARIANTS.items():
+            img = source.copy()
+            img.thumbnail((edge, edge), Image.LANCZOS)
+            stored = {}
+            for fmt in formats:
+                name = f'{DERIVATIVE_DIR}/{digest[:16]}/{variant}.{"jpg" if fmt == "jpeg" else fmt}'
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                stored[fmt] = default_storage.save(name, ContentFile(_encode(img, fmt)))
+            derivatives[variant] = stored
+    return derivatives
+
+
+def delete_derivatives(derivatives, keep=()):
+    """Remove stored derivative files, except names in `keep`."""
+    for stored in (derivatives or {}).values():
+        for name in stored.values():
+            if name in keep:
+                continue
+            try:
+                default_storage.delete(name)
+            except Exception:
+                logger.warning('Could not delete image derivative %s', name)
+
+
+def process_image(product):
+    """Hash the product's image and (re)build its derivatives; saves the product.
+
+    Returns True when derivatives were written.
+    """
+    old = product.image_derivatives or {}
+    if not product.image:
+        digest, derivatives = '', {}
+    else:
+        with product.image.open('rb') as fh:
+            digest = content_hash(fh)
+            if digest == product.image_hash and old:
+                return False
+            try:
+                derivatives = _build(fh, digest)
+            except Exception:
+                logger.exception('Could not build derivatives for product %s', product.pk)
+                derivatives = {}
+
+    delete_derivatives(old, keep={name for stored in derivatives.values() for name in stored.values()})
+    product.image_hash = digest
+    product.image_derivatives = derivatives
+    product.save(update_fields=['image_hash', 'image_derivatives'])
+    return bool(derivatives)
+
+
+def image_url(product, variant='thumb'):
+    """Content-addressed URL for a product image variant, or None without an image."""
+    if not product.image:
+        return None
+    if not product.image_hash:
+        return reverse('product_image', args=[product.pk])
+    return reverse('product_image_variant', args=[product.pk, short_hash(product), variant])
+
+
+def accepts_webp(request):
+    return 'image/webp' in request.META.get('HTTP_ACCEPT', '')
+
+
+def resolve(product, variant, webp=False):
+    """Storage name and content type to serve for `variant`; falls back to the original."""
+    stored = (product.image_derivatives or {}).get(variant) or {}
+    if webp and 'webp' in stored:
+        return stored['webp'], CONTENT_TYPES['webp']
+    for fmt in ('jpeg', 'png'):
+        if fmt in stored:
+            return stored[fmt], CONTENT_TYPES[fmt]
+    name = product.image.name
+    return name, mimetypes.guess_type(name)[0] or 'image/jpeg'
@@ -0,0 +1,234 @@
+"""Hour-of-day x weekday demand, kept in the HourlyProductDemand cube.
+
+Every Sale adds its units, revenue and one line to the cell of its product,
+local weekday and hour. Unlike the daily rollup (rollups.py), a cell spans
+all of history, so recomputing it would scan every sale of the product.
+Writes therefore apply deltas instead:
+  * the Sale signals subtract the stored version of an edited or deleted
+    sale and add the new one,
+  * checkout and the bulk importer pass the rows they inserted.
+Touched cells are created if missing and then incremented by a single
+UPDATE ... SET units = units + CASE ... per batch of cells.
+`rebuild_hourly_demand()` recomputes the cube from Sale.timestamp, for
+example after raw SQL writes or a TIME_ZONE change.
+
+Reads touch at most 7 x 24 rows per product:
+  * `heatmap()` returns totals and averages per trading day for every
+    weekday/hour, plus the peak hours.
+  * `hourly_forecast()` spreads the next day's forecast total (the usual
+    daily model over DailyProductSales) across hours by that weekday's
+    share of each hour.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+import logging
+
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+
+from ..models import DailyProductSales, HourlyProductDemand, Sale
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+HOURS = 24
+# Daily history fed to the next-day total forecast
+FORECAST_LOOKBACK_DAYS = 90
+
+
+def cell(timestamp):
+    """(weekday, hour) of a timestamp in the current time zone; weekday 0 is Monday."""
+    if isinstance(timestamp, str):
+        timestamp = Sale._meta.get_field('timestamp').to_python(timestamp)
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    local = timezone.localtime(timestamp)
+    return local.weekday(), local.hour
+
+
+def _deltas(added, removed):
+    totals = defaultdict(lambda: [0, Decimal('0'), 0])
+    for entries, sign in ((added, 1), (removed, -1)):
+        for product_id, timestamp, units, revenue in entries:
+            if product_id is None or timestamp is None:
+                continue
+            delta = totals[(product_id, *cell(timestamp))]
+            delta[0] += sign * int(units or 0)
+            delta[1] += sign * Decimal(str(revenue or 0))
+            delta[2] += sign
+    return {key: d for key, d in totals.items() if any(d)}
+
+
+def _increment(field, deltas, index, output_field):
+    whens = [
+        When(product_id=pid, weekday=weekday, hour=hour, then=Value(delta[index]))
+        for (pid, weekday, hour), delta in deltas
+    ]
+    return F(field) + Case(*whens, default=Value(0), output_field=output_field)
+
+
+def record(added=(), removed=()):
+    """Apply sales to the cube; entries are (product_id, timestamp, units, revenue) tuples.
+
+    Per chunk of cells: one INSERT of the missing cells (ignoring ones that
+    exist) and one UPDATE adding every delta, so concurrent writers never
+    lose an increment. Returns the number of cells touched.
+    """
+    deltas = sorted(_deltas(added, removed).items())
+    # Keep each statement's parameter count bounded
+    chunk = 200
+    for i in range(0, len(deltas), chunk):
+        part = deltas[i:i + chunk]
+        HourlyProductDemand.objects.bulk_create(
+            [HourlyProductDemand(product_id=pid, weekday=weekday, hour=hour) for (pid, weekday, hour), _ in part],
+            ignore_conflicts=True,
+        )
+        cells = Q()
+        for (pid, weekday, hour), _ in part:
+            cells |= Q(product_id=pid, weekday=weekday, hour=hour)
+        HourlyProductDemand.objects.filter(cells).update(
+            units=_increment('units', part, 0, IntegerField()),
+            revenue=_increment('revenue', part, 1, DecimalField(max_digits=14, decimal_places=2)),
+            line_count=_increment('line_count', part, 2, IntegerField()),
+        )
+        # Any removal can leave a cell without lines; drop those
+        if any(value < 0 for _, delta in part for value in delta):
+            HourlyProductDemand.objects.filter(cells, line_count__lte=0).delete()
+    return len(deltas)
+
+
+def sale_entry(sale):
+    return (sale.product_id, sale.timestamp, sale.units_sold, sale.revenue)
+
+
+def rebuild_hourly_demand(batch_size=2000):
+    """Recompute the whole cube from Sale rows; returns the number of cells written."""
+    tz = timezone.get_current_timezone()
+    rows = (
+        Sale.objects.annotate(
+            iso_weekday=ExtractIsoWeekDay('timestamp', tzinfo=tz),
+            hour_of_day=ExtractHour('timestamp', tzinfo=tz),
+        )
+        .values('product_id', 'iso_weekday', 'hour_of_day')
+        .annotate(units=Sum('units_sold'), revenue=Sum('revenue'), lines=Count('id'))
+        .order_by()
+    )
+    HourlyProductDemand.objects.all().delete()
+    written = 0
+    batch = []
+    for r in rows.iterator(chunk_size=batch_size):
+        batch.append(HourlyProductDemand(
+            product_id=r['product_id'], weekday=r['iso_weekday'] - 1, hour=r['hour_of_day'],
+            units=r['units'] or 0, revenue=r['revenue'] or 0, line_count=r['lines'],
+        ))
+        if len(batch) >= batch_size:
+            HourlyProductDemand.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        HourlyProductDemand.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def _filtered(qs, product_ids=None, category=None):
+    if product_ids:
+        qs = qs.filter(product_id__in=product_ids)
+    if category:
+        qs = qs.filter(product__category=category)
+    return qs
+
+
+def trading_days():
+    """Number of days with any sale, per weekday (the denominator for averages)."""
+    days = Counter()
+    for d in DailyProductSales.objects.values_list('date', flat=True).distinct().order_by():
+        days[d.weekday()] += 1
+    return [days[w] for w in range(7)]
+
+
+def matrix(product_ids=None, category=None):
+    """7 x 24 lists of units and revenue summed over the selected products."""
+    units = [[0] * HOURS for _ in range(7)]
+    revenue = [[0.0] * HOURS for _ in range(7)]
+    rows = (
+        _filtered(HourlyProductDemand.objects.all(), product_ids, category)
+        .values('weekday', 'hour')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by()
+    )
+    for r in rows:
+        units[r['weekday']][r['hour']] = int(r['units'] or 0)
+        revenue[r['weekday']][r['hour']] = float(r['revenue'] or 0)
+    return units, revenue
+
+
+def heatmap(product_ids=None, category=None, top=5):
+    """Units per weekday/hour (totals and averages per trading day) and the busiest cells."""
+    units, revenue = matrix(product_ids, category)
+    days = trading_days()
+    average = [
+        [round(units[w][h] / days[w], 2) if days[w] else 0.0 for h in range(HOURS)]
+        for w in range(7)
+    ]
+    cells = sorted(
+        ((average[w][h], units[w][h], w, h) for w in range(7) for h in range(HOURS) if units[w][h]),
+        key=lambda c: (-c[0], -c[1], c[2], c[3]),
+    )
+    return {
+        'weekdays': list(WEEKDAYS),
+        'hours': list(range(HOURS)),
+        'trading_days': days,
+        'units': units,
+        'avg_units': average,
+        'revenue': [[round(v, 2) for v in row] for row in revenue],
+        'peak_hours': [
+            {'weekday': WEEKDAYS[w], 'hour': h, 'avg_units': avg, 'units': total}
+            for avg, total, w, h in cells[:top]
+        ],
+    }
+
+
+def hour_profile(units, weekday):
+    """Share of `weekday`'s units sold in each hour; all weekdays pooled when it has no sales."""
+    row = units[weekday]
+    if not sum(row):
+        row = [sum(units[w][h] for w in range(7)) for h in range(HOURS)]
+    total = sum(row)
+    return [v / total for v in row] if total else [0.0] * HOURS
+
+
+def hourly_forecast(product_ids=None, category=None, day=None):
+    """Expected units per hour on `day` (default tomorrow)."""
+    from .forecasting import forecast_time_series
+
+    today = timezone.localdate()
+    day = day or today + timedelta(days=1)
+    horizon = max(1, (day - today).days)
+    start = today - timedelta(days=FORECAST_LOOKBACK_DAYS - 1)
+    per_day = dict(
+        _filtered(DailyProductSales.objects.filter(date__gte=start), product_ids, category)
+        .values('date').annotate(units=Sum('capped_units')).order_by().values_list('date', 'units')
+    )
+    series = [
+        ((start + timedelta(days=i)).isoformat(), int(per_day.get(start + timedelta(days=i)) or 0))
+        for i in range(FORECAST_LOOKBACK_DAYS)
+    ]
+    if any(v for _, v in series):
+        total = forecast_time_series(series, horizon=horizon)['forecast'][horizon - 1]
+    else:
+        total = 0
+
+    units, _ = matrix(product_ids, category)
+    profile = hour_profile(units, day.weekday())
+    hourly = [round(total * share, 2) for share in profile]
+    peak = max(range(HOURS), key=lambda h: hourly[h]) if total else None
+    return {
+        'date': day.isoformat(),
+        'weekday': WEEKDAYS[day.weekday()],
+        'total_units': total,
+        'hourly': hourly,
+        'peak_hour': peak,
+    }
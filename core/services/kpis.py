@@ -0,0 +1,86 @@
+"""Sales KPIs for named date windows.
+
+Dashboards show the same figures for several windows (today, yesterday,
+this week, last week, ...). Instead of one aggregate query per window and
+metric, `window_totals` computes every window's revenue and units in a single
+query over the DailyProductSales rollup, using conditional aggregates
+(`SUM(...) FILTER (WHERE ...)`, emulated with CASE on backends without
+FILTER). Order counts, when requested, add one conditional query over Order
+headers and one over order-less sale lines (see services/orders.py).
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+
+from ..models import DailyProductSales, Order, Sale
+
+
+def _window_q(start, end):
+    q = Q()
+    if start is not None:
+        q &= Q(date__gte=start)
+    if end is not None:
+        q &= Q(date__lte=end)
+    return q
+
+
+def _bounds(windows):
+    """Smallest date range covering every window, or None for an open side."""
+    starts = [s for s, _ in windows.values()]
+    ends = [e for _, e in windows.values()]
+    start = None if any(s is None for s in starts) else min(starts)
+    end = None if any(e is None for e in ends) else max(ends)
+    return start, end
+
+
+def _conditional_counts(qs, windows):
+    aggregates = {name: Count('id', filter=_window_q(s, e)) for name, (s, e) in windows.items()}
+    return qs.filter(_window_q(*_bounds(windows))).aggregate(**aggregates)
+
+
+def window_totals(windows, orders=False):
+    """Return {name: {'revenue': float, 'units': int[, 'orders': int]}}.
+
+    `windows` maps a name to an inclusive (start, end) date pair; either side
+    may be None for an open range.
+    """
+    if not windows:
+        return {}
+    aggregates = {}
+    for name, (start, end) in windows.items():
+        q = _window_q(start, end)
+        aggregates[f'{name}__revenue'] = Sum('revenue', filter=q)
+        aggregates[f'{name}__units'] = Sum('units', filter=q)
+    row = DailyProductSales.objects.filter(_window_q(*_bounds(windows))).aggregate(**aggregates)
+
+    totals = {
+        name: {
+            'revenue': float(row[f'{name}__revenue'] or 0),
+            'units': int(row[f'{name}__units'] or 0),
+        }
+        for name in windows
+    }
+    if orders:
+        headers = _conditional_counts(Order.objects.all(), windows)
+        orphans = _conditional_counts(Sale.objects.filter(order__isnull=True), windows)
+        for name in windows:
+            totals[name]['orders'] = int(headers[name] or 0) + int(orphans[name] or 0)
+    return totals
+
+
+def standard_windows(today):
+    """Today, yesterday, this/previous calendar week (Mon-Sun) and month, up to `today`."""
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    prev_week_start = week_start - timedelta(days=7)
+    month_start = today.replace(day=1)
+    prev_month_end = month_start - timedelta(days=1)
+    prev_month_start = prev_month_end.replace(day=1)
+    return {
+        'today': (today, today),
+        'yesterday': (yesterday, yesterday),
+        'this_week': (week_start, today),
+        'prev_week': (prev_week_start, prev_week_start + timedelta(days=6)),
+        'this_month': (month_start, today),
+        'prev_month': (prev_month_start, prev_month_end),
+    }
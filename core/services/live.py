@@ -0,0 +1,203 @@
+"""Live sales updates for dashboards (server-sent events).
+
+Every open dashboard subscribes to one in-process broker instead of polling
+the KPI endpoints. When a checkout commits, the worker that handled it builds
+the update once (today's totals plus the newest orders, serialized to JSON)
+and publishes it; every subscriber in that process receives the same bytes.
+
+Other workers learn about the sale through the "sales" data version (see
+versioning.py): while a process has subscribers, at most one of them checks
+the token every POLL_INTERVAL seconds and, when it moved, builds and
+publishes the update for that whole process. So N dashboards cost one
+computation per sale per worker rather than N queries per poll.
+
+`stream_sync()` serves the events from a WSGI worker, `stream_async()` from
+an ASGI server (koki_foodhub/asgi.py); see views.sales_stream.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import versioning
+from .orders import recent_orders
+
+logger = logging.getLogger(__name__)
+
+RECENT_ORDERS = 10
+HEARTBEAT = 15
+# Client reconnect delay (ms) sent with every stream
+RETRY_MS = 3000
+
+
+def poll_interval():
+    return float(getattr(settings, 'LIVE_POLL_INTERVAL', 2))
+
+
+def build_update():
+    """Today's totals and the newest orders, as one event payload."""
+    from .kpis import window_totals
+
+    today = timezone.localdate()
+    kpi = window_totals({'today': (today, today)}, orders=True)['today']
+    return {
+        'orders': kpi['orders'],
+        'revenue': kpi['revenue'],
+        'server_today_iso': timezone.localtime().isoformat(),
+        'recent_orders': recent_orders(RECENT_ORDERS),
+    }
+
+
+def _sales_token():
+    return versioning.tokens([versioning.SALES])[versioning.SALES]
+
+
+class Broker:
+    """Latest sales event for this process plus a condition to wait on it."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._frame = None
+        self._token = None
+        self._checked_at = 0.0
+        self._checking = False
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, payload, token=None):
+        """Store `payload` as the newest event and wake every waiting subscriber."""
+        data = json.dumps(payload, separators=(',', ':'))
+        with self._cond:
+            self._seq += 1
+            self._frame = f'id: {self._seq}\nevent: sales\ndata: {data}\n\n'
+            if token is not None:
+                self._token = token
+            self._cond.notify_all()
+
+    def refresh(self):
+        """Build and publish an update from the database (one computation)."""
+        token = _sales_token()
+        self.publish(build_update(), token=token)
+
+    def latest(self):
+        """(seq, frame) of the newest event, building one if nothing was published yet."""
+        if self._frame is None:
+            self.refresh()
+        with self._cond:
+            return self._seq, self._frame
+
+    def poll(self):
+        """Cross-worker fallback: republish when another process changed sales data.
+
+        Only one caller per POLL_INTERVAL actually queries; the rest return at once.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._checking or now - self._checked_at < poll_interval():
+                return
+            self._checking = True
+        try:
+            if _sales_token() != self._token:
+                self.refresh()
+        except Exception:
+            logger.exception('Live sales poll failed')
+        finally:
+            with self._cond:
+                self._checking = False
+                self._checked_at = time.monotonic()
+
+    def wait(self, after_seq, timeout):
+        """Block until an event newer than `after_seq` exists or `timeout` passes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._seq > after_seq:
+                    return self._seq, self._frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(min(remaining, poll_interval()))
+            self.poll()
+
+
+broker = Broker()
+
+
+def publish_sales():
+    """Publish fresh totals after a checkout commits (register with transaction.on_commit)."""
+    try:
+        broker.refresh()
+    except Exception:
+        logger.exception('Publishing live sales update failed')
+
+
+def _opening(frame):
+    return f'retry: {RETRY_MS}\n{frame}'
+
+
+def max_sync_streams():
+    return int(getattr(settings, 'LIVE_WSGI_MAX_STREAMS', 2))
+
+
+_waiting = 0
+_waiting_lock = threading.Lock()
+
+
+def stream_sync(max_seconds):
+    """Event stream for WSGI workers, served as a short long-poll.
+
+    Every open stream holds a worker thread, so this one yields the current
+    totals, waits at most `max_seconds` for the next event and ends;
+    EventSource reconnects after RETRY_MS. At most LIVE_WSGI_MAX_STREAMS
+    streams per process wait at a time. Further clients get the current
+    totals without waiting, which amounts to polling every RETRY_MS and
+    keeps threads free for checkout. Serve many dashboards from an ASGI
+    server instead (see koki_foodhub/asgi.py).
+    """
+    global _waiting
+    with _waiting_lock:
+        waits = _waiting < max_sync_streams()
+        if waits:
+            _waiting += 1
+    try:
+        if not waits:
+            # Rate-limited: at most one token check per POLL_INTERVAL
+            broker.poll()
+        seq, frame = broker.latest()
+        yield _opening(frame)
+        if waits:
+            hit = broker.wait(seq, max_seconds)
+            if hit is not None:
+                yield hit[1]
+    finally:
+        if waits:
+            with _waiting_lock:
+                _waiting -= 1
+
+
+async def stream_async(max_seconds):
+    """Event stream for ASGI servers; waits without holding a thread per client."""
+    from asgiref.sync import sync_to_async
+
+    seq, frame = await sync_to_async(broker.latest)()
+    yield _opening(frame)
+    started = last_sent = time.monotonic()
+    tick = min(0.5, poll_interval())
+    while time.monotonic() - started < max_seconds:
+        await asyncio.sleep(tick)
+        if broker.seq <= seq:
+            await sync_to_async(broker.poll)()
+        if broker.seq > seq:
+            seq, frame = broker.latest()
+            yield frame
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= HEARTBEAT:
+            yield ': ping\n\n'
+            last_sent = time.monotonic()
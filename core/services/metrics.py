@@ -0,0 +1,230 @@
+"""Per-route request metrics in Prometheus text format.
+
+RequestMetricsMiddleware (core/middleware/metrics.py) records, for every
+request, its latency, status, DB query count and time, template render time
+and response size into this process's Collector, keyed by (route, method).
+
+Each process writes its totals to METRICS_DIR/<process id>.json at most every
+FLUSH_INTERVAL seconds (atomic replace). `render()` merges the files of all
+workers, so the /metrics endpoint reports the whole gunicorn server whichever
+worker answers. Files of stopped workers are kept so counters never go
+backwards.
+"""
+from contextlib import ExitStack, contextmanager
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLUSH_INTERVAL = 5.0
+PREFIX = 'koki'
+
+_template_seconds = contextvars.ContextVar('metrics_template_seconds', default=None)
+
+
+def metrics_dir():
+    return str(getattr(settings, 'METRICS_DIR', '') or os.path.join(tempfile.gettempdir(), 'koki-foodhub-metrics'))
+
+
+def enabled():
+    return bool(getattr(settings, 'METRICS_ENABLED', True))
+
+
+class Sample:
+    """Measurements for one request, filled in while it runs."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def measure():
+    """Yield a Sample that counts queries on every connection and template renders."""
+    sample = Sample()
+    token = _template_seconds.set(sample)
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(sample.execute_wrapper))
+            yield sample
+    finally:
+        _template_seconds.reset(token)
+
+
+_patched = False
+
+
+def instrument_templates():
+    """Time Django template renders into the current request's Sample (installed once)."""
+    global _patched
+    if _patched:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        sample = _template_seconds.get()
+        if sample is None:
+            return original(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            sample.template_seconds += time.perf_counter() - started
+
+    Template.render = render
+    _patched = True
+
+
+def _empty():
+    return {
+        'count': 0, 'sum': 0.0, 'buckets': [0] * len(BUCKETS), 'status': {},
+        'queries': 0, 'db': 0.0, 'template': 0.0, 'bytes': 0,
+    }
+
+
+class Collector:
+    """Totals for this process, flushed periodically to a per-process file."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        # A restarted worker may get a recycled pid; the suffix keeps its file separate
+        self._name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        self._flushed_at = 0.0
+
+    def record(self, route, method, status, seconds, sample, size=None):
+        key = f'{route}\t{method}'
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _empty()
+            series['count'] += 1
+            series['sum'] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series['buckets'][i] += 1
+            code = str(status)
+            series['status'][code] = series['status'].get(code, 0) + 1
+            series['queries'] += sample.queries
+            series['db'] += sample.db_seconds
+            series['template'] += sample.template_seconds
+            if size:
+                series['bytes'] += size
+        if time.monotonic() - self._flushed_at >= FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._series))
+
+    def flush(self):
+        """Write this process's totals for the other workers to read."""
+        self._flushed_at = time.monotonic()
+        directory = metrics_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(self.snapshot(), fh)
+            os.replace(tmp, os.path.join(directory, self._name))
+        except OSError:
+            logger.exception('Could not write request metrics to %s', directory)
+
+    def merged(self):
+        """Totals across every worker's file (this process's live numbers included)."""
+        self.flush()
+        total = {}
+        directory = metrics_dir()
+        try:
+            names = [n for n in os.listdir(directory) if n.endswith('.json')]
+        except OSError:
+            names = []
+        for name in names:
+            try:
+                with open(os.path.join(directory, name)) as fh:
+                    series = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for key, data in series.items():
+                merged = total.setdefault(key, _empty())
+                for field in ('count', 'sum', 'queries', 'db', 'template', 'bytes'):
+                    merged[field] += data.get(field, 0)
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], data.get('buckets', []))]
+                for code, n in data.get('status', {}).items():
+                    merged['status'][code] = merged['status'].get(code, 0) + n
+        return total
+
+
+collector = Collector()
+if hasattr(os, 'register_at_fork'):
+    # Workers forked from a preloaded master each need their own file and totals
+    os.register_at_fork(after_in_child=collector.reset)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(series=None):
+    """Prometheus text exposition (format 0.0.4) of the merged totals."""
+    series = collector.merged() if series is None else series
+    rows = sorted((key.split('\t', 1), data) for key, data in series.items())
+    out = []
+
+    def family(name, kind, help_text):
+        out.append(f'# HELP {PREFIX}_{name} {help_text}')
+        out.append(f'# TYPE {PREFIX}_{name} {kind}')
+
+    family('http_requests_total', 'counter', 'Requests by route, method and status code.')
+    for (route, method), data in rows:
+        for code, n in sorted(data['status'].items()):
+            out.append(f'{PREFIX}_http_requests_total{{route="{_escape(route)}",method="{method}",status="{code}"}} {n}')
+
+    family('http_request_duration_seconds', 'histogram', 'Request latency by route.')
+    for (route, method), data in rows:
+        labels = f'route="{_escape(route)}",method="{method}"'
+        for bound, n in zip(BUCKETS, data['buckets']):
+            out.append(f'{PREFIX}_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {n}')
+        out.append(f'{PREFIX}_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {data["count"]}')
+        out.append(f'{PREFIX}_http_request_duration_seconds_sum{{{labels}}} {_fmt(data["sum"])}')
+        out.append(f'{PREFIX}_http_request_duration_seconds_count{{{labels}}} {data["count"]}')
+
+    for name, field, help_text in (
+        ('db_queries_total', 'queries', 'Database queries executed while serving the route.'),
+        ('db_query_seconds_total', 'db', 'Time spent in database queries.'),
+        ('template_render_seconds_total', 'template', 'Time spent rendering templates.'),
+        ('response_bytes_total', 'bytes', 'Response body bytes (non-streaming responses).'),
+    ):
+        family(name, 'counter', help_text)
+        for (route, method), data in rows:
+            out.append(f'{PREFIX}_{name}{{route="{_escape(route)}",method="{method}"}} {_fmt(data[field])}')
+    return '\n'.join(out) + '\n'
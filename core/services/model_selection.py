@@ -0,0 +1,131 @@
+"""Vectorised forecasting-method selection.
+
+`select_best_forecasting_method` backtests three candidates on a holdout:
+a linear trend, Holt's linear smoothing over a 4 x 3 (alpha, beta) grid and a
+3-point moving average. Evaluated one by one that is 12 pure-Python Holt
+passes plus a regression fit per series. Here every candidate is evaluated as
+array operations over a (series x grid) block: the Holt recursion advances all
+grid points of all series together, one time step per iteration, and the
+scores are reduced with a single argmin.
+
+`select_methods` scores a matrix of equal-length series in one call;
+`forecasting.select_best_forecasting_method` passes it a single row. numpy
+is imported lazily, like the other numeric helpers, and that function keeps
+a pure-Python path for installs without it.
+"""
+
+HOLT_ALPHAS = (0.2, 0.4, 0.6, 0.8)
+HOLT_BETAS = (0.05, 0.1, 0.2)
+MA_WINDOW = 3
+METHODS = ('linear', 'holt', 'ma')
+# Fewer points than this cannot be backtested meaningfully
+MIN_POINTS = 4
+
+
+def holdout_size(n):
+    """Holdout length for a series of n points: 20% of it, between 1 and 7."""
+    return min(max(1, int(round(n * 0.2))), 7)
+
+
+def holt_params(index):
+    """(alpha, beta) for a flat grid index (alpha-major order)."""
+    return HOLT_ALPHAS[index // len(HOLT_BETAS)], HOLT_BETAS[index % len(HOLT_BETAS)]
+
+
+def _mape(np, actual, predicted):
+    """MAPE along the last axis; zero actuals use 1 as the denominator like forecasting._mape."""
+    denom = np.where(actual > 0, actual, 1.0)
+    return np.abs((actual - predicted) / denom).mean(axis=-1) * 100.0
+
+
+def holt_grid_forecast(train, horizon):
+    """Holt forecasts for every series and grid point: array of shape (S, G, horizon).
+
+    Uses the same initialisation and recursion as forecasting._holt_linear_forecast,
+    and the same rounding and clipping at zero.
+    """
+    import numpy as np
+
+    train = np.asarray(train, dtype=float)
+    S, T = train.shape
+    G = len(HOLT_ALPHAS) * len(HOLT_BETAS)
+    alpha = np.repeat(np.asarray(HOLT_ALPHAS, dtype=float), len(HOLT_BETAS))[None, :]
+    beta = np.tile(np.asarray(HOLT_BETAS, dtype=float), len(HOLT_ALPHAS))[None, :]
+
+    level = np.repeat(train[:, :1], G, axis=1)
+    if T >= 2:
+        trend = np.repeat(train[:, 1:2] - train[:, :1], G, axis=1)
+    else:
+        trend = np.zeros((S, G))
+    for t in range(1, T):
+        obs = train[:, t:t + 1]
+        prev = level
+        level = alpha * obs + (1 - alpha) * (prev + trend)
+        trend = beta * (level - prev) + (1 - beta) * trend
+
+    steps = np.arange(1, horizon + 1, dtype=float)
+    return np.maximum(np.round(level[:, :, None] + trend[:, :, None] * steps), 0)
+
+
+def linear_forecast(train, horizon):
+    """Least-squares trend line per series, extrapolated: shape (S, horizon)."""
+    import numpy as np
+
+    from .regression import fit_matrix
+
+    train = np.asarray(train, dtype=float)
+    T = train.shape[1]
+    intercept, slope, _, _ = fit_matrix(train, np)
+    future = np.arange(T, T + horizon, dtype=float)
+    return np.maximum(np.round(intercept[:, None] + slope[:, None] * future), 0)
+
+
+def moving_average_forecast(train, horizon, window=MA_WINDOW):
+    """Flat forecast at the mean of the last `window` points: shape (S, horizon)."""
+    import numpy as np
+
+    train = np.asarray(train, dtype=float)
+    level = np.round(train[:, -window:].mean(axis=1))
+    return np.maximum(np.repeat(level[:, None], horizon, axis=1), 0)
+
+
+def select_methods(matrix):
+    """Backtest every candidate for each row of `matrix` (S series x T points).
+
+    Returns a list of (method, params, diagnostics) tuples, one per row, in
+    the format of forecasting.select_best_forecasting_method.
+    """
+    import numpy as np
+
+    matrix = np.asarray(matrix, dtype=float)
+    if matrix.ndim != 2:
+        raise ValueError('Expected a 2-D array of series')
+    S, T = matrix.shape
+    if T < MIN_POINTS:
+        return [('ma', {'window': MA_WINDOW}, {'reason': 'too short, using MA'}) for _ in range(S)]
+
+    holdout = holdout_size(T)
+    train, test = matrix[:, :-holdout], matrix[:, -holdout:]
+
+    holt_scores = _mape(np, test[:, None, :], holt_grid_forecast(train, holdout))  # (S, G)
+    best_grid = holt_scores.argmin(axis=1)
+    scores = np.stack([
+        _mape(np, test, linear_forecast(train, holdout)),
+        holt_scores[np.arange(S), best_grid],
+        _mape(np, test, moving_average_forecast(train, holdout)),
+    ], axis=1)  # (S, methods); argmin keeps the first method on ties
+    choice = scores.argmin(axis=1)
+
+    results = []
+    for i in range(S):
+        method = METHODS[int(choice[i])]
+        if method == 'holt':
+            alpha, beta = holt_params(int(best_grid[i]))
+            params = {'alpha': alpha, 'beta': beta}
+        elif method == 'linear':
+            params = {}
+        else:
+            params = {'window': MA_WINDOW}
+        diagnostics = {'scores': {m: float(scores[i, j]) for j, m in enumerate(METHODS)}}
+        results.append((method, params, diagnostics))
+    return results
@@ -0,0 +1,119 @@
+"""Order header helpers.
+
+Checkouts write one Order per cart with precomputed totals. Sale rows that
+were recorded without a cart (imports, manual entries) have no order and
+still count as single-line orders, so the figures here add those orphan lines
+to the Order counts.
+"""
+import logging
+
+from django.db.models import Sum, Count
+from django.utils import timezone
+
+from ..models import Order, Sale
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_order_totals(order_ids):
+    """Recompute stored totals for `order_ids` from their lines; drop orders left empty."""
+    order_ids = {oid for oid in order_ids if oid is not None}
+    if not order_ids:
+        return
+    totals = {
+        r['order_id']: r
+        for r in Sale.objects.filter(order_id__in=order_ids).values('order_id').annotate(
+            revenue=Sum('revenue'), units=Sum('units_sold'), lines=Count('id')
+        ).order_by()
+    }
+    empty = []
+    for oid in order_ids:
+        r = totals.get(oid)
+        if not r:
+            empty.append(oid)
+            continue
+        Order.objects.filter(pk=oid).update(
+            total_revenue=r['revenue'] or 0, total_units=r['units'] or 0, line_count=r['lines']
+        )
+    if empty:
+        Order.objects.filter(pk__in=empty).delete()
+
+
+def order_count(start=None, end=None):
+    """Number of orders (including order-less sale lines) dated within [start, end]."""
+    orders = Order.objects.all()
+    orphans = Sale.objects.filter(order__isnull=True)
+    if start:
+        orders = orders.filter(date__gte=start)
+        orphans = orphans.filter(date__gte=start)
+    if end:
+        orders = orders.filter(date__lte=end)
+        orphans = orphans.filter(date__lte=end)
+    return orders.count() + orphans.count()
+
+
+def order_counts_by_date(start, end=None):
+    """Return {date: number of orders} for dates within [start, end]."""
+    orders = Order.objects.filter(date__gte=start)
+    orphans = Sale.objects.filter(order__isnull=True, date__gte=start)
+    if end:
+        orders = orders.filter(date__lte=end)
+        orphans = orphans.filter(date__lte=end)
+    counts = {}
+    for qs in (orders, orphans):
+        for r in qs.values('date').annotate(n=Count('id')).order_by():
+            counts[r['date']] = counts.get(r['date'], 0) + r['n']
+    return counts
+
+
+def serialize_order(order):
+    """JSON-ready order header with its lines (expects lines__product prefetched)."""
+    lines = list(order.lines.all())
+    created = timezone.localtime(order.created_at)
+    return {
+        'id': order.id,
+        'product_name': ', '.join(line.product.name for line in lines),
+        'category': ', '.join(sorted({line.product.category for line in lines if line.product.category})),
+        'units_sold': order.total_units,
+        'revenue': float(order.total_revenue),
+        'line_count': order.line_count,
+        'date': order.date.isoformat(),
+        'date_formatted': created.strftime('%b %d, %I:%M %p'),
+        'lines': [
+            {'product_name': line.product.name, 'units_sold': line.units_sold, 'revenue': float(line.revenue)}
+            for line in lines
+        ],
+    }
+
+
+def serialize_sale(sale):
+    """An order-less sale line shaped like a single-line order (expects product selected)."""
+    line = {'product_name': sale.product.name, 'units_sold': sale.units_sold, 'revenue': float(sale.revenue)}
+    return {
+        'id': None,
+        'product_name': sale.product.name,
+        'category': sale.product.category or '',
+        'units_sold': sale.units_sold,
+        'revenue': float(sale.revenue),
+        'line_count': 1,
+        'date': sale.date.isoformat(),
+        'date_formatted': timezone.localtime(sale.timestamp).strftime('%b %d, %I:%M %p'),
+        'lines': [line],
+    }
+
+
+def recent_orders(limit):
+    """The `limit` newest orders, serialized, with order-less sale lines counted as orders.
+
+    Takes up to `limit` of each kind (both use a descending index) and merges
+    them newest first, so the list agrees with order_count().
+    """
+    headers = Order.objects.prefetch_related('lines__product').order_by('-created_at', '-id')[:limit]
+    orphans = (
+        Sale.objects.filter(order__isnull=True).select_related('product')
+        .order_by('-timestamp', '-id')[:limit]
+    )
+    merged = [(o.created_at, o.id, serialize_order(o)) for o in headers]
+    merged += [(s.timestamp, s.id, serialize_sale(s)) for s in orphans]
+    merged.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    return [entry for _, _, entry in merged[:limit]]
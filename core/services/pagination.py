@@ -0,0 +1,132 @@
+"""Keyset (seek) pagination.
+
+Instead of OFFSET, each page continues from the sort key of the last row the
+client saw: `WHERE (date, id) < (:date, :id) ORDER BY date DESC, id DESC
+LIMIT n`. With an index on the sort columns every page is a bounded range
+read, no matter how deep into the table the client has paged.
+
+Cursors are opaque URL-safe strings holding the sort-key values of the
+boundary row plus the direction to continue in.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that cannot be decoded or do not match the sort."""
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode(direction, values):
+    raw = json.dumps({'d': direction, 'v': values}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return data['d'], list(data['v'])
+    except Exception:
+        raise InvalidCursor('Malformed cursor')
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _seek_filter(keys, values, forward):
+    """Rows strictly after `values` in the `keys` ordering (or before when not forward)."""
+    condition = Q()
+    for i, (field, descending) in enumerate(keys):
+        # Descending keys continue towards smaller values when paging forward
+        op = 'lt' if descending == forward else 'gt'
+        clause = Q(**{f'{field}__{op}': values[i]})
+        for j in range(i):
+            clause &= Q(**{keys[j][0]: values[j]})
+        condition |= clause
+    return condition
+
+
+def _key_values(obj, keys):
+    values = []
+    for field, _ in keys:
+        value = getattr(obj, field)
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return values
+
+
+def _to_python(model, keys, values):
+    if len(values) != len(keys):
+        raise InvalidCursor('Cursor does not match the requested sort')
+    try:
+        return [model._meta.get_field(field).to_python(value) for (field, _), value in zip(keys, values)]
+    except Exception:
+        raise InvalidCursor('Cursor does not match the requested sort')
+
+
+def paginate(queryset, keys, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """Return one KeysetPage of `queryset` ordered by `keys`.
+
+    `keys` is a list of (field, descending) pairs of non-null local fields;
+    the last one must be unique (normally the primary key) so the ordering is
+    total. Raises InvalidCursor for a cursor that does not fit `keys`.
+    """
+    forward = True
+    values = None
+    if cursor:
+        direction, raw = _decode(cursor)
+        forward = direction != 'prev'
+        values = _to_python(queryset.model, keys, raw)
+
+    ordering = [('-' if desc == forward else '') + field for field, desc in keys]
+    qs = queryset.order_by(*ordering)
+    if values is not None:
+        qs = qs.filter(_seek_filter(keys, values, forward))
+
+    # One extra row tells us whether another page exists in this direction
+    rows = list(qs[:page_size + 1])
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not forward:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = _key_values(rows[0], keys), _key_values(rows[-1], keys)
+        # Paging backwards always leaves a later page behind; paging forwards
+        # from a cursor always leaves an earlier one.
+        if more or not forward:
+            next_cursor = _encode('next', last)
+        if (more and not forward) or (forward and values is not None):
+            prev_cursor = _encode('prev', first)
+    return KeysetPage(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,144 @@
+"""Closed-form least-squares trend lines.
+
+Every forecast path fits the same model: a straight line through a series
+observed at x = 0, 1, ..., n-1. That has a closed-form solution, so this
+module computes it directly (slope, intercept, R², residual std and
+prediction intervals) instead of building scikit-learn estimators, whose
+import alone costs hundreds of milliseconds per worker.
+
+`fit_lines` fits many series at once: series of equal length are stacked
+into one numpy matrix and solved together. Without numpy the same formulas
+run in pure Python, so results do not depend on which numeric packages are
+installed.
+
+R² follows sklearn's `score()`: 1 - SSE/SST, and for a constant series 1.0
+when the fit is exact (otherwise 0.0).
+"""
+from collections import namedtuple
+import math
+
+
+def _numpy():
+    try:
+        import numpy
+    except Exception:
+        return None
+    return numpy
+
+
+def r2(sse, sst):
+    """Coefficient of determination from the residual and total sums of squares."""
+    if sst:
+        return 1.0 - sse / sst
+    return 1.0 if sse <= 1e-12 else 0.0
+
+
+class Line(namedtuple('Line', 'intercept slope sse sst n')):
+    """A fitted trend line over x = 0..n-1."""
+
+    __slots__ = ()
+
+    @property
+    def r2(self):
+        return r2(self.sse, self.sst)
+
+    @property
+    def std(self):
+        """Population standard deviation of the residuals (numpy's default ddof=0)."""
+        return math.sqrt(self.sse / self.n) if self.n else 0.0
+
+    def predict(self, x):
+        return self.intercept + self.slope * x
+
+    def predict_range(self, start, stop):
+        return [self.intercept + self.slope * x for x in range(start, stop)]
+
+    def residuals(self, values):
+        return [float(y) - self.predict(x) for x, y in enumerate(values)]
+
+    def band(self, x, z=1.5):
+        """(lower, upper) at x: the prediction +/- z residual standard deviations."""
+        centre = self.predict(x)
+        return centre - z * self.std, centre + z * self.std
+
+    def prediction_interval(self, x, z=1.96):
+        """(lower, upper) OLS prediction interval at x, widened by the distance from the data.
+
+        Uses the unbiased residual variance (n - 2 degrees of freedom) and the
+        leverage term 1 + 1/n + (x - mean_x)^2 / Sxx; with fewer than three
+        points it falls back to `band`.
+        """
+        n = self.n
+        if n < 3:
+            return self.band(x, z)
+        mean_x = (n - 1) / 2.0
+        sxx = n * (n * n - 1) / 12.0
+        s = math.sqrt(self.sse / (n - 2))
+        half = z * s * math.sqrt(1.0 + 1.0 / n + (x - mean_x) ** 2 / sxx)
+        centre = self.predict(x)
+        return centre - half, centre + half
+
+
+EMPTY = Line(0.0, 0.0, 0.0, 0.0, 0)
+
+
+def _fit_python(values):
+    n = len(values)
+    if n == 0:
+        return EMPTY
+    ys = [float(v) for v in values]
+    mean_x = (n - 1) / 2.0
+    mean_y = sum(ys) / n
+    sxx = n * (n * n - 1) / 12.0
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(ys))
+    slope = sxy / sxx if sxx else 0.0
+    intercept = mean_y - slope * mean_x
+    sse = sum((y - intercept - slope * x) ** 2 for x, y in enumerate(ys))
+    sst = sum((y - mean_y) ** 2 for y in ys)
+    return Line(intercept, slope, sse, sst, n)
+
+
+def fit_matrix(matrix, np=None):
+    """Fit every row of an (S x T) array; returns numpy arrays (intercept, slope, sse, sst)."""
+    np = np or _numpy()
+    y = np.asarray(matrix, dtype=float)
+    T = y.shape[1]
+    x = np.arange(T, dtype=float)
+    xc = x - (T - 1) / 2.0
+    sxx = float((xc * xc).sum())
+    mean_y = y.mean(axis=1)
+    yc = y - mean_y[:, None]
+    slope = (yc @ xc) / sxx if sxx else np.zeros(y.shape[0])
+    intercept = mean_y - slope * (T - 1) / 2.0
+    resid = y - (intercept[:, None] + slope[:, None] * x)
+    return intercept, slope, (resid * resid).sum(axis=1), (yc * yc).sum(axis=1)
+
+
+def fit_lines(series_values):
+    """Fit a line to each value sequence; equal-length sequences share one matrix solve."""
+    np = _numpy()
+    if np is None:
+        return [_fit_python(values) for values in series_values]
+    by_length = {}
+    for i, values in enumerate(series_values):
+        by_length.setdefault(len(values), []).append(i)
+    results = [None] * len(series_values)
+    for length, indexes in by_length.items():
+        if length == 0:
+            for i in indexes:
+                results[i] = EMPTY
+            continue
+        fitted = fit_matrix([series_values[i] for i in indexes], np)
+        for row, i in enumerate(indexes):
+            intercept, slope, sse, sst = (float(a[row]) for a in fitted)
+            results[i] = Line(intercept, slope, sse, sst, length)
+    return results
+
+
+def fit_line(values):
+    """Fit one series.
+
+    Request-path series are short (a few dozen points), where array setup
+    costs more than the arithmetic, so this uses the pure-Python formulas.
+    """
+    return _fit_python(values)
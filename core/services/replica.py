@@ -0,0 +1,197 @@
+"""Send read-only analytics queries to an optional read replica.
+
+Dashboards and forecasts aggregate a lot of history but never write what
+they read, so a replica can serve them while checkout keeps the primary
+to itself. The replica is DATABASES[ANALYTICS_DATABASE] (configured from
+ANALYTICS_DATABASE_URL or ANALYTICS_SQLITE_PATH); without it every query
+goes to "default" exactly as before.
+
+Reads use the replica only inside an analytics scope:
+  * `@analytics_reads` on a view, or `with analytics():` around a block,
+  * `for_analytics(queryset)` for a single queryset.
+They stay on the primary whenever the replica could hide the caller's own
+writes:
+  * once anything was written in the current request, later reads in it
+    use the primary,
+  * a request that wrote outside an analytics scope (a sale, a product
+    edit) answers with a pin cookie, and that browser's requests use the
+    primary for ANALYTICS_STICKY_SECONDS, longer than the usual lag.
+A replica that cannot be reached, or a view that fails with a database
+error on it, makes the replica skipped for ANALYTICS_RETRY_SECONDS and
+the view runs on the primary.
+
+core.routers.AnalyticsRouter applies these decisions and sends every write
+to the primary; core.middleware.replica tracks requests and the cookie.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import logging
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'koki_db_pin'
+
+# alias -> time.monotonic() until which the replica is skipped
+_down_until = {}
+
+
+class Scope:
+    """Routing state of one request (or of one analytics block outside a request)."""
+
+    __slots__ = ('alias', 'pinned', 'wrote', 'pin')
+
+    def __init__(self, pinned=False):
+        # Replica alias reads go to while inside an analytics scope
+        self.alias = None
+        # The client wrote recently; everything stays on the primary
+        self.pinned = pinned
+        # Something was written during this scope
+        self.wrote = False
+        # ... outside an analytics scope, so the client should be pinned
+        self.pin = False
+
+
+_scope = ContextVar('analytics_scope', default=None)
+
+
+def alias():
+    """Name of the replica alias, or None when no replica is configured."""
+    name = getattr(settings, 'ANALYTICS_DATABASE', '')
+    if name and name != DEFAULT_DB_ALIAS and name in settings.DATABASES:
+        return name
+    return None
+
+
+def configured():
+    return alias() is not None
+
+
+def mark_down(name):
+    """Skip replica `name` for ANALYTICS_RETRY_SECONDS."""
+    _down_until[name] = time.monotonic() + getattr(settings, 'ANALYTICS_RETRY_SECONDS', 30)
+    try:
+        connections[name].close()
+    except Exception:
+        pass
+
+
+def _usable(name):
+    until = _down_until.get(name)
+    if until is not None:
+        if time.monotonic() < until:
+            return False
+        _down_until.pop(name, None)
+    try:
+        connections[name].ensure_connection()
+    except Exception:
+        logger.warning('Analytics replica %s is unreachable; using the primary', name, exc_info=True)
+        mark_down(name)
+        return False
+    return True
+
+
+def _replica_for(scope):
+    name = alias()
+    if name is None or scope.pinned or scope.wrote:
+        return None
+    return name if _usable(name) else None
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Track writes made while handling one request; yields its Scope."""
+    scope = Scope(pinned)
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def analytics():
+    """Read from the replica inside the block when that is safe; yields the alias used."""
+    scope = _scope.get()
+    token = None
+    if scope is None:
+        scope = Scope()
+        token = _scope.set(scope)
+    previous = scope.alias
+    if previous is None:
+        scope.alias = _replica_for(scope)
+    try:
+        yield scope.alias or DEFAULT_DB_ALIAS
+    finally:
+        scope.alias = previous
+        if token is not None:
+            _scope.reset(token)
+
+
+def analytics_reads(view):
+    """Run a read-only view inside `analytics()`, retrying on the primary if the replica fails."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with analytics() as used:
+            if used == DEFAULT_DB_ALIAS:
+                return view(request, *args, **kwargs)
+            try:
+                return view(request, *args, **kwargs)
+            except DatabaseError:
+                logger.warning('Replica %s failed for %s; retrying on the primary', used, request.path, exc_info=True)
+                mark_down(used)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def active():
+    """Whether data read in the current scope may have come from the replica (and lag the primary)."""
+    scope = _scope.get()
+    return scope is not None and scope.alias is not None
+
+
+def for_analytics(queryset):
+    """`queryset` bound to the replica when one is usable right now, otherwise unchanged."""
+    name = _replica_for(_scope.get() or Scope())
+    return queryset.using(name) if name else queryset
+
+
+def db_for_read():
+    """Alias for the next read, or None to leave the choice to Django."""
+    if not configured():
+        return None
+    scope = _scope.get()
+    if scope is not None and scope.alias and not scope.wrote:
+        return scope.alias
+    return DEFAULT_DB_ALIAS
+
+
+def note_write():
+    """Record a write in the current scope (called by the router for every write)."""
+    scope = _scope.get()
+    if scope is None:
+        return
+    scope.wrote = True
+    if scope.alias is None:
+        scope.pin = True
+
+
+def is_pinned(request):
+    """Whether the client wrote within the last ANALYTICS_STICKY_SECONDS."""
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin(response):
+    """Keep the client on the primary for ANALYTICS_STICKY_SECONDS."""
+    seconds = getattr(settings, 'ANALYTICS_STICKY_SECONDS', 15)
+    response.set_cookie(
+        PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds,
+        httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+    )
@@ -0,0 +1,94 @@
+"""Role (auth group) resolution with caching.
+
+Permission checks only need the names of a user's groups. `role_names()`
+loads them with one query, memoizes the result on the user object for the
+rest of the request and keeps it in the Django cache between requests, so
+polling POS terminals do not hit auth_user_groups on every call.
+
+Cache keys carry the "roles" data version (versioning.py), which is bumped
+whenever a membership changes (m2m_changed on User.groups) or a group is
+renamed or deleted (see signals.py). The token lives in the database, so a
+revoked role stops working on every worker at once, even with a
+per-process cache; the price is one token read per request.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from . import versioning
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'roles'
+DEFAULT_TIMEOUT = 300
+
+OWNER = 'Owner'
+ADMIN = 'Admin'
+CASHIER = 'Cashier'
+
+# Attribute used to memoize the names on the user object for one request
+_MEMO = '_role_names'
+
+
+def _timeout():
+    return int(getattr(settings, 'ROLE_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+
+def _load(user_id):
+    return frozenset(
+        User.groups.through.objects.filter(user_id=user_id).values_list('group__name', flat=True)
+    )
+
+
+def role_names(user):
+    """Frozenset of the user's group names (empty for anonymous users)."""
+    if user is None or not getattr(user, 'is_authenticated', False) or not user.pk:
+        return frozenset()
+    memo = getattr(user, _MEMO, None)
+    if memo is not None:
+        return memo
+
+    key = None
+    names = None
+    try:
+        token = versioning.tokens([versioning.ROLES])[versioning.ROLES]
+        key = f'{KEY_PREFIX}:{user.pk}:{token}'
+        names = cache.get(key)
+    except Exception:
+        logger.exception('Role cache lookup failed')
+    if names is None:
+        names = _load(user.pk)
+        if key is not None:
+            try:
+                cache.set(key, names, _timeout())
+            except Exception:
+                logger.exception('Role cache store failed')
+    setattr(user, _MEMO, names)
+    return names
+
+
+def has_role(user, *names):
+    """True when the user belongs to any of `names`."""
+    return not role_names(user).isdisjoint(names)
+
+
+def is_owner(user):
+    return OWNER in role_names(user)
+
+
+def role_matrix(user_ids):
+    """{user_id: set of group names} for many users in one query."""
+    matrix = {uid: set() for uid in user_ids}
+    rows = User.groups.through.objects.filter(user_id__in=list(matrix)).values_list('user_id', 'group__name')
+    for uid, name in rows:
+        matrix[uid].add(name)
+    return matrix
+
+
+def invalidate(user=None):
+    """Retire every cached role set; also clears the memo on `user` if given."""
+    if user is not None:
+        user.__dict__.pop(_MEMO, None)
+    versioning.bump(versioning.ROLES)
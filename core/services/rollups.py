@@ -0,0 +1,186 @@
+"""Maintenance of the DailyProductSales rollup table.
+
+Every Sale write touches exactly one (product, date) cell, so instead of
+applying +/- deltas we recompute the touched cells from the Sale table. That
+keeps the rollup exact even when a sale moves between products or dates and
+costs one small grouped query per write.
+
+Bulk writers (imports, checkout) can wrap their work in `deferred()` so the
+per-row signal handlers only collect keys and the cells are refreshed once at
+the end. Every refresh also bumps the "sales" data version so cached forecasts
+built from the old figures are skipped, and marks persisted forecast states
+that already consumed the touched dates for refit.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+import logging
+import threading
+
+from django.db.models import Sum, Count, Case, When, Value, IntegerField, Q
+
+from ..models import Sale, DailyProductSales
+from .forecasting import MAX_UNITS_PER_SALE
+from . import forecast_state, versioning
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def normalize_date(value):
+    """Return a `date` for whatever a Sale.date attribute currently holds.
+
+    Unsaved instances may still carry the `timezone.now` default (a datetime)
+    or a string passed by callers; the database stores the converted date.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime) or isinstance(value, str):
+        return Sale._meta.get_field('date').to_python(value)
+    return value
+
+
+def _aggregate(keys):
+    """Grouped Sale totals for the given (product_id, date) keys."""
+    cond = Q()
+    by_date = {}
+    for pid, d in keys:
+        by_date.setdefault(d, set()).add(pid)
+    for d, pids in by_date.items():
+        cond |= Q(date=d, product_id__in=pids)
+    rows = (
+        Sale.objects.filter(cond)
+        .values('product_id', 'date')
+        .annotate(
+            units=Sum('units_sold'),
+            capped=Sum(Case(
+                When(units_sold__gt=MAX_UNITS_PER_SALE, then=Value(MAX_UNITS_PER_SALE)),
+                default='units_sold',
+                output_field=IntegerField()
+            )),
+            revenue=Sum('revenue'),
+            lines=Count('id'),
+        )
+        .order_by()
+    )
+    return {(r['product_id'], r['date']): r for r in rows}
+
+
+def refresh_daily_rollups(keys):
+    """Recompute the rollup cells for an iterable of (product_id, date) keys."""
+    keys = {(pid, normalize_date(d)) for pid, d in keys if pid is not None and d is not None}
+    if not keys:
+        return 0
+
+    if getattr(_local, 'pending', None) is not None:
+        _local.pending.update(keys)
+        return 0
+
+    keys = list(keys)
+    # Keep each statement's parameter count bounded
+    chunk = 200
+    for i in range(0, len(keys), chunk):
+        part = keys[i:i + chunk]
+        totals = _aggregate(part)
+        upserts = []
+        empty = []
+        for key in part:
+            r = totals.get(key)
+            if r and r['lines']:
+                upserts.append(DailyProductSales(
+                    product_id=key[0], date=key[1], units=r['units'] or 0,
+                    capped_units=r['capped'] or 0, revenue=r['revenue'] or 0,
+                    order_count=r['lines'],
+                ))
+            else:
+                empty.append(key)
+        if upserts:
+            DailyProductSales.objects.bulk_create(
+                upserts,
+                update_conflicts=True,
+                unique_fields=['product', 'date'],
+                update_fields=['units', 'capped_units', 'revenue', 'order_count'],
+            )
+        if empty:
+            cond = Q()
+            for pid, d in empty:
+                cond |= Q(product_id=pid, date=d)
+            DailyProductSales.objects.filter(cond).delete()
+    forecast_state.invalidate(min(d for _, d in keys))
+    versioning.bump(versioning.SALES)
+    return len(keys)
+
+
+@contextmanager
+def deferred():
+    """Collect rollup keys while the block runs and refresh them once at exit.
+
+    Nested use is allowed; only the outermost block flushes.
+    """
+    outer = getattr(_local, 'pending', None) is None
+    if outer:
+        _local.pending = set()
+    try:
+        yield
+    except Exception:
+        if outer:
+            pending, _local.pending = _local.pending, None
+            # Rows written before the failure may have been committed; try to
+            # keep their cells accurate but never mask the original error.
+            try:
+                refresh_daily_rollups(pending)
+            except Exception:
+                logger.exception('Failed to refresh %d rollup cells after an aborted bulk write', len(pending))
+        raise
+    else:
+        if outer:
+            pending, _local.pending = _local.pending, None
+            refresh_daily_rollups(pending)
+
+
+def rebuild_daily_rollups(start=None, end=None, batch_size=2000):
+    """Rebuild the rollup table (optionally only for dates in [start, end]).
+
+    Returns the number of rollup rows written.
+    """
+    qs = Sale.objects.all()
+    stale = DailyProductSales.objects.all()
+    if start:
+        qs = qs.filter(date__gte=start)
+        stale = stale.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+        stale = stale.filter(date__lte=end)
+    stale.delete()
+
+    rows = (
+        qs.values('product_id', 'date')
+        .annotate(
+            units=Sum('units_sold'),
+            capped=Sum(Case(
+                When(units_sold__gt=MAX_UNITS_PER_SALE, then=Value(MAX_UNITS_PER_SALE)),
+                default='units_sold',
+                output_field=IntegerField()
+            )),
+            revenue=Sum('revenue'),
+            lines=Count('id'),
+        )
+        .order_by()
+    )
+    written = 0
+    batch = []
+    for r in rows.iterator(chunk_size=batch_size):
+        batch.append(DailyProductSales(
+            product_id=r['product_id'], date=r['date'], units=r['units'] or 0,
+            capped_units=r['capped'] or 0, revenue=r['revenue'] or 0, order_count=r['lines'] or 0,
+        ))
+        if len(batch) >= batch_size:
+            DailyProductSales.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        DailyProductSales.objects.bulk_create(batch)
+        written += len(batch)
+    forecast_state.invalidate(start)
+    versioning.bump(versioning.SALES)
+    return written
@@ -0,0 +1,248 @@
+"""Process startup: fingerprinted one-time setup and pre-fork warm-up.
+
+One-time initialization (migrate, cache table, static files, admin user)
+lives in `prestart()`, run once per deploy by `manage.py prestart`. When it
+finishes it records a fingerprint of the code's migrations and the settings
+that affect setup, in the database (DataVersion "startup") for the schema
+and in STATIC_ROOT for collected static files.
+
+`boot()` runs when the WSGI module is imported. If the stored fingerprint
+matches, it costs one query and skips the migration graph, collectstatic
+and the admin lookup. Otherwise it falls back to the full checks that
+wsgi.py used to run on every boot. With gunicorn --preload this happens
+once in the master. `warm()` then imports the numeric libraries and
+compiles URL patterns and templates before the workers fork, so they share
+those pages copy-on-write.
+"""
+import hashlib
+import importlib
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+STARTUP_KEY = 'startup'
+STATIC_STAMP = '.startup-fingerprint'
+
+# Imported before fork when warming; missing optional packages are skipped
+WARM_MODULES = (
+    'numpy',
+    'pandas',
+    'core.services.forecasting',
+    'core.services.model_selection',
+    'core.services.forecast_state',
+    'core.services.forecast_payloads',
+)
+WARM_TEMPLATES = (
+    'layouts/base.html',
+    'pages/dashboard.html',
+    'pages/sales_dashboard.html',
+    'pages/product_list.html',
+)
+
+
+def _say(line):
+    # Startup output goes to stdout so it shows in the platform's deploy log
+    print(f'[startup] {line}', flush=True)
+
+
+def _hash_tree(digest, root, suffixes):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not name.endswith(suffixes):
+                continue
+            path = os.path.join(dirpath, name)
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, 'rb') as fh:
+                digest.update(hashlib.sha256(fh.read()).digest())
+
+
+def schema_fingerprint():
+    """Hash of every installed app's migration files plus the database/app settings."""
+    from django.apps import apps
+
+    digest = hashlib.sha256()
+    for config in sorted(apps.get_app_configs(), key=lambda c: c.label):
+        migrations = os.path.join(config.path, 'migrations')
+        digest.update(config.label.encode())
+        if os.path.isdir(migrations):
+            _hash_tree(digest, migrations, ('.py',))
+    db = settings.DATABASES.get('default', {})
+    for value in (db.get('ENGINE'), db.get('NAME'), db.get('HOST'), db.get('PORT'), ','.join(settings.INSTALLED_APPS)):
+        digest.update(str(value).encode())
+    return digest.hexdigest()[:32]
+
+
+def static_fingerprint():
+    """Hash of the source static files and the storage backend that collects them."""
+    from django.contrib.staticfiles.finders import get_finders
+
+    digest = hashlib.sha256()
+    digest.update(str(getattr(settings, 'STATICFILES_STORAGE', '')).encode())
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            digest.update(path.encode())
+            try:
+                stat = os.stat(storage.path(path))
+                digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+            except (NotImplementedError, OSError):
+                pass
+    return digest.hexdigest()[:32]
+
+
+def _stored_schema():
+    from ..models import DataVersion
+    return DataVersion.objects.filter(key=STARTUP_KEY).values_list('token', flat=True).first()
+
+
+def _store_schema(fingerprint):
+    from ..models import DataVersion
+    DataVersion.objects.update_or_create(key=STARTUP_KEY, defaults={'token': fingerprint})
+
+
+def _static_stamp():
+    return os.path.join(str(settings.STATIC_ROOT), STATIC_STAMP)
+
+
+def static_current(fingerprint):
+    try:
+        with open(_static_stamp()) as fh:
+            return fh.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+def _store_static(fingerprint):
+    os.makedirs(str(settings.STATIC_ROOT), exist_ok=True)
+    with open(_static_stamp(), 'w') as fh:
+        fh.write(fingerprint)
+
+
+def ensure_admin():
+    """Create the default superuser once (ADMIN_PASSWORD / ADMIN_EMAIL)."""
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    if User.objects.filter(username='admin').exists():
+        return False
+    User.objects.create_superuser(
+        'admin',
+        os.getenv('ADMIN_EMAIL', 'admin@koki-foodhub.com'),
+        os.getenv('ADMIN_PASSWORD', 'admin123'),
+    )
+    return True
+
+
+def prestart(force=False, collect_static=None, log=_say):
+    """Idempotent one-time setup; returns the list of steps that actually ran."""
+    from django.core.management import call_command
+    from django.db import DatabaseError
+
+    ran = []
+    schema = schema_fingerprint()
+    stored = None
+    try:
+        stored = _stored_schema()
+    except DatabaseError:
+        # No DataVersion table yet: first deploy
+        pass
+    if force or stored != schema:
+        call_command('migrate', interactive=False, verbosity=1)
+        call_command('createcachetable', verbosity=0)
+        if ensure_admin():
+            log('created admin user')
+        _store_schema(schema)
+        ran.append('migrate')
+    else:
+        log('schema unchanged; skipping migrate')
+
+    if collect_static is None:
+        collect_static = not settings.DEBUG
+    if collect_static:
+        static = static_fingerprint()
+        if force or not static_current(static):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            _store_static(static)
+            ran.append('collectstatic')
+        else:
+            log('static files unchanged; skipping collectstatic')
+    return ran
+
+
+def images_pending():
+    from ..models import Product
+    return Product.objects.exclude(image='').exclude(image__isnull=True).filter(image_hash='').exists()
+
+
+def forecasts_fresh():
+    from .forecast_snapshots import STORE, latest
+    return latest(STORE, 'forecast_view') is not None
+
+
+def boot():
+    """Per-process startup check used by wsgi.py; sets settings.DB_AVAILABLE.
+
+    Fast path: the stored fingerprint matches the code, so nothing else runs.
+    Slow path (no prestart yet, or new migrations): the full check, which
+    migrates and collects static files as needed.
+    """
+    from django.db import DatabaseError
+
+    started = time.monotonic()
+    try:
+        connections['default'].ensure_connection()
+        try:
+            stored = _stored_schema()
+        except DatabaseError:
+            # Tables not created yet (first boot before any migrate)
+            stored = None
+        if stored == schema_fingerprint():
+            settings.DB_AVAILABLE = True
+            _say(f'schema fingerprint current; ready in {(time.monotonic() - started) * 1000:.0f} ms')
+            return True
+
+        _say('schema fingerprint changed or missing; running full startup checks')
+        prestart(collect_static=os.getenv('DEBUG', 'True') != 'True')
+        settings.DB_AVAILABLE = True
+        _say(f'startup checks finished in {time.monotonic() - started:.1f}s')
+        return True
+    except Exception as e:
+        logger.exception('Startup check failed')
+        _say(f'startup error: {e}')
+        settings.DB_AVAILABLE = False
+        # Continue by default so static pages stay up; ABORT_ON_DB_FAILURE=true makes it fatal
+        if os.getenv('ABORT_ON_DB_FAILURE', '').lower() == 'true':
+            raise
+        _say('DB check failed; continuing startup with limited features')
+        return False
+
+
+def warm():
+    """Import heavy modules and compile URLs/templates so forked workers share them."""
+    started = time.monotonic()
+    loaded = []
+    for name in WARM_MODULES:
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except Exception:
+            logger.debug('Skipping warm import of %s', name, exc_info=True)
+    try:
+        from django.template.loader import get_template
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+        for name in WARM_TEMPLATES:
+            get_template(name)
+    except Exception:
+        logger.warning('Template/URL warm-up failed', exc_info=True)
+    _say(f'warmed {len(loaded)} modules in {(time.monotonic() - started) * 1000:.0f} ms')
+    return loaded
+
+
+def release_connections():
+    """Close DB connections opened during startup so forked workers never share a socket."""
+    connections.close_all()
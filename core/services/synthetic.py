@@ -0,0 +1,132 @@
+"""Deterministic synthetic sales data for benchmarks.
+
+`generate()` creates products (with inventory), then checkout-shaped orders
+of one to four sale lines spread over the last `days` days, and rebuilds the
+derived tables (order totals are written directly, daily rollups and the
+hourly demand cube via their rebuild functions). The same seed and sizes
+always produce the same rows, so benchmark runs on different commits
+measure identical data.
+
+Sales follow the patterns of generate_sales_data.py: categories with
+different base demand, quieter weekends, a mild upward trend and a skewed
+product popularity, so forecasts and rankings have something to work with.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+import random
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Product, InventoryItem, Order, Sale
+from . import versioning
+
+# Category -> relative daily demand (see generate_sales_data.py)
+CATEGORY_WEIGHTS = {
+    'Burgers': 150,
+    'Pizza': 130,
+    'Appetizers': 100,
+    'Sides': 90,
+    'Salads': 80,
+    'Beverages': 200,
+    'Dessert': 70,
+}
+SIZED_CATEGORIES = ('Pizza', 'Beverages')
+NAME_PREFIX = 'bench'
+
+
+def _products(count, rng):
+    categories = list(CATEGORY_WEIGHTS)
+    products = []
+    for i in range(count):
+        category = categories[i % len(categories)]
+        products.append(Product(
+            name=f'{NAME_PREFIX}_{category.lower()}_{i:05d}',
+            category=category,
+            price=Decimal(rng.randrange(40, 600)),
+            size='M' if category in SIZED_CATEGORIES else None,
+        ))
+    Product.objects.bulk_create(products, batch_size=1000)
+    products = list(Product.objects.filter(name__startswith=f'{NAME_PREFIX}_').order_by('id'))
+    InventoryItem.objects.bulk_create([
+        InventoryItem(product=p, sku=f'BENCH-{p.id}', quantity=1_000_000, reorder_point=10)
+        for p in products
+    ], batch_size=1000)
+    return products
+
+
+def _day_weights(days, today):
+    weights = []
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        weight = 0.8 if day.weekday() >= 5 else 1.0
+        # Newer days sell a little more (up to +30% at the end of the range)
+        weight *= 1.0 + 0.3 * (days - offset) / days
+        weights.append(weight)
+    return weights
+
+
+def generate(products=50, sales=10_000, days=365, seed=42, batch_size=5000, log=None):
+    """Create the dataset; returns {'products', 'orders', 'sales', 'seconds'}."""
+    rng = random.Random(seed)
+    started = time.monotonic()
+    today = timezone.localdate()
+    now = timezone.now()
+
+    with transaction.atomic():
+        catalog = _products(products, rng)
+    # Zipf-like popularity within the category demand
+    product_cum = list(accumulate(CATEGORY_WEIGHTS[p.category] / (1 + (i % 40)) for i, p in enumerate(catalog)))
+    day_offsets = list(range(days))
+    day_cum = list(accumulate(_day_weights(days, today)))
+
+    written = orders_written = 0
+    while written < sales:
+        with transaction.atomic():
+            headers, lines = [], []
+            pending = 0
+            while written + pending < sales and pending < batch_size:
+                offset = rng.choices(day_offsets, cum_weights=day_cum)[0]
+                created = now - timedelta(days=offset, minutes=rng.randrange(12 * 60))
+                cart = []
+                for product in rng.choices(catalog, cum_weights=product_cum, k=min(rng.randint(1, 4), sales - written - pending)):
+                    units = rng.randint(1, 5)
+                    cart.append(Sale(
+                        product=product, date=today - timedelta(days=offset), timestamp=created,
+                        units_sold=units, revenue=product.price * units,
+                    ))
+                headers.append(Order(
+                    date=today - timedelta(days=offset), created_at=created,
+                    total_revenue=sum((s.revenue for s in cart), Decimal('0')),
+                    total_units=sum(s.units_sold for s in cart), line_count=len(cart),
+                ))
+                lines.append(cart)
+                pending += len(cart)
+            Order.objects.bulk_create(headers, batch_size=batch_size)
+            batch = []
+            for header, cart in zip(headers, lines):
+                for sale in cart:
+                    # Backends that cannot return ids from bulk inserts leave the lines order-less
+                    sale.order_id = header.pk
+                    batch.append(sale)
+            Sale.objects.bulk_create(batch, batch_size=batch_size)
+        written += len(batch)
+        orders_written += len(headers)
+        if log:
+            log(f'{written}/{sales} sales')
+
+    from .intraday import rebuild_hourly_demand
+    from .rollups import rebuild_daily_rollups
+    with transaction.atomic():
+        rebuild_daily_rollups()
+        rebuild_hourly_demand()
+    versioning.bump(versioning.SALES, versioning.CATALOG)
+    return {
+        'products': len(catalog),
+        'orders': orders_written,
+        'sales': written,
+        'seconds': round(time.monotonic() - started, 2),
+    }
+
@@ -0,0 +1,70 @@
+"""Data-version tokens used to invalidate derived caches.
+
+Each key names a family of data ("sales", "catalog", "roles"). Writers call
+`bump()` after changing that data; readers put `tokens()` into their cache
+keys so any write makes older entries unreachable. Tokens live in the
+database, so every gunicorn worker sees a bump immediately even with a
+per-process cache.
+"""
+import logging
+import uuid
+
+from django.db import IntegrityError, transaction
+
+from ..models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+SALES = 'sales'
+CATALOG = 'catalog'
+# Group memberships and names (permission checks)
+ROLES = 'roles'
+
+
+def _new_token():
+    return uuid.uuid4().hex
+
+
+def _create(key):
+    try:
+        with transaction.atomic():
+            return DataVersion.objects.create(key=key, token=_new_token()).token
+    except IntegrityError:
+        # Another request created it first
+        return DataVersion.objects.filter(key=key).values_list('token', flat=True).first()
+
+
+def tokens(keys):
+    """Return {key: token} for `keys`, creating missing rows with a fresh token."""
+    keys = list(keys)
+    found = dict(DataVersion.objects.filter(key__in=keys).values_list('key', 'token'))
+    for key in keys:
+        if key not in found:
+            found[key] = _create(key)
+    return found
+
+
+def stamps(keys):
+    """Return {key: (token, updated_at)} for `keys`, creating missing rows like `tokens()`."""
+    keys = list(keys)
+    rows = DataVersion.objects.filter(key__in=keys).values_list('key', 'token', 'updated_at')
+    found = {key: (token, updated_at) for key, token, updated_at in rows}
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            _create(key)
+        rows = DataVersion.objects.filter(key__in=missing).values_list('key', 'token', 'updated_at')
+        found.update({key: (token, updated_at) for key, token, updated_at in rows})
+    return found
+
+
+def bump(*keys):
+    """Give each key a new token so caches built from the old data are skipped."""
+    for key in keys:
+        try:
+            updated = DataVersion.objects.filter(key=key).update(token=_new_token())
+            if not updated:
+                _create(key)
+        except Exception:
+            # A failed bump must never break the write that triggered it
+            logger.exception('Failed to bump data version %s', key)
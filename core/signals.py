@@ -0,0 +1,83 @@
+"""Model signal handlers that keep derived tables and caches in sync with writes.
+
+Registered from CoreConfig.ready().
+"""
+import logging
+
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Product, InventoryItem, Sale
+from .services import intraday, orders, roles, rollups, versioning
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Sale)
+def remember_previous_sale_key(sender, instance, raw=False, **kwargs):
+    """Stash the stored (product, date) and order so an edit that moves a sale refreshes both sides."""
+    instance._previous_rollup_key = None
+    instance._previous_order_id = None
+    instance._previous_hourly_entry = None
+    if raw or instance._state.adding or not instance.pk:
+        return
+    old = Sale.objects.filter(pk=instance.pk).values_list(
+        'product_id', 'date', 'order_id', 'timestamp', 'units_sold', 'revenue'
+    ).first()
+    if old:
+        instance._previous_rollup_key = old[:2]
+        instance._previous_order_id = old[2]
+        instance._previous_hourly_entry = (old[0], old[3], old[4], old[5])
+
+
+@receiver(post_save, sender=Sale)
+def refresh_sale_aggregates_on_save(sender, instance, **kwargs):
+    keys = {(instance.product_id, instance.date)}
+    previous = getattr(instance, '_previous_rollup_key', None)
+    if previous:
+        keys.add(previous)
+    rollups.refresh_daily_rollups(keys)
+    orders.refresh_order_totals({instance.order_id, getattr(instance, '_previous_order_id', None)})
+    if not kwargs.get('raw'):
+        # Edits subtract the stored version from its hour cell before adding the new one
+        hourly = getattr(instance, '_previous_hourly_entry', None)
+        intraday.record(added=[intraday.sale_entry(instance)], removed=[hourly] if hourly else [])
+
+
+@receiver(post_delete, sender=Sale)
+def refresh_sale_aggregates_on_delete(sender, instance, origin=None, **kwargs):
+    orders.refresh_order_totals({instance.order_id})
+    # Deleting a product cascades to its rollup rows as well; nothing to recompute.
+    if isinstance(origin, Product):
+        return
+    rollups.refresh_daily_rollups({(instance.product_id, instance.date)})
+    intraday.record(removed=[intraday.sale_entry(instance)])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def bump_catalog_version(sender, raw=False, **kwargs):
+    """Product names, categories and stock appear in cached forecast payloads."""
+    if raw:
+        return
+    versioning.bump(versioning.CATALOG)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, **kwargs):
+    """Retire cached role names when a user joins or leaves a group (from either side)."""
+    if not action.startswith('post_'):
+        return
+    roles.invalidate(user=None if reverse else instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, raw=False, created=False, **kwargs):
+    """A renamed or deleted group changes the names cached for all of its members."""
+    if raw or created:
+        return
+    roles.invalidate()
@@ -73,7 +73,7 @@
 
       // Otherwise fetch from API
       const url = '/forecast/api/';
-      const res = await fetch(url, { credentials: 'same-origin' });
+      const res = await fetch(url, { credentials: 'same-origin', cache: 'no-cache' });
       if(!res.ok) throw new Error('Network response not ok: ' + res.status);
       const json = await res.json();
 
@@ -324,7 +324,7 @@ async function fetchSeries(){
     
     console.log('[Forecast Chart] Fetching from URL:', url.toString());
     
-    const res = await fetch(url, { credentials: 'same-origin', cache: 'no-store' });
+    const res = await fetch(url, { credentials: 'same-origin', cache: 'no-cache' });
     if(!res.ok) throw new Error('Network response not ok: ' + res.status);
     const json = await res.json();
     // expose last raw payload for diagnostics
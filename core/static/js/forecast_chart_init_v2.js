@@ -429,7 +429,7 @@
       
       console.log('[Forecast Chart] Fetching from URL:', url.toString());
       
-      const res = await fetch(url, { credentials: 'same-origin', cache: 'no-store' });
+      const res = await fetch(url, { credentials: 'same-origin', cache: 'no-cache' });
       if(!res.ok) {
         const txt = await res.text();
         console.warn('[Forecast Chart] API response not ok:', res.status, res.statusText);
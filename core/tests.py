@@ -424,28 +424,18 @@ class BackupCommandTests(TestCase):
             if had:
                 setattr(mod, 'forecast_time_series', saved)
 
-    def test_forecast_time_series_handles_sklearn_unavailable(self):
-        """When scikit-learn can't be imported, forecasts should fallback and not crash."""
-        import importlib
-        mod = importlib.import_module('core.services.forecasting')
-        # Backup original state
-        saved_flag = getattr(mod, '_SKLEARN_AVAILABLE', None)
-        saved_lr = getattr(mod, '_LinearRegression', None)
-        try:
-            # Simulate sklearn unavailable
-            mod._SKLEARN_AVAILABLE = False
-            mod._LinearRegression = None
-            series = [('2026-01-01', 100), ('2026-01-02', 120), ('2026-01-03', 110)]
-            res = mod.forecast_time_series(series, horizon=7)
-            self.assertIn('forecast', res)
-            self.assertEqual(len(res['forecast']), 7)
-            self.assertTrue(any(v != 0 for v in res['forecast']), 'Forecast should not be all zeros when data provided')
-            self.assertTrue(res.get('fallback') is True)
-            self.assertEqual(res.get('fallback_reason'), 'sklearn_unavailable')
-        finally:
-            # restore
-            mod._SKLEARN_AVAILABLE = saved_flag
-            mod._LinearRegression = saved_lr
+    def test_forecast_time_series_without_numpy(self):
+        """Without numpy the linear forecast uses the pure-Python kernel and gives the same result."""
+        from unittest import mock
+        from core.services import forecasting, regression
+        series = [('2026-01-01', 100), ('2026-01-02', 120), ('2026-01-03', 110), ('2026-01-04', 135)]
+        expected = forecasting.forecast_time_series(series, horizon=7, method='linear')
+        with mock.patch.object(regression, '_numpy', return_value=None):
+            res = forecasting.forecast_time_series(series, horizon=7, method='linear')
+        self.assertEqual(res, expected)
+        self.assertEqual(len(res['forecast']), 7)
+        self.assertTrue(any(v != 0 for v in res['forecast']), 'Forecast should not be all zeros when data provided')
+        self.assertNotIn('fallback', res)
 
     def test_product_forecast_product_detail_and_filters(self):
         """Check that product_detail is returned for a product_id and that price/top filters apply."""
@@ -587,6 +577,18 @@ class BackupCommandTests(TestCase):
         self.assertNotEqual(pred, 100)
         self.assertTrue(1 <= pred <= 10, f'Unexpected forecast {pred}')
 
+    def test_moving_average_forecast_averages_sale_lines(self):
+        """The moving average is per sale line, as before the rollup: 20 single-unit sales a day forecast 1."""
+        from .services.forecasting import moving_average_forecast
+        p = Product.objects.create(name="Busy Item", category="Test", price=Decimal("5.00"))
+        today = date.today()
+        for days_ago in range(3):
+            for _ in range(20):
+                Sale.objects.create(product=p, date=today - timedelta(days=days_ago), units_sold=1, revenue=Decimal("5.00"))
+        result = moving_average_forecast(window=3, lookback_days=7)['db_forecasts'][p.id]
+        self.assertEqual(result['forecast'], 1)
+        self.assertEqual(len(result['history']), 60)
+
     def test_forecast_exception_middleware_returns_id(self):
         """The middleware should catch uncaught exceptions and return an error id."""
         from django.test.client import RequestFactory
@@ -802,3 +804,1428 @@ class BackupCommandTests(TestCase):
                 importlib.reload(importlib.import_module('core.services.forecasting'))
             except Exception:
                 pass
+
+
+class BatchForecastTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        self.today = timezone.localdate()
+        self.products = []
+        for n in range(4):
+            p = Product.objects.create(name=f"Batch {n}", category="Batch", price=Decimal("10.00"))
+            self.products.append(p)
+            for i in range(40):
+                units = (n + 1) * (i % 5 + 1)
+                Sale.objects.create(product=p, date=self.today - timedelta(days=i), units_sold=units, revenue=Decimal("10.00") * units)
+        # One spike above the per-sale cap so capped and raw windows differ
+        Sale.objects.create(product=self.products[0], date=self.today, units_sold=500, revenue=Decimal("5000.00"))
+        InventoryItem.objects.create(product=self.products[1], sku="BATCH-1", quantity=3)
+
+    def test_batch_matches_single_product_summary(self):
+        """Batched horizons must match product_forecast_summary for every product."""
+        from .services.forecasting import product_forecast_summary
+        from .services.batch_forecasting import batch_product_forecasts
+        batch = batch_product_forecasts(self.products, lookback_days=180)
+        for p in self.products:
+            single = product_forecast_summary(p.id, horizons=(1, 7, 30), lookback_days=180)
+            self.assertEqual(batch[p.id]['horizons'], single['horizons'])
+            self.assertEqual(batch[p.id]['trend'], single['trend'])
+            self.assertAlmostEqual(batch[p.id]['avg'], single['avg'])
+        # Window sums use raw (uncapped) units
+        expected_last_7 = sum(1 * (i % 5 + 1) for i in range(7)) + 500
+        self.assertEqual(batch[self.products[0].id]['last_7_days'], expected_last_7)
+        self.assertTrue(batch[self.products[1].id]['in_stock'])
+        self.assertFalse(batch[self.products[2].id]['in_stock'])
+
+    def test_product_forecast_api_query_count_is_constant(self):
+        """Adding products must not add queries to the product forecast API."""
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        user = User.objects.create_user('batch_user', 'b@example.com', 'pass')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as few:
+            resp = self.client.get('/product-forecast/api/?category=Batch')
+        self.assertEqual(resp.status_code, 200)
+        for n in range(4, 12):
+            p = Product.objects.create(name=f"Batch {n}", category="Batch", price=Decimal("3.00"))
+            Sale.objects.create(product=p, date=self.today, units_sold=2, revenue=Decimal("6.00"))
+        with CaptureQueriesContext(connection) as many:
+            resp = self.client.get('/product-forecast/api/?category=Batch')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['summary']['count'], 12)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+
+
+class DailyRollupTests(TestCase):
+    def setUp(self):
+        self.p1 = Product.objects.create(name="Roll A", category="Roll", price=Decimal("5.00"))
+        self.p2 = Product.objects.create(name="Roll B", category="Roll", price=Decimal("5.00"))
+        self.day = date.today()
+
+    def _cell(self, product, day):
+        from .models import DailyProductSales
+        return DailyProductSales.objects.filter(product=product, date=day).first()
+
+    def test_rollup_follows_sale_create_update_delete(self):
+        """Creating, moving and deleting sales keeps the rollup cells exact."""
+        s1 = Sale.objects.create(product=self.p1, date=self.day, units_sold=3, revenue=Decimal("15.00"))
+        Sale.objects.create(product=self.p1, date=self.day, units_sold=150, revenue=Decimal("750.00"))
+        cell = self._cell(self.p1, self.day)
+        self.assertEqual((cell.units, cell.capped_units, cell.order_count), (153, 103, 2))
+        self.assertEqual(cell.revenue, Decimal("765.00"))
+
+        # Move one sale to another product and day
+        s1.product = self.p2
+        s1.date = self.day - timedelta(days=1)
+        s1.save()
+        self.assertEqual(self._cell(self.p1, self.day).units, 150)
+        self.assertEqual(self._cell(self.p2, s1.date).units, 3)
+
+        s1.delete()
+        self.assertIsNone(self._cell(self.p2, self.day - timedelta(days=1)))
+
+    def test_rebuild_rollups_command(self):
+        """rebuild_rollups recreates the table from the sale history."""
+        from django.core.management import call_command
+        from .models import DailyProductSales
+        from io import StringIO
+        Sale.objects.create(product=self.p1, date=self.day, units_sold=2, revenue=Decimal("10.00"))
+        Sale.objects.create(product=self.p2, date=self.day, units_sold=4, revenue=Decimal("20.00"))
+        DailyProductSales.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        self.assertEqual(DailyProductSales.objects.count(), 2)
+        self.assertEqual(self._cell(self.p2, self.day).units, 4)
+        self.assertIn('2', out.getvalue())
+
+    def test_benchmark_sale_indexes_uses_a_test_database(self):
+        """The index benchmark runs in a throwaway test database and reports both runs."""
+        from django.core.management import call_command
+        from django.db import connection
+        from io import StringIO
+        from unittest import mock
+        out = StringIO()
+        # Already inside the test database; only check the command asks for its own
+        with mock.patch.object(connection.creation, 'create_test_db', return_value='live') as create, \
+                mock.patch.object(connection.creation, 'destroy_test_db') as destroy, \
+                mock.patch('core.management.commands.benchmark_sale_indexes.setup_test_environment'), \
+                mock.patch('core.management.commands.benchmark_sale_indexes.teardown_test_environment'):
+            call_command('benchmark_sale_indexes', rows=300, products=3, days=30, repeat=1, stdout=out)
+        create.assert_called_once()
+        destroy.assert_called_once_with('live', verbosity=0)
+        self.assertIn('Without Sale indexes', out.getvalue())
+        self.assertIn('recent_orders', out.getvalue())
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, Sale._meta.db_table)
+        self.assertLessEqual({i.name for i in Sale._meta.indexes}, set(existing))
+
+
+class ForecastCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('cache_user', 'c@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Cache Pizza", category="Cache", price=Decimal("10.00"))
+        self.today = date.today()
+        for i in range(20):
+            Sale.objects.create(product=self.product, date=self.today - timedelta(days=i), units_sold=2, revenue=Decimal("20.00"))
+
+    def test_repeat_request_is_served_from_cache(self):
+        """A second identical request skips the forecast computation entirely."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as first:
+            resp1 = self.client.get('/product-forecast/api/?category=Cache')
+        with CaptureQueriesContext(connection) as second:
+            resp2 = self.client.get('/product-forecast/api/?category=Cache')
+        self.assertEqual(resp1.json(), resp2.json())
+        self.assertLess(len(second.captured_queries), len(first.captured_queries))
+        self.assertFalse(any('core_dailyproductsales' in q['sql'] for q in second.captured_queries))
+
+    def test_sale_write_invalidates_cached_payload(self):
+        """Writing a sale bumps the data version so the next request recomputes."""
+        before = self.client.get('/product-forecast/api/?category=Cache').json()
+        Sale.objects.create(product=self.product, date=self.today, units_sold=40, revenue=Decimal("400.00"))
+        after = self.client.get('/product-forecast/api/?category=Cache').json()
+        self.assertEqual(after['top'][0]['last_7_days'], before['top'][0]['last_7_days'] + 40)
+
+    def test_catalog_write_invalidates_cached_payload(self):
+        """Product edits show up even though no sale changed."""
+        self.client.get('/product-forecast/api/?category=Cache')
+        self.product.name = "Renamed Pizza"
+        self.product.save()
+        data = self.client.get('/product-forecast/api/?category=Cache').json()
+        self.assertEqual(data['top'][0]['product'], "Renamed Pizza")
+
+    def test_forecast_view_without_cache_module_keeps_real_forecasting(self):
+        """Only `cached` falls back when the cache module fails to import."""
+        import sys
+        from unittest import mock
+        from core.services import forecasting
+        real = forecasting.forecast_time_series
+        with mock.patch.dict(sys.modules, {'core.services.forecast_cache': None}), \
+                mock.patch.object(forecasting, 'forecast_time_series', side_effect=real) as spy:
+            resp = self.client.get('/forecast/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(spy.called)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user('till', 't@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.products = [Product.objects.create(name=f"Cart {n}", category="Cart", price=Decimal("50.00")) for n in range(10)]
+        for n, p in enumerate(self.products):
+            InventoryItem.objects.create(product=p, sku=f"CART-{n}", quantity=5)
+
+    def _post(self, items):
+        import json
+        return self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+
+    def test_cart_is_recorded_in_a_handful_of_queries(self):
+        """A 10-line cart writes every line, decrements stock and updates the rollup."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import DailyProductSales
+        items = [{'id': p.id, 'quantity': 2, 'price': '50.00'} for p in self.products]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._post(items)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['success'])
+        self.assertEqual(Sale.objects.count(), 10)
+        self.assertEqual(sorted(InventoryItem.objects.values_list('quantity', flat=True)), [3] * 10)
+        self.assertEqual(DailyProductSales.objects.filter(product=self.products[0]).get().revenue, Decimal("100.00"))
+        # Session/auth + products + locked inventory + insert + per-product updates + rollup refresh
+        self.assertLess(len(ctx.captured_queries), 30)
+
+    def test_failed_lines_are_reported_and_nothing_is_written(self):
+        """Every bad line is reported and the cart is rejected as a whole."""
+        items = [
+            {'id': self.products[0].id, 'quantity': 1, 'price': '50.00'},
+            {'id': self.products[1].id, 'quantity': 4, 'price': '50.00'},
+            {'id': self.products[1].id, 'quantity': 4, 'price': '50.00'},
+            {'id': 999999, 'quantity': 1, 'price': '10.00'},
+        ]
+        resp = self._post(items)
+        self.assertEqual(resp.status_code, 400)
+        data = resp.json()
+        self.assertIn('Insufficient inventory for Cart 1', data['error'])
+        self.assertEqual([e['line'] for e in data['line_errors']], [1, 2, 3])
+        self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(InventoryItem.objects.get(product=self.products[0]).quantity, 5)
+
+
+class OrderTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user('orders', 'o@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.a = Product.objects.create(name="Order A", category="Pizza", price=Decimal("100.00"))
+        self.b = Product.objects.create(name="Order B", category="Drinks", price=Decimal("40.00"))
+
+    def _checkout(self, items):
+        import json
+        return self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+
+    def test_checkout_writes_one_order_with_totals(self):
+        """A multi-line cart is one order; its header carries the totals."""
+        from .models import Order
+        resp = self._checkout([
+            {'id': self.a.id, 'quantity': 2, 'price': '100.00'},
+            {'id': self.b.id, 'quantity': 1, 'price': '40.00'},
+        ])
+        order = Order.objects.get(pk=resp.json()['order_id'])
+        self.assertEqual((order.line_count, order.total_units, order.total_revenue), (2, 3, Decimal("240.00")))
+        self.assertEqual(order.lines.count(), 2)
+
+        data = self.client.get('/api/sales/recent/').json()
+        self.assertEqual(len(data['orders']), 1)
+        self.assertEqual(data['orders'][0]['revenue'], 240.0)
+        self.assertEqual(len(data['orders'][0]['lines']), 2)
+
+    def test_recent_orders_include_orderless_sales(self):
+        """Sale lines without an order are listed as single-line orders, newest first."""
+        from django.utils import timezone
+        self._checkout([{'id': self.a.id, 'quantity': 1, 'price': '100.00'}])
+        Sale.objects.create(
+            product=self.b, date=date.today(), timestamp=timezone.now() + timedelta(minutes=1),
+            units_sold=2, revenue=Decimal("80.00"),
+        )
+        orders = self.client.get('/api/sales/recent/').json()['orders']
+        self.assertEqual(len(orders), 2)
+        self.assertIsNone(orders[0]['id'])
+        self.assertEqual((orders[0]['product_name'], orders[0]['revenue'], orders[0]['line_count']), ("Order B", 80.0, 1))
+        self.assertEqual(orders[1]['revenue'], 100.0)
+
+    def test_dashboard_counts_orders_not_lines(self):
+        """Order metrics count checkouts plus order-less legacy lines."""
+        from django.contrib.auth.models import Group
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self._checkout([
+            {'id': self.a.id, 'quantity': 1, 'price': '100.00'},
+            {'id': self.b.id, 'quantity': 1, 'price': '40.00'},
+        ])
+        Sale.objects.create(product=self.a, date=date.today(), units_sold=1, revenue=Decimal("60.00"))
+        resp = self.client.get('/sales-dashboard/')
+        self.assertEqual(resp.context['total_orders'], 2)
+        self.assertAlmostEqual(resp.context['avg_order'], 100.0)
+        self.assertEqual(resp.context['today_orders'], 2)
+
+    def test_editing_a_line_updates_order_totals(self):
+        """Editing or deleting a sale line keeps the order header in sync."""
+        from .models import Order
+        order_id = self._checkout([
+            {'id': self.a.id, 'quantity': 1, 'price': '100.00'},
+            {'id': self.b.id, 'quantity': 1, 'price': '40.00'},
+        ]).json()['order_id']
+        line = Sale.objects.get(order_id=order_id, product=self.b)
+        line.units_sold = 3
+        line.revenue = Decimal("120.00")
+        line.save()
+        self.assertEqual(Order.objects.get(pk=order_id).total_revenue, Decimal("220.00"))
+        Sale.objects.filter(order_id=order_id).delete()
+        self.assertFalse(Order.objects.filter(pk=order_id).exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        self.user = User.objects.create_user('pager', 'p@example.com', 'pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Pager Pizza", category="Pager", price=Decimal("10.00"))
+        self.today = date.today()
+        # Several sales share a date so the id tiebreaker matters
+        for i in range(25):
+            Sale.objects.create(product=self.product, date=self.today - timedelta(days=i // 3), units_sold=1, revenue=Decimal("10.00"))
+
+    def _walk(self, url):
+        ids, pages = [], []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            ids.extend(r['id'] for r in data['results'])
+            url = f"/api/sales/?per_page=10&cursor={data['next']}" if data['next'] else None
+        return ids, pages
+
+    def test_cursor_walk_returns_every_sale_once_in_order(self):
+        """Following next cursors visits every row exactly once, newest first."""
+        ids, pages = self._walk('/api/sales/?per_page=10')
+        expected = list(Sale.objects.order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(p['results']) for p in pages], [10, 10, 5])
+        self.assertIsNone(pages[0]['prev'])
+
+    def test_prev_cursor_returns_previous_page(self):
+        """A prev cursor from page two yields page one again."""
+        first = self.client.get('/api/sales/?per_page=10').json()
+        second = self.client.get(f"/api/sales/?per_page=10&cursor={first['next']}").json()
+        back = self.client.get(f"/api/sales/?per_page=10&cursor={second['prev']}").json()
+        self.assertEqual([r['id'] for r in back['results']], [r['id'] for r in first['results']])
+
+    def test_filters_and_bad_cursor(self):
+        """Date filters narrow the range; malformed cursors are rejected."""
+        data = self.client.get(f'/api/sales/?start={self.today.isoformat()}').json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertEqual(self.client.get('/api/sales/?cursor=not-a-cursor').status_code, 400)
+        resp = self.client.get('/sales/?per_page=10')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['sales']), 10)
+        self.assertIsNotNone(resp.context['next_url'])
+        InventoryItem.objects.create(product=self.product, sku="PAGER-1", quantity=2, reorder_point=5)
+        resp = self.client.get('/inventory/?sort=quantity&low_stock=1')
+        self.assertEqual([i.sku for i in resp.context['items']], ["PAGER-1"])
+        # An unparseable date is ignored rather than failing the page
+        self.assertEqual(len(self.client.get('/api/sales/?start=yesterday&per_page=50').json()['results']), 25)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        self.user = User.objects.create_user('exporter', 'e@example.com', 'pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client.force_login(self.user)
+        self.a = Product.objects.create(name="Export A", category="Pizza", price=Decimal("10.00"))
+        self.b = Product.objects.create(name="Export B", category="Drinks", price=Decimal("5.00"))
+        today = date.today()
+        for i in range(5):
+            Sale.objects.create(product=self.a, date=today - timedelta(days=i), units_sold=i + 1, revenue=Decimal("10.00") * (i + 1))
+        Sale.objects.create(product=self.b, date=today, units_sold=1, revenue=Decimal("5.00"))
+        self.today = today
+
+    def test_csv_export_streams_filtered_rows(self):
+        """CSV export streams a header plus the rows matching the filters."""
+        import csv, io
+        resp = self.client.get(f'/exports/sales/?product={self.a.id}&start={(self.today - timedelta(days=2)).isoformat()}')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        rows = list(csv.DictReader(io.StringIO(b''.join(resp.streaming_content).decode('utf-8'))))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({r['product'] for r in rows}, {"Export A"})
+
+    def test_gzip_ndjson_export(self):
+        """gzip=1 compresses the NDJSON stream on the fly."""
+        import gzip, json
+        resp = self.client.get('/exports/sales/?format=ndjson&gzip=1')
+        self.assertEqual(resp['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(resp.streaming_content)).decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]['units_sold'], 1)
+        self.assertEqual(self.client.get('/exports/nope/').status_code, 404)
+        self.assertEqual(self.client.get('/exports/sales/?start=2026-13-40').status_code, 400)
+
+    def test_export_command_writes_file(self):
+        """The export_data command writes the same stream to a file."""
+        import os, tempfile
+        from django.core.management import call_command
+        from io import StringIO
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'inventory.csv')
+            InventoryItem.objects.create(product=self.a, sku="EXP-1", quantity=4)
+            call_command('export_data', 'inventory', output=path, stderr=StringIO())
+            with open(path, encoding='utf-8') as fh:
+                lines = fh.read().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'sku'])
+        self.assertEqual(len(lines), 2)
+        out = StringIO()
+        call_command('export_data', 'products', format='ndjson', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
+
+
+class BulkImportTests(TestCase):
+    CSV = (
+        '"","id","date","time","name","size","type","price"\n'
+        '"1",1,"2015-01-01","11:38:36","hawaiian_m","M","classic",13.25\n'
+        '"2",2,"2015-01-01","11:57:40","classic_dlx_m","M","classic",16\n'
+        '"3",2,"2015-01-01","11:57:40","hawaiian_m","M","classic",13.25\n'
+        '"4",3,"2015-01-02","12:12:28","five_cheese_l","L","veggie",18.5\n'
+        '"5",4,"2015-01-02","12:16:31","hawaiian_m","M","classic",13.25\n'
+    )
+
+    def _write_csv(self, tmp):
+        import os
+        path = os.path.join(tmp, 'pizzaplace.csv')
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write(self.CSV)
+        return path
+
+    def test_bulk_import_creates_products_sales_and_rollups(self):
+        """Missing products are created once and every CSV line becomes a sale."""
+        import tempfile
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import DailyProductSales
+        existing = Product.objects.create(name="hawaiian_m", category="classic", price=Decimal("13.25"))
+        with tempfile.TemporaryDirectory() as tmp:
+            out = StringIO()
+            call_command('bulk_import_sales', csv=self._write_csv(tmp), chunk_size=2, stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(Product.objects.filter(name="hawaiian_m").count(), 1)
+        self.assertEqual(Product.objects.get(name="five_cheese_l").category, "veggie")
+        self.assertEqual(Sale.objects.count(), 5)
+        self.assertEqual(Sale.objects.filter(product=existing).count(), 3)
+        cell = DailyProductSales.objects.get(product=existing, date=date(2015, 1, 1))
+        self.assertEqual(cell.units, 2)
+        self.assertEqual(cell.revenue, Decimal("26.50"))
+
+    def test_resume_continues_after_checkpoint(self):
+        """A limited run leaves a checkpoint and --resume imports only the rest."""
+        import os, tempfile
+        from django.core.management import call_command
+        from io import StringIO
+        with tempfile.TemporaryDirectory() as tmp:
+            path = self._write_csv(tmp)
+            call_command('bulk_import_sales', csv=path, chunk_size=2, limit=3, stdout=StringIO())
+            self.assertEqual(Sale.objects.count(), 3)
+            self.assertTrue(os.path.exists(f'{path}.import-checkpoint.json'))
+            call_command('bulk_import_sales', csv=path, chunk_size=2, resume=True, stdout=StringIO())
+            self.assertEqual(Sale.objects.count(), 5)
+            self.assertFalse(os.path.exists(f'{path}.import-checkpoint.json'))
+
+
+class ForecastStateTests(TestCase):
+    def _series(self, n, start=date(2026, 1, 1)):
+        return [((start + timedelta(days=i)).isoformat(), 20 + (i % 7) * 3 + i) for i in range(n)]
+
+    def test_state_advances_without_reselecting(self):
+        """Later calls fold in only the new days and skip method selection."""
+        from unittest import mock
+        from .models import ForecastModelState
+        from .services import forecasting
+        from .services.forecasting import forecast_time_series, _holt_linear_forecast
+        series = self._series(40)
+        first = forecast_time_series(series[:-1], horizon=5, state_key='test:daily')
+        self.assertEqual(len(first['forecast']), 5)
+        state = ForecastModelState.objects.get(key='test:daily')
+        self.assertEqual(state.last_label, series[-3][0])
+
+        state.method = 'holt'
+        state.save()
+        with mock.patch.object(forecasting, 'select_best_forecasting_method', side_effect=AssertionError):
+            res = forecast_time_series(series[1:], horizon=5, state_key='test:daily')
+        state.refresh_from_db()
+        self.assertEqual(state.steps_since_fit, 1)
+        self.assertEqual(state.last_label, series[-2][0])
+        # The Holt recursion is exact, so folding in one day matches a full replay
+        replay, _ = _holt_linear_forecast([v for _, v in series], horizon=5, **{k: state.params[k] for k in ('alpha', 'beta')})
+        self.assertEqual(res['forecast'], replay)
+
+    def test_backdated_sale_forces_refit(self):
+        """A write dated inside the consumed history marks the state stale."""
+        from .models import ForecastModelState
+        from .services.forecasting import forecast_time_series
+        series = self._series(20, start=date.today() - timedelta(days=19))
+        forecast_time_series(series, horizon=3, state_key='test:stale')
+        p = Product.objects.create(name="State P", category="Pizza", price=Decimal("10.00"))
+        Sale.objects.create(product=p, date=date.today(), units_sold=1, revenue=Decimal("10.00"))
+        self.assertFalse(ForecastModelState.objects.get(key='test:stale').stale)
+        Sale.objects.create(product=p, date=date.today() - timedelta(days=5), units_sold=1, revenue=Decimal("10.00"))
+        self.assertTrue(ForecastModelState.objects.get(key='test:stale').stale)
+        forecast_time_series(series, horizon=3, state_key='test:stale')
+        self.assertFalse(ForecastModelState.objects.get(key='test:stale').stale)
+
+
+class ModelSelectionKernelTests(TestCase):
+    def test_kernel_matches_per_series_backtest(self):
+        """Scoring a batch of series at once picks the same method and params as the grid loop."""
+        from .services.forecasting import _holt_linear_forecast, _mape
+        from .services.model_selection import select_methods, holdout_size, HOLT_ALPHAS, HOLT_BETAS
+        series = [
+            [10 + i * 2 + (1 if i % 7 == 0 else 0) for i in range(30)],
+            [50 + (i % 5) * 4 for i in range(30)],
+            [max(0, 80 - i * 3) for i in range(30)],
+        ]
+        short = [5, 7, 6, 9, 8, 12, 11, 14, 13]
+        results = select_methods(series) + select_methods([short])
+        self.assertEqual(select_methods([[3, 4]])[0][0], 'ma')
+        for values, (method, params, diag) in zip(series + [short], results):
+            h = holdout_size(len(values))
+            train, test = values[:-h], values[-h:]
+            grid = [(_mape(test, _holt_linear_forecast(train, h, a, b)[0]), a, b) for a in HOLT_ALPHAS for b in HOLT_BETAS]
+            best = min(grid, key=lambda g: g[0])
+            self.assertAlmostEqual(diag['scores']['holt'], best[0])
+            if method == 'holt':
+                self.assertEqual(params, {'alpha': best[1], 'beta': best[2]})
+            self.assertEqual(diag['scores'][method], min(diag['scores'].values()))
+
+
+class ForecastSnapshotTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('snap', 's@example.com', 'pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client.force_login(self.user)
+        self.pizza = Product.objects.create(name="Snap Pizza", category="Pizza", price=Decimal("10.00"))
+        self.drink = Product.objects.create(name="Snap Drink", category="Drinks", price=Decimal("3.00"))
+        for i in range(20):
+            Sale.objects.create(product=self.pizza, date=date.today() - timedelta(days=i), units_sold=3, revenue=Decimal("30.00"))
+            Sale.objects.create(product=self.drink, date=date.today() - timedelta(days=i), units_sold=1, revenue=Decimal("3.00"))
+
+    def test_precompute_stores_every_scope(self):
+        """The command stores store, per-category/horizon and per-product snapshots."""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ForecastSnapshot
+        call_command('precompute_forecasts', stdout=StringIO())
+        scopes = set(ForecastSnapshot.objects.values_list('scope', 'key', 'horizon'))
+        self.assertIn(('store', 'forecast_data_api', 0), scopes)
+        self.assertIn(('store', 'forecast_view', 0), scopes)
+        for key in ('', 'Pizza', 'Drinks'):
+            for h in (1, 7, 30):
+                self.assertIn(('category', key, h), scopes)
+        self.assertIn(('product', str(self.pizza.id), 0), scopes)
+        resp = self.client.get('/forecast/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([d['product'] for d in resp.context['data']], ['Snap Pizza', 'Snap Drink'])
+        # Rerunning prunes old rows instead of growing without bound
+        for _ in range(4):
+            call_command('precompute_forecasts', skip_products=True, stdout=StringIO())
+        self.assertEqual(ForecastSnapshot.objects.filter(scope='category', key='Pizza', horizon=7).count(), 3)
+
+    def test_apis_serve_fresh_snapshot_and_fall_back_when_stale(self):
+        """Fresh snapshots are served as-is; stale ones are ignored in favour of on-demand results."""
+        from datetime import timedelta as td
+        from django.utils import timezone
+        from .models import ForecastSnapshot
+        from .services import forecast_snapshots
+        forecast_snapshots.store('category', 'Pizza', 7, {
+            'horizon': 7, 'top': [{'product': 'from-snapshot', 'forecast_h': 1}] * 12,
+            'trending': [], 'best': None, 'summary': {'count': 12},
+        })
+        data = self.client.get('/product-forecast/api/?category=Pizza&top=5').json()
+        self.assertEqual(len(data['top']), 5)
+        self.assertEqual(data['top'][0]['product'], 'from-snapshot')
+
+        # Filters outside the precomputed set are computed on demand
+        data = self.client.get('/product-forecast/api/?category=Pizza&search=Snap').json()
+        self.assertEqual(data['top'][0]['product'], 'Snap Pizza')
+
+        ForecastSnapshot.objects.update(generated_at=timezone.now() - td(days=2))
+        data = self.client.get('/product-forecast/api/?category=Pizza&top=5').json()
+        self.assertEqual(data['top'][0]['product'], 'Snap Pizza')
+
+        forecast_snapshots.store('store', 'forecast_data_api', 0, {'products': [{'product': 'Snap Pizza'}, {'product': 'Other'}], 'data_source': 'snapshot'})
+        data = self.client.get('/forecast/api/?product=Snap%20Pizza').json()
+        self.assertEqual(data['data_source'], 'snapshot')
+        self.assertEqual(data['products'], [{'product': 'Snap Pizza'}])
+
+
+class KpiWindowTests(TestCase):
+    def test_window_totals_in_one_query(self):
+        """Revenue and units for every standard window come from a single query."""
+        from .services.kpis import window_totals, standard_windows
+        p = Product.objects.create(name="KPI P", category="Pizza", price=Decimal("10.00"))
+        today = date(2026, 3, 4)  # a Wednesday
+        for offset, units in ((0, 2), (1, 3), (5, 4), (10, 5), (40, 7)):
+            Sale.objects.create(product=p, date=today - timedelta(days=offset), units_sold=units, revenue=Decimal("10.00") * units)
+        with self.assertNumQueries(1):
+            kpi = window_totals(standard_windows(today))
+        self.assertEqual(kpi['today'], {'revenue': 20.0, 'units': 2})
+        self.assertEqual(kpi['yesterday']['units'], 3)
+        self.assertEqual(kpi['this_week']['units'], 5)
+        self.assertEqual(kpi['prev_week']['units'], 4)
+        self.assertEqual(kpi['this_month']['units'], 5)
+        self.assertEqual(kpi['prev_month']['units'], 9)
+
+    def test_orders_count_headers_and_orphan_lines(self):
+        """Order counts add checkout headers to order-less sale lines per window."""
+        from .models import Order
+        from .services.kpis import window_totals
+        p = Product.objects.create(name="KPI Q", category="Pizza", price=Decimal("5.00"))
+        today = date.today()
+        order = Order.objects.create(date=today)
+        Sale.objects.create(product=p, order=order, date=today, units_sold=1, revenue=Decimal("5.00"))
+        Sale.objects.create(product=p, order=order, date=today, units_sold=2, revenue=Decimal("10.00"))
+        Sale.objects.create(product=p, date=today - timedelta(days=3), units_sold=1, revenue=Decimal("5.00"))
+        kpi = window_totals({'all': (None, None), 'today': (today, today)}, orders=True)
+        self.assertEqual(kpi['today'], {'revenue': 15.0, 'units': 3, 'orders': 1})
+        self.assertEqual(kpi['all']['orders'], 2)
+
+
+class CatalogSnapshotTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.p = Product.objects.create(name="hawaiian_pizza", category="Pizza", price=Decimal("20.00"), size="M")
+        self.q = Product.objects.create(name="cola", category="Drinks", price=Decimal("3.00"))
+        InventoryItem.objects.create(product=self.p, sku="CAT-1", quantity=2, reorder_point=5)
+        InventoryItem.objects.create(product=self.p, sku="CAT-2", quantity=50, reorder_point=5)
+
+    def test_snapshot_is_cached_until_catalog_changes(self):
+        """A repeat read costs only the version lookup; inventory writes rebuild it."""
+        from .services.catalog import catalog_snapshot
+        snap = catalog_snapshot()
+        by_id = {p['id']: p for p in snap['products']}
+        self.assertEqual(by_id[self.p.id]['name'], 'Hawaiian Pizza')
+        self.assertEqual(by_id[self.p.id]['quantity'], 2)
+        self.assertTrue(by_id[self.p.id]['is_low_stock'])
+        self.assertEqual(by_id[self.p.id]['size_prices']['L'], 30.0)
+        self.assertEqual(by_id[self.q.id]['size_prices'], {})
+        self.assertEqual([i['sku'] for i in snap['low_stock']], ['CAT-1'])
+        self.assertEqual(snap['categories'], ['Drinks', 'Pizza'])
+
+        with self.assertNumQueries(1):
+            catalog_snapshot()
+
+        item = InventoryItem.objects.get(sku="CAT-1")
+        item.quantity = 40
+        item.save()
+        snap = catalog_snapshot()
+        self.assertEqual(snap['low_stock'], [])
+        self.assertFalse({p['id']: p for p in snap['products']}[self.p.id]['is_low_stock'])
+
+
+class RoleCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        from django.core.cache import cache
+        cache.clear()
+        self.User = User
+        self.admin_grp = Group.objects.get_or_create(name='Admin')[0]
+        self.cashier_grp = Group.objects.get_or_create(name='Cashier')[0]
+        self.admin = User.objects.create_user(username='roleadmin', password='x')
+        self.admin.groups.add(self.admin_grp)
+        self.cashier = User.objects.create_user(username='rolecashier', password='x')
+        self.cashier.groups.add(self.cashier_grp)
+
+    def test_role_names_are_cached_across_requests(self):
+        """Only the first lookup queries memberships; later ones read just the roles token."""
+        from .services.roles import role_names
+        self.assertEqual(role_names(self.User.objects.get(pk=self.cashier.pk)), {'Cashier'})
+        fresh = self.User.objects.get(pk=self.cashier.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(role_names(fresh), {'Cashier'})
+        with self.assertNumQueries(0):
+            self.assertEqual(role_names(fresh), {'Cashier'})
+
+    def test_revocation_reaches_other_workers_caches(self):
+        """A role removed through one worker's cache is gone in another worker's cache too."""
+        from unittest import mock
+        from django.core.cache.backends.locmem import LocMemCache
+        from .services import roles
+        other_worker = LocMemCache('roles-other-worker', {})
+        with mock.patch.object(roles, 'cache', other_worker):
+            self.assertEqual(roles.role_names(self.User.objects.get(pk=self.admin.pk)), {'Admin'})
+        self.User.objects.get(pk=self.admin.pk).groups.remove(self.admin_grp)
+        with mock.patch.object(roles, 'cache', other_worker):
+            self.assertEqual(roles.role_names(self.User.objects.get(pk=self.admin.pk)), frozenset())
+
+    def test_toggle_group_invalidates_cached_roles(self):
+        """Removing a membership through the admin view is visible immediately."""
+        from .services.roles import role_names
+        role_names(self.User.objects.get(pk=self.cashier.pk))
+        self.client.force_login(self.admin)
+        from django.urls import reverse
+        resp = self.client.post(
+            reverse('admin_toggle_group'),
+            {'user_id': self.cashier.pk, 'group': 'Cashier', 'action': 'remove'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertFalse(resp.json()['is_cashier'])
+        self.assertEqual(role_names(self.User.objects.get(pk=self.cashier.pk)), frozenset())
+
+    def test_group_rename_retires_cached_roles(self):
+        """Renaming a group changes the cached names of its members."""
+        from .services.roles import role_names
+        role_names(self.User.objects.get(pk=self.admin.pk))
+        self.admin_grp.name = 'Managers'
+        self.admin_grp.save()
+        self.assertEqual(role_names(self.User.objects.get(pk=self.admin.pk)), {'Managers'})
+
+    def test_role_matrix_uses_one_query(self):
+        """admin_user_list resolves every user's groups with a single query."""
+        from .services.roles import role_matrix
+        with self.assertNumQueries(1):
+            matrix = role_matrix([self.admin.pk, self.cashier.pk])
+        self.assertEqual(matrix, {self.admin.pk: {'Admin'}, self.cashier.pk: {'Cashier'}})
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+        self._tmp = tempfile.TemporaryDirectory()
+        self._override = override_settings(MEDIA_ROOT=self._tmp.name)
+        self._override.enable()
+        self.product = Product.objects.create(name="Photo Pizza", category="Pizza", price=Decimal("10.00"))
+        self.product.image.save('photo.jpg', self._jpeg(1200, 900))
+
+    def tearDown(self):
+        self._override.disable()
+        self._tmp.cleanup()
+
+    def _jpeg(self, width, height, color=(200, 40, 40)):
+        import io
+        from PIL import Image
+        from django.core.files.base import ContentFile
+        buf = io.BytesIO()
+        Image.new('RGB', (width, height), color).save(buf, 'JPEG')
+        return ContentFile(buf.getvalue())
+
+    def test_process_image_builds_resized_variants(self):
+        """Thumbnails fit the variant size and are stored as WebP plus JPEG."""
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        from .services.images import process_image
+        self.assertTrue(process_image(self.product))
+        self.product.refresh_from_db()
+        self.assertEqual(len(self.product.image_hash), 64)
+        thumb = self.product.image_derivatives['thumb']
+        self.assertEqual(set(thumb), {'webp', 'jpeg'})
+        with default_storage.open(thumb['jpeg']) as fh:
+            self.assertEqual(Image.open(fh).size, (320, 240))
+        # Unchanged content is not processed again
+        self.assertFalse(process_image(self.product))
+
+    def test_hashed_url_is_immutable_and_revalidates(self):
+        """Variant URLs negotiate WebP, cache forever and answer 304 for a matching ETag."""
+        from .services.images import process_image, image_url
+        process_image(self.product)
+        url = image_url(self.product, 'thumb')
+        resp = self.client.get(url, HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Type'], 'image/webp')
+        self.assertIn('immutable', resp['Cache-Control'])
+        self.assertTrue(resp.streaming)
+        etag = resp['ETag']
+        resp = self.client.get(url, HTTP_ACCEPT='image/webp,*/*', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(self.client.get(url)['Content-Type'], 'image/jpeg')
+
+    def test_new_upload_changes_url_and_old_url_redirects(self):
+        """Re-uploading changes the hashed URL; the old one redirects to it."""
+        from .services.images import process_image, image_url
+        process_image(self.product)
+        old_url = image_url(self.product, 'thumb')
+        self.product.image.save('photo2.jpg', self._jpeg(640, 640, color=(10, 10, 200)))
+        process_image(self.product)
+        new_url = image_url(self.product, 'thumb')
+        self.assertNotEqual(old_url, new_url)
+        resp = self.client.get(old_url)
+        self.assertEqual(resp.status_code, 302)
+        self.assertEqual(resp['Location'], new_url)
+
+    def test_original_endpoint_streams_with_last_modified(self):
+        """The legacy URL streams the original and honours If-Modified-Since."""
+        from django.urls import reverse
+        url = reverse('product_image', args=[self.product.pk])
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        resp = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+
+class LiveSalesStreamTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        from django.contrib.auth.models import User
+        from .services import live
+        self.live = live
+        # A fresh broker per test so events from other tests do not leak in
+        self._patch = mock.patch.object(live, 'broker', live.Broker())
+        self._patch.start()
+        self.user = User.objects.create_user('live', 'l@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Live Pizza", category="Pizza", price=Decimal("50.00"))
+
+    def tearDown(self):
+        self._patch.stop()
+
+    def _checkout(self, quantity=1):
+        import json
+        items = [{'id': self.product.id, 'quantity': quantity, 'price': '50.00'}]
+        return self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+
+    def _event(self, frame):
+        import json
+        data = [line[len('data: '):] for line in frame.splitlines() if line.startswith('data: ')]
+        return json.loads(data[0])
+
+    def test_stream_opens_with_current_totals(self):
+        """The first frame carries today's totals and a reconnect hint."""
+        self._checkout(quantity=2)
+        resp = self.client.get('/api/sales/stream/')
+        self.assertEqual(resp['Content-Type'], 'text/event-stream')
+        first = next(iter(resp.streaming_content)).decode()
+        resp.close()
+        self.assertTrue(first.startswith('retry: '))
+        event = self._event(first)
+        self.assertEqual(event['orders'], 1)
+        self.assertEqual(event['revenue'], 100.0)
+        self.assertEqual(event['recent_orders'][0]['units_sold'], 2)
+
+    def test_event_lists_orderless_sales_it_counts(self):
+        """Order-less sale lines appear in recent_orders as well as in the order total."""
+        self._checkout()
+        Sale.objects.create(product=self.product, date=date.today(), units_sold=3, revenue=Decimal("150.00"))
+        event = self.live.build_update()
+        self.assertEqual(event['orders'], 2)
+        self.assertEqual(len(event['recent_orders']), 2)
+        self.assertIn(3, [o['units_sold'] for o in event['recent_orders']])
+
+    def test_wsgi_stream_is_a_short_capped_long_poll(self):
+        """A sync stream ends after one wait; beyond the cap it answers without waiting."""
+        import time
+        from django.test import override_settings
+        live = self.live
+        with override_settings(LIVE_WSGI_MAX_STREAMS=1):
+            held = live.stream_sync(0.2)
+            next(held)
+            started = time.monotonic()
+            frames = list(live.stream_sync(5))
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertEqual(len(frames), 1)
+            self.assertTrue(frames[0].startswith('retry: '))
+            self.assertEqual(list(held), [])
+        self.assertEqual(live._waiting, 0)
+
+        waiting = live.stream_sync(5)
+        next(waiting)
+        live.broker.publish({'orders': 7})
+        self.assertEqual(self._event(next(waiting))['orders'], 7)
+        self.assertEqual(list(waiting), [])
+        self.assertEqual(live._waiting, 0)
+
+    def test_checkout_publishes_once_on_commit(self):
+        """A committed sale builds one event that every waiting subscriber receives."""
+        broker = self.live.broker
+        seq = broker.seq
+        with self.captureOnCommitCallbacks(execute=True):
+            self._checkout()
+        self.assertEqual(broker.seq, seq + 1)
+        hit = broker.wait(seq, timeout=0.1)
+        self.assertIsNotNone(hit)
+        self.assertEqual(self._event(hit[1])['orders'], 1)
+        self.assertIsNone(broker.wait(hit[0], timeout=0.05))
+
+    def test_poll_picks_up_writes_from_other_workers(self):
+        """A moved sales token republishes; a second poll within the interval is free."""
+        from .services import versioning
+        broker = self.live.broker
+        broker.latest()
+        seq = broker.seq
+        versioning.bump(versioning.SALES)
+        broker.poll()
+        self.assertEqual(broker.seq, seq + 1)
+        with self.assertNumQueries(0):
+            broker.poll()
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from django.contrib.auth.models import User, Group
+        from django.test import override_settings
+        self._tmp = tempfile.TemporaryDirectory()
+        self._override = override_settings(METRICS_DIR=self._tmp.name, METRICS_TOKEN='scrape-secret')
+        self._override.enable()
+        self.admin = User.objects.create_user('metricsadmin', 'm@example.com', 'pass')
+        self.admin.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        Product.objects.create(name="Metric Pizza", category="Pizza", price=Decimal("10.00"))
+
+    def tearDown(self):
+        self._override.disable()
+        self._tmp.cleanup()
+
+    def test_requests_are_recorded_per_route(self):
+        """A rendered page adds latency, query, template and size figures under its URL pattern."""
+        from .services import metrics
+        self.client.force_login(self.admin)
+        self.client.get('/products/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('# TYPE koki_http_request_duration_seconds histogram', body)
+        self.assertIn('koki_http_requests_total{route="products/",method="GET",status="200"}', body)
+        series = metrics.collector.merged()['products/\tGET']
+        self.assertGreater(series['queries'], 0)
+        self.assertGreater(series['template'], 0)
+        self.assertGreater(series['bytes'], 0)
+        self.assertEqual(series['buckets'][-1], series['count'])
+
+    def test_files_from_other_workers_are_merged(self):
+        """Totals written by another process show up in this worker's output."""
+        import json, os
+        from .services import metrics
+        other = metrics._empty()
+        other.update(count=3, sum=0.3, queries=12, status={'200': 3})
+        other['buckets'] = [3] * len(metrics.BUCKETS)
+        with open(os.path.join(self._tmp.name, '99999-other.json'), 'w') as fh:
+            json.dump({'elsewhere/\tGET': other}, fh)
+        body = metrics.render()
+        self.assertIn('koki_db_queries_total{route="elsewhere/",method="GET"} 12', body)
+
+    def test_metrics_requires_admin_or_token(self):
+        """Anonymous and plain users are refused; the scrape token or the Admin role is required."""
+        from django.contrib.auth.models import User
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+        self.client.force_login(User.objects.create_user('plain', 'p@example.com', 'pass'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_is_deterministic_and_consistent(self):
+        """Same seed, same rows; order headers and rollups match the sale lines."""
+        from django.db.models import Sum
+        from .models import DailyProductSales, Order
+        from .services.synthetic import generate
+        stats = generate(products=10, sales=500, days=30, seed=7, batch_size=120)
+        self.assertEqual(stats['products'], 10)
+        self.assertEqual(Sale.objects.count(), 500)
+        self.assertEqual(Order.objects.count(), stats['orders'])
+        self.assertFalse(Sale.objects.filter(order__isnull=True).exists())
+        revenue = Sale.objects.aggregate(r=Sum('revenue'))['r']
+        self.assertEqual(Order.objects.aggregate(r=Sum('total_revenue'))['r'], revenue)
+        self.assertEqual(DailyProductSales.objects.aggregate(r=Sum('revenue'))['r'], revenue)
+        first = list(Sale.objects.order_by('id').values_list('product__name', 'date', 'units_sold')[:50])
+
+        Product.objects.all().delete()
+        Order.objects.all().delete()
+        generate(products=10, sales=500, days=30, seed=7, batch_size=120)
+        self.assertEqual(list(Sale.objects.order_by('id').values_list('product__name', 'date', 'units_sold')[:50]), first)
+
+
+class StartupTests(TestCase):
+    def test_prestart_skips_migrate_when_fingerprint_matches(self):
+        """The second prestart for the same code runs no migrate/collectstatic."""
+        from unittest import mock
+        from .services import startup
+        with mock.patch('django.core.management.call_command') as call:
+            self.assertEqual(startup.prestart(collect_static=False, log=lambda line: None), ['migrate'])
+            self.assertEqual([c.args[0] for c in call.call_args_list], ['migrate', 'createcachetable'])
+            call.reset_mock()
+            self.assertEqual(startup.prestart(collect_static=False, log=lambda line: None), [])
+            call.assert_not_called()
+
+    def test_boot_fast_path_is_one_query(self):
+        """With a current fingerprint the WSGI boot check reads one row and nothing else."""
+        from unittest import mock
+        from django.conf import settings
+        from .services import startup
+        startup._store_schema(startup.schema_fingerprint())
+        with mock.patch.object(startup, 'prestart') as prestart, mock.patch.object(startup, '_say'):
+            with self.assertNumQueries(1):
+                self.assertTrue(startup.boot())
+            prestart.assert_not_called()
+        self.assertTrue(settings.DB_AVAILABLE)
+
+    def test_boot_runs_full_checks_when_fingerprint_changes(self):
+        """New migration files (a different fingerprint) fall back to the full startup checks."""
+        from unittest import mock
+        from .services import startup
+        startup._store_schema('0' * 32)
+        with mock.patch.object(startup, 'prestart') as prestart, mock.patch.object(startup, '_say'):
+            self.assertTrue(startup.boot())
+        prestart.assert_called_once()
+
+
+class RegressionKernelTests(TestCase):
+    def test_matches_numpy_least_squares(self):
+        """Slope, intercept, R² and residual std agree with numpy's polyfit on the same data."""
+        import numpy as np
+        from core.services.regression import fit_line
+        values = [12, 15, 11, 19, 22, 18, 25, 27, 24, 30]
+        line = fit_line(values)
+        slope, intercept = np.polyfit(np.arange(len(values)), values, 1)
+        fitted = intercept + slope * np.arange(len(values))
+        resid = np.asarray(values) - fitted
+        r2 = 1 - (resid ** 2).sum() / ((np.asarray(values) - np.mean(values)) ** 2).sum()
+        self.assertAlmostEqual(line.slope, slope)
+        self.assertAlmostEqual(line.intercept, intercept)
+        self.assertAlmostEqual(line.r2, r2)
+        self.assertAlmostEqual(line.std, float(resid.std()))
+        self.assertAlmostEqual(line.predict(10), intercept + slope * 10)
+
+    def test_batched_fit_matches_single_fits(self):
+        """fit_lines over mixed-length series equals one fit per series, with or without numpy."""
+        from unittest import mock
+        from core.services import regression
+        series = [[1, 2, 3, 4], [5, 5, 5, 5], [3, 9, 4, 8, 1], [], [7]]
+        single = [regression.fit_line(v) for v in series]
+        with mock.patch.object(regression, '_numpy', return_value=None):
+            pure = regression.fit_lines(series)
+        for batched in (regression.fit_lines(series), pure):
+            for got, want in zip(batched, single):
+                self.assertEqual(got.n, want.n)
+                for field in ('intercept', 'slope', 'sse', 'sst'):
+                    self.assertAlmostEqual(getattr(got, field), getattr(want, field))
+        # Constant series are fitted exactly; R² follows sklearn's convention
+        self.assertEqual(single[1].r2, 1.0)
+        self.assertEqual(single[1].slope, 0.0)
+
+    def test_prediction_interval_widens_away_from_data(self):
+        """The OLS prediction interval grows with distance from the centre of the data."""
+        from core.services.regression import fit_line
+        line = fit_line([10, 12, 11, 14, 13, 15, 16])
+        near = line.prediction_interval(3)
+        far = line.prediction_interval(20)
+        self.assertLess(near[0], line.predict(3))
+        self.assertGreater(near[1], line.predict(3))
+        self.assertGreater(far[1] - far[0], near[1] - near[0])
+        low, high = line.band(7, z=1.5)
+        self.assertAlmostEqual(high - low, 3 * line.std)
+
+
+class CsvStoreTests(TestCase):
+    CSV = (
+        '"","id","date","time","name","size","type","price"\n'
+        '"1","2015-000001","2015-01-01","11:38:36","hawaiian","M","classic",13.25\n'
+        '"2","2015-000002","2015-01-01","11:57:40","classic_dlx","M","classic",16\n'
+        '"3","2015-000003","2015-01-03","12:12:28","hawaiian",,"classic",13.25\n'
+        '"4","2015-000004","2015-01-05","12:16:31","mexicana","L","veggie",20.25\n'
+        '"5","2015-000005","2015-02-02","12:21:30","hawaiian","S","classic",10.5\n'
+    )
+
+    def setUp(self):
+        import os
+        import tempfile
+        from django.test import override_settings
+        from .services import csv_store
+        self._tmp = tempfile.TemporaryDirectory()
+        self._override = override_settings(CSV_CACHE_DIR=os.path.join(self._tmp.name, 'cache'))
+        self._override.enable()
+        self.path = os.path.join(self._tmp.name, 'sales.csv')
+        with open(self.path, 'w') as fh:
+            fh.write(self.CSV)
+        csv_store.clear()
+
+    def tearDown(self):
+        from .services import csv_store
+        csv_store.clear()
+        self._override.disable()
+        self._tmp.cleanup()
+
+    def test_frame_and_aggregates_match_pandas(self):
+        """The cached frame equals pd.read_csv and the group-bys count rows per day, week and month."""
+        import pandas as pd
+        from .services import csv_store
+        expected = pd.read_csv(self.path)
+        expected['date'] = pd.to_datetime(expected['date'])
+        pd.testing.assert_frame_equal(csv_store.load_frame(self.path), expected)
+
+        series = csv_store.aggregate_counts(csv_store.load_table(self.path))
+        self.assertEqual(series['daily'][:5], [
+            ('2015-01-01', 2), ('2015-01-02', 0), ('2015-01-03', 1), ('2015-01-04', 0), ('2015-01-05', 1),
+        ])
+        self.assertEqual(len(series['daily']), 33)
+        # 2015-01-01 was a Thursday; weeks start on Monday
+        self.assertEqual(series['weekly'], [('2014-12-29', 3), ('2015-01-05', 1), ('2015-02-02', 1)])
+        self.assertEqual(series['monthly'], [('2015-01', 4), ('2015-02', 1)])
+        limited = csv_store.aggregate_counts(csv_store.load_table(self.path), limit=2)
+        self.assertEqual(limited['monthly'], [('2015-01', 1), ('2015-02', 1)])
+
+    def test_cache_reused_until_source_changes(self):
+        """A second process reads the .npz without parsing; editing the CSV triggers a rebuild."""
+        import os
+        from unittest import mock
+        from .services import csv_store
+        self.assertEqual(len(csv_store.load_table(self.path)), 5)
+        self.assertTrue(os.listdir(os.path.join(self._tmp.name, 'cache')))
+
+        csv_store.clear()
+        with mock.patch('pandas.read_csv', side_effect=AssertionError('CSV parsed again')):
+            self.assertEqual(len(csv_store.load_table(self.path)), 5)
+
+        with open(self.path, 'a') as fh:
+            fh.write('"6","2015-000006","2015-02-03","13:00:00","mexicana","M","veggie",16.75\n')
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        table = csv_store.load_table(self.path)
+        self.assertEqual(len(table), 6)
+        self.assertEqual(list(table.column('name'))[-1], 'mexicana')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User, Group
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user('etag', 'e@example.com', 'pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Etag Pizza", category="Pizza", price=Decimal("50.00"))
+        InventoryItem.objects.create(product=self.product, sku='ETAG-1', quantity=100)
+
+    def _checkout(self):
+        import json
+        items = [{'id': self.product.id, 'quantity': 1, 'price': '50.00'}]
+        return self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+
+    def test_unchanged_data_returns_304_without_running_the_view(self):
+        """A matching If-None-Match is answered before any aggregation runs."""
+        from unittest import mock
+        first = self.client.get('/api/sales/today/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('"') and not etag.startswith('W/'))
+        self.assertIn('Last-Modified', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('private', first['Cache-Control'])
+
+        with mock.patch('core.services.kpis.window_totals', side_effect=AssertionError('view ran')):
+            again = self.client.get('/api/sales/today/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], etag)
+        self.assertEqual(again.content, b'')
+
+        by_date = self.client.get('/api/sales/today/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_sale_changes_the_validators(self):
+        """A checkout bumps the sales version, so the old ETag yields a fresh 200."""
+        first = self.client.get('/api/sales/recent/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['orders'], [])
+        self.assertEqual(self._checkout().status_code, 200)
+        after = self.client.get('/api/sales/recent/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after['ETag'], first['ETag'])
+        self.assertEqual(len(after.json()['orders']), 1)
+
+    def test_validators_depend_on_url_and_user(self):
+        """Query strings and users get distinct ETags; inventory edits revalidate forecasts."""
+        from django.contrib.auth.models import User
+        a = self.client.get('/product-forecast/api/?horizon=7&top=5')
+        b = self.client.get('/product-forecast/api/?horizon=7&top=6')
+        self.assertEqual(a.status_code, 200)
+        self.assertNotEqual(a['ETag'], b['ETag'])
+        self.assertEqual(self.client.get('/product-forecast/api/?horizon=7&top=5', HTTP_IF_NONE_MATCH=a['ETag']).status_code, 304)
+
+        other = User.objects.create_user('etag2', 'e2@example.com', 'pass')
+        mine = self.client.get('/api/sales/today/')['ETag']
+        self.client.force_login(other)
+        self.assertNotEqual(self.client.get('/api/sales/today/')['ETag'], mine)
+
+        self.client.force_login(self.user)
+        item = InventoryItem.objects.get(product=self.product)
+        item.quantity = 5
+        item.save()
+        self.assertEqual(self.client.get('/product-forecast/api/?horizon=7&top=5', HTTP_IF_NONE_MATCH=a['ETag']).status_code, 200)
+
+
+class HourlyDemandTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.user = User.objects.create_user('hourly', 'h@example.com', 'pass')
+        self.client.force_login(self.user)
+        self.pizza = Product.objects.create(name="Hourly Pizza", category="Pizza", price=Decimal("10.00"))
+        self.soda = Product.objects.create(name="Hourly Soda", category="Beverages", price=Decimal("2.00"))
+
+    def _at(self, days_ago, hour):
+        from datetime import datetime, time, timedelta
+        from django.utils import timezone
+        day = timezone.localdate() - timedelta(days=days_ago)
+        return timezone.make_aware(datetime.combine(day, time(hour, 15))), day
+
+    def _sale(self, product, days_ago, hour, units):
+        ts, day = self._at(days_ago, hour)
+        return Sale.objects.create(product=product, date=day, timestamp=ts, units_sold=units,
+                                   revenue=product.price * units)
+
+    def _cube(self):
+        from .models import HourlyProductDemand
+        return {
+            (c.product_id, c.weekday, c.hour): (c.units, c.revenue, c.line_count)
+            for c in HourlyProductDemand.objects.all()
+        }
+
+    def test_migration_backfills_cube_from_existing_sales(self):
+        """The 0022 data migration fills the cube exactly like rebuild_hourly_demand."""
+        import importlib
+        from django.apps import apps
+        from .models import HourlyProductDemand
+        from .services.intraday import rebuild_hourly_demand
+        self._sale(self.pizza, 1, 12, 3)
+        self._sale(self.pizza, 8, 12, 2)
+        self._sale(self.soda, 2, 18, 4)
+        rebuild_hourly_demand()
+        expected = self._cube()
+        HourlyProductDemand.objects.all().delete()
+
+        migration = importlib.import_module('core.migrations.0022_backfill_hourly_demand')
+        migration.backfill_hourly_demand(apps, None)
+        self.assertEqual(self._cube(), expected)
+
+    def test_writes_update_cells_and_match_rebuild(self):
+        """Creating, moving and deleting sales keeps the cube equal to a full rebuild."""
+        from .services.intraday import cell, rebuild_hourly_demand
+        a = self._sale(self.pizza, 1, 12, 3)
+        self._sale(self.pizza, 1, 12, 2)
+        b = self._sale(self.soda, 2, 18, 4)
+        weekday, hour = cell(a.timestamp)
+        self.assertEqual(self._cube()[(self.pizza.id, weekday, hour)], (5, Decimal('50.00'), 2))
+
+        # Move one sale to another hour and product, delete another
+        a.timestamp, _ = self._at(3, 9)
+        a.product = self.soda
+        a.save()
+        b.delete()
+        incremental = self._cube()
+        self.assertEqual(incremental[(self.pizza.id, weekday, hour)], (2, Decimal('20.00'), 1))
+        self.assertEqual(incremental[(self.soda.id, *cell(a.timestamp))][0], 3)
+
+        rebuild_hourly_demand()
+        self.assertEqual(self._cube(), incremental)
+
+    def test_checkout_records_its_lines(self):
+        """Checkout bulk-inserts sales without signals but still fills the current hour's cell."""
+        import json
+        from django.utils import timezone
+        from .services.intraday import cell
+        InventoryItem.objects.create(product=self.pizza, sku='HOURLY-1', quantity=50)
+        items = [{'id': self.pizza.id, 'quantity': 2, 'price': '10.00'}]
+        resp = self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self._cube()[(self.pizza.id, *cell(timezone.now()))][0], 2)
+
+    def test_api_heatmap_peaks_and_forecast(self):
+        """The API reports averages per trading day, the busiest hours and an hourly forecast."""
+        for days_ago in range(1, 15):
+            self._sale(self.pizza, days_ago, 12, 6)
+            self._sale(self.pizza, days_ago, 19, 2)
+            self._sale(self.soda, days_ago, 12, 1)
+        data = self.client.get('/api/sales/hourly/').json()
+        self.assertEqual(data['trading_days'], [2] * 7)
+        self.assertEqual(data['peak_hours'][0]['hour'], 12)
+        self.assertEqual(data['peak_hours'][0]['avg_units'], 7.0)
+        self.assertEqual(sum(map(sum, data['units'])), 14 * 9)
+
+        forecast = data['forecast']
+        self.assertEqual(forecast['peak_hour'], 12)
+        self.assertGreater(forecast['total_units'], 0)
+        self.assertAlmostEqual(sum(forecast['hourly']), forecast['total_units'], delta=0.1)
+        self.assertEqual([h for h, v in enumerate(forecast['hourly']) if v], [12, 19])
+
+        only_soda = self.client.get(f'/api/sales/hourly/?product_id={self.soda.id}&forecast=0').json()
+        self.assertNotIn('forecast', only_soda)
+        self.assertEqual(sum(map(sum, only_soda['units'])), 14)
+        by_category = self.client.get('/api/sales/hourly/?category=Pizza&forecast=0').json()
+        self.assertEqual(sum(map(sum, by_category['units'])), 14 * 8)
+        self.assertEqual(self.client.get('/api/sales/hourly/?date=bad').status_code, 400)
+
+
+class ReplicaRoutingTests(TestCase):
+    """The test database as primary and a temporary SQLite file as the analytics replica."""
+    alias = 'replica_test'
+
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        from django.conf import settings
+        from django.contrib.auth.models import User, Group
+        from django.db import connections
+        from django.test import override_settings
+        from core.services import replica
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.replica_path = os.path.join(tmp, 'replica.sqlite3')
+        # Persistent, so the per-request close_old_connections() keeps it open
+        settings.DATABASES[self.alias] = dict(
+            connections['default'].settings_dict, NAME=self.replica_path, CONN_MAX_AGE=None,
+        )
+        self.addCleanup(self._drop_alias)
+        replica._down_until.clear()
+        self.addCleanup(replica._down_until.clear)
+        self.override = override_settings(ANALYTICS_DATABASE=self.alias)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+        self.user = User.objects.create_user('replica', 'r@example.com', 'pass')
+        self.user.groups.add(Group.objects.get_or_create(name='Admin')[0])
+        self.client.force_login(self.user)
+        self.product = Product.objects.create(name="Primary Pizza", category="Pizza", price=Decimal("50.00"))
+        InventoryItem.objects.create(product=self.product, sku='PRIMARY-1', quantity=100)
+        Sale.objects.create(product=self.product, units_sold=2, revenue=Decimal("100.00"))
+
+    def _drop_alias(self):
+        from django.conf import settings
+        from django.db import connections
+        connections[self.alias].close()
+        del connections[self.alias]
+        del settings.DATABASES[self.alias]
+
+    def _open_replica(self):
+        # The test runner only lets tests open the aliases in `databases`
+        from django.db import connections
+        connections[self.alias].connect()
+
+    def _seed_replica(self):
+        """Give the replica its own, different copy of the sales tables."""
+        from django.db import connections
+        from core.models import Order
+        self._open_replica()
+        with connections[self.alias].schema_editor() as editor:
+            for model in (Product, Order, Sale):
+                editor.create_model(model)
+        Product.objects.using(self.alias).bulk_create([
+            Product(id=self.product.id, name="Replica Pizza", category="Pizza", price=Decimal("50.00")),
+        ])
+        Sale.objects.using(self.alias).bulk_create([
+            Sale(product_id=self.product.id, units_sold=3, revenue=Decimal("150.00")),
+        ])
+
+    def _report(self):
+        return self.client.post('/sales/period/', {'period': 'week', 'action': 'view'})
+
+    def test_report_reads_the_replica(self):
+        """record_sales_period aggregates on the replica; user/group checks stay on the primary."""
+        self._seed_replica()
+        response = self._report()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Replica Pizza')
+        self.assertNotContains(response, 'Primary Pizza')
+        self.assertNotIn('koki_db_pin', response.cookies)
+
+    def test_cashier_write_pins_the_client_to_the_primary(self):
+        """After a checkout the client gets the pin cookie and reads its own sale."""
+        import json
+        from core.services import replica
+        self._seed_replica()
+        items = [{'id': self.product.id, 'quantity': 1, 'price': '50.00'}]
+        sale = self.client.post('/sales/api/create/', data=json.dumps({'items': items}), content_type='application/json')
+        self.assertEqual(sale.status_code, 200)
+        self.assertIn(replica.PIN_COOKIE, sale.cookies)
+        self.assertContains(self._report(), 'Primary Pizza')
+
+        self.client.cookies[replica.PIN_COOKIE] = '1'  # expired
+        self.assertContains(self._report(), 'Replica Pizza')
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        """A replica that cannot be opened is skipped for ANALYTICS_RETRY_SECONDS."""
+        import os
+        from django.conf import settings
+        import sqlite3
+        from core.services import replica
+        settings.DATABASES[self.alias]['NAME'] = os.path.join(self.replica_path, 'missing', 'db.sqlite3')
+        with self.assertRaises(sqlite3.OperationalError):
+            self._open_replica()
+        response = self._report()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Primary Pizza')
+        self.assertIn(self.alias, replica._down_until)
+
+    def test_query_error_on_replica_reruns_view_on_primary(self):
+        """A replica missing the tables fails the view once; it is then answered by the primary."""
+        from core.services import replica
+        self._open_replica()
+        response = self._report()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Primary Pizza')
+        self.assertIn(self.alias, replica._down_until)
+
+    def test_scopes_hints_and_writes(self):
+        """Reads follow the analytics hint until something is written; writes always hit the primary."""
+        from django.test import override_settings
+        from core.services import replica
+        self._seed_replica()
+        self.assertEqual(Product.objects.all().db, 'default')
+        self.assertEqual(replica.for_analytics(Product.objects.all()).db, self.alias)
+        with replica.analytics() as used:
+            self.assertEqual(used, self.alias)
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Replica Pizza')
+            Product.objects.create(name="New Pizza", price=Decimal("10.00"))
+            self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Primary Pizza')
+        self.assertFalse(Product.objects.using(self.alias).filter(name="New Pizza").exists())
+
+        with override_settings(ANALYTICS_DATABASE=''):
+            self.assertFalse(replica.configured())
+            with replica.analytics() as used:
+                self.assertEqual(used, 'default')
+                self.assertEqual(Product.objects.get(pk=self.product.pk).name, 'Primary Pizza')
+
+    def test_forecast_state_is_not_overwritten_from_replica_data(self):
+        """State advanced from replica reads is used but never saved over a stale primary row."""
+        from core.models import ForecastModelState
+        from core.services import replica
+        from core.services.forecasting import forecast_time_series
+        from django.db import connections
+        self._seed_replica()
+        series = [((date(2026, 1, 1) + timedelta(days=i)).isoformat(), 20 + i) for i in range(30)]
+        forecast_time_series(series[:-1], horizon=3, state_key='replica:daily')
+        # The replica still has the state as it was before a backdated sale invalidated it
+        with connections[self.alias].schema_editor() as editor:
+            editor.create_model(ForecastModelState)
+        ForecastModelState.objects.using(self.alias).bulk_create(list(ForecastModelState.objects.all()))
+        ForecastModelState.objects.filter(key='replica:daily').update(stale=True)
+        before = ForecastModelState.objects.get(key='replica:daily')
+
+        with replica.analytics() as used:
+            self.assertEqual(used, self.alias)
+            result = forecast_time_series(series, horizon=3, state_key='replica:daily')
+        self.assertEqual(len(result['forecast']), 3)
+        after = ForecastModelState.objects.get(key='replica:daily')
+        self.assertTrue(after.stale)
+        self.assertEqual((after.last_label, after.fitted_at), (before.last_label, before.fitted_at))
+
+        # Outside the scope the refit is stored as usual
+        forecast_time_series(series, horizon=3, state_key='replica:daily')
+        self.assertFalse(ForecastModelState.objects.get(key='replica:daily').stale)
@@ -10,13 +10,16 @@ urlpatterns = [
     path("products/<int:pk>/edit/", views.product_update, name="product_update"),
     path("products/<int:pk>/delete/", views.product_delete, name="product_delete"),
     path("products/<int:product_id>/image/", views.product_image, name="product_image"),
+    path("products/<int:product_id>/image/<str:digest>/<str:variant>/", views.product_image_variant, name="product_image_variant"),
     # Inventory
     path("inventory/", views.inventory_list, name="inventory_list"),
+    path("api/inventory/", views.inventory_list_api, name="api_inventory_list"),
     path("inventory/create/", views.inventory_create, name="inventory_create"),
     path("inventory/<int:pk>/edit/", views.inventory_update, name="inventory_update"),
     path("inventory/<int:pk>/delete/", views.inventory_delete, name="inventory_delete"),
     # Sales
     path("sales/", views.sale_list, name="sale_list"),
+    path("api/sales/", views.sale_list_api, name="api_sale_list"),
     path("sales/create/", views.sale_create, name="sale_create"),
     path("sales/api/create/", views.create_sale, name="api_create_sale"),
     path("sales/<int:pk>/edit/", views.sale_update, name="sale_update"),
@@ -24,8 +27,14 @@ urlpatterns = [
     path("sales-dashboard/", views.sales_dashboard, name="sales_dashboard"),
     path("api/sales/today/", views.sales_today_api, name="api_sales_today"),
     path("api/sales/recent/", views.recent_orders_api, name="api_recent_orders"),
+    path("api/sales/stream/", views.sales_stream, name="api_sales_stream"),
+    path("api/sales/hourly/", views.hourly_demand_api, name="api_hourly_demand"),
+    # Monitoring
+    path("metrics", views.metrics_view, name="metrics"),
     path("sales/period/", views.record_sales_period, name="record_sales_period"),
     path("api/sales/summary/", views.api_record_sales_summary, name="api_sales_summary"),
+    # Exports
+    path("exports/<str:dataset>/", views.export_data, name="export_data"),
     # Forecast
     path("forecast/", views.forecast_view, name="forecast"),
     path("forecast/api/", views.forecast_data_api, name="forecast_api"),
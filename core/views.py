@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import Sum
+from django.db.models import Sum, Q, F
 from django.db.models.functions import Lower
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -17,43 +17,94 @@ import logging
 import json
 import traceback
 import os
-from django.http import JsonResponse, FileResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, FileResponse, HttpResponse, HttpResponseForbidden, Http404
 from django.contrib.auth import logout as auth_logout
 import base64
 
-from .models import Product, InventoryItem, Sale
+from .models import Product, InventoryItem, Sale, DailyProductSales, Order
 from .forms import ProductForm, InventoryForm, SaleForm
 from .auth import group_required  # new: role guard
+from .services import conditional, replica, versioning
 from django.views.decorators.http import require_http_methods
 
+def _serve_product_image(request, product, variant, immutable=False):
+    """Stream one image variant with validators; 304 when the client copy is current."""
+    from django.core.files.storage import default_storage
+    from django.utils.cache import get_conditional_response, patch_vary_headers
+    from django.utils.http import http_date
+    from .services import images
+
+    name, content_type = images.resolve(product, variant, webp=images.accepts_webp(request))
+    try:
+        modified = int(default_storage.get_modified_time(name).timestamp())
+    except (NotImplementedError, OSError, AttributeError):
+        modified = None
+    digest = images.short_hash(product)
+    if digest:
+        etag = f'"{digest}-{variant}-{content_type.rsplit("/", 1)[-1]}"'
+    else:
+        # Not fingerprinted yet (uploaded before derivatives existed)
+        etag = f'"{modified:x}"' if modified is not None else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        try:
+            response = FileResponse(default_storage.open(name, 'rb'), content_type=content_type)
+        except FileNotFoundError:
+            # Image record exists but file doesn't - return 404
+            return HttpResponse(status=404)
+    if etag:
+        response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    if immutable:
+        # The URL embeds the content hash, so a cached copy never goes stale
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=86400'  # Cache for 1 day
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
 def product_image(request, product_id):
-    """Serve product image - handles missing files gracefully"""
+    """Serve product image - handles missing files gracefully.
+
+    `?size=thumb|medium` selects a resized variant; the default is the original.
+    """
+    from .services import images
     try:
         product = get_object_or_404(Product, pk=product_id)
         
         if not product.image:
             # Return a 404 so client can show placeholder
             return HttpResponse(status=404)
-        
-        # Try to read the image file
-        try:
-            with open(product.image.path, 'rb') as f:
-                image_data = f.read()
-            
-            # Determine content type
-            import mimetypes
-            content_type = mimetypes.guess_type(product.image.name)[0] or 'image/jpeg'
-            
-            response = HttpResponse(image_data, content_type=content_type)
-            response['Cache-Control'] = 'public, max-age=86400'  # Cache for 1 day
-            return response
-        except FileNotFoundError:
-            # Image record exists but file doesn't - return 404
-            return HttpResponse(status=404)
+
+        variant = request.GET.get('size', images.ORIGINAL)
+        if variant not in images.VARIANTS:
+            variant = images.ORIGINAL
+        return _serve_product_image(request, product, variant)
+    except Http404:
+        raise
     except Exception as e:
         logging.error(f'Error serving product image {product_id}: {str(e)}')
         return HttpResponse(status=500)
 
+
+def product_image_variant(request, product_id, digest, variant):
+    """Serve an image variant from its content-hashed URL with immutable caching."""
+    from .services import images
+    product = get_object_or_404(Product, pk=product_id)
+    if not product.image or (variant not in images.VARIANTS and variant != images.ORIGINAL):
+        return HttpResponse(status=404)
+    if digest != images.short_hash(product):
+        # Page rendered before the image changed; send the client to the current URL
+        return redirect(images.image_url(product, variant))
+    try:
+        return _serve_product_image(request, product, variant, immutable=True)
+    except Exception as e:
+        logging.error(f'Error serving product image {product_id}/{variant}: {str(e)}')
+        return HttpResponse(status=500)
+
 def signup(request):
     """User registration view"""
     if request.method == 'POST':
@@ -147,57 +198,20 @@ def profile(request):
 # Dashboard: any authenticated user
 @login_required
 def dashboard(request):
-    top_products = Sale.objects.values("product__name").annotate(
-        total_units=Sum("units_sold"), total_revenue=Sum("revenue")
+    top_products = DailyProductSales.objects.values("product__name").annotate(
+        total_units=Sum("units"), total_revenue=Sum("revenue")
     ).order_by("-total_units")[:5]
 
-    low_stock = [i for i in InventoryItem.objects.select_related("product").all() if i.is_low_stock()]
-    
-    # Get all products with inventory info
-    all_products = Product.objects.all().prefetch_related('inventory_items')
-    products_data = []
-    categories_set = set()
-    
-    for product in all_products:
-        inv = product.inventory_items.first() if product.inventory_items.exists() else None
-        # Normalize name display (replace underscores, title case) - WITHOUT the size suffix
-        pretty_name = product.name.replace('_', ' ').title()
-        
-        # Build size-price mapping with automatic multipliers
-        # Small: base - 5, Medium: Regular + 5, Large: base + 10
-        base_price = float(product.price)
-        size_prices = {}
-        if product.size:
-            size_prices = {
-                'S': max(0, base_price - 5),        # Small: -5
-                'M': base_price + 5,                 # Medium: Regular +5
-                'L': base_price + 10,                # Large: +10
-                'XL': base_price + 15,               # XL: +15 (bonus)
-                'XXL': base_price + 20,              # XXL: +20 (bonus)
-                'Regular': base_price,               # Regular: base
-            }
-        
-        products_data.append({
-            'id': product.id,
-            'name': pretty_name,
-            'price': base_price,
-            'category': product.category,
-            'size': product.size,
-            'size_prices': size_prices,
-            'quantity': inv.quantity if inv else 0,
-            'is_low_stock': inv.is_low_stock() if inv else False,
-            'image': product.image.url if product.image else None
-        })
-        categories_set.add(product.category)
-    
-    # Sort categories for consistent display
-    categories = sorted([c for c in categories_set if c])
-    
+    # Products, size prices, stock and low-stock rows come from one cached
+    # snapshot that is rebuilt only after catalog writes
+    from .services.catalog import catalog_snapshot
+    catalog = catalog_snapshot()
+
     context = {
         "top_products": top_products,
-        "low_stock": low_stock,
-        "all_products": products_data,
-        "categories": categories
+        "low_stock": catalog["low_stock"],
+        "all_products": catalog["products"],
+        "categories": catalog["categories"]
     }
     return render(request, "pages/dashboard.html", context)
 
@@ -219,10 +233,8 @@ def product_list(request):
                 return redirect('login')
 
             # Owner bypass
-            if request.user.groups.filter(name='Owner').exists():
-                allowed = True
-            else:
-                allowed = request.user.groups.filter(name__in=("Admin", "Cashier")).exists()
+            from .services import roles
+            allowed = roles.has_role(request.user, roles.OWNER, roles.ADMIN, roles.CASHIER)
 
             if not allowed:
                 return HttpResponseForbidden("You do not have permission to access this resource.")
@@ -275,6 +287,8 @@ def product_create(request):
                 if not product.created_at:
                     product.created_at = timezone.now()
                 product.save()
+                if product.image:
+                    _process_product_image(product)
                 logger.info(f'Product created successfully: {product.name} (ID: {product.id})')
                 messages.success(request, "Product created successfully.")
                 return redirect("product_list")
@@ -291,13 +305,24 @@ def product_create(request):
         form = ProductForm()
     return render(request, "pages/product_form.html", {"form": form, "title": "Create Product"})
 
+def _process_product_image(product):
+    """Fingerprint a new upload and build its thumbnails; failures keep the original."""
+    from .services.images import process_image
+    try:
+        process_image(product)
+    except Exception:
+        logging.getLogger(__name__).exception('Image processing failed for product %s', product.pk)
+
+
 @group_required("Admin", "Cashier")
 def product_update(request, pk):
     product = get_object_or_404(Product, pk=pk)
     if request.method == "POST":
         form = ProductForm(request.POST, request.FILES, instance=product)
         if form.is_valid():
-            form.save()
+            product = form.save()
+            if 'image' in form.changed_data:
+                _process_product_image(product)
             messages.success(request, "Product updated.")
             return redirect("product_list")
     else:
@@ -313,11 +338,116 @@ def product_delete(request, pk):
         return redirect("product_list")
     return render(request, "pages/product_form.html", {"form": None, "title": "Delete Product", "confirm": True})
 
+def _page_url(request, cursor):
+    """Current URL with `cursor` swapped in, keeping the other filters."""
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f"{request.path}?{params.urlencode()}"
+
+
+# Sort options for the keyset-paginated lists: name -> [(field, descending)].
+# The trailing id makes each ordering total; each matches an index (sku is
+# unique, the other inventory sorts have composite indexes on InventoryItem).
+INVENTORY_SORTS = {
+    'sku': [('sku', False), ('id', False)],
+    'quantity': [('quantity', False), ('id', False)],
+    'updated': [('updated_at', True), ('id', True)],
+}
+
+SALE_SORTS = {
+    'newest': [('date', True), ('id', True)],
+    'oldest': [('date', False), ('id', False)],
+}
+
+
+def _inventory_page(request):
+    """Filter and keyset-paginate inventory for the list page and its JSON variant."""
+    from .services.pagination import paginate, parse_page_size
+    q = request.GET.get('q', '').strip()
+    low_stock = request.GET.get('low_stock') in ('1', 'true', 'True')
+    sort = request.GET.get('sort') if request.GET.get('sort') in INVENTORY_SORTS else 'sku'
+
+    qs = InventoryItem.objects.select_related("product")
+    if q:
+        qs = qs.filter(Q(sku__icontains=q) | Q(product__name__icontains=q))
+    if low_stock:
+        qs = qs.filter(quantity__lte=F('reorder_point'))
+    page = paginate(qs, INVENTORY_SORTS[sort], cursor=request.GET.get('cursor'),
+                    page_size=parse_page_size(request.GET.get('per_page')))
+    return page, {'q': q, 'low_stock': low_stock, 'sort': sort}
+
+
+def _sale_page(request):
+    """Filter and keyset-paginate sales for the list page and its JSON variant."""
+    from datetime import date
+    from .services.pagination import paginate, parse_page_size
+    product_id = request.GET.get('product')
+    category = request.GET.get('category', '').strip()
+    sort = request.GET.get('sort') if request.GET.get('sort') in SALE_SORTS else 'newest'
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        start = end = None
+
+    qs = Sale.objects.select_related("product")
+    if product_id and str(product_id).isdigit():
+        qs = qs.filter(product_id=int(product_id))
+    if category:
+        qs = qs.filter(product__category=category)
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    page = paginate(qs, SALE_SORTS[sort], cursor=request.GET.get('cursor'),
+                    page_size=parse_page_size(request.GET.get('per_page')))
+    filters = {'product': product_id or '', 'category': category, 'sort': sort,
+               'start': start.isoformat() if start else '', 'end': end.isoformat() if end else ''}
+    return page, filters
+
+
 # Inventory: Admin only
 @group_required("Admin")
 def inventory_list(request):
-    items = InventoryItem.objects.select_related("product").all()
-    return render(request, "pages/inventory_list.html", {"items": items})
+    from .services.pagination import InvalidCursor
+    try:
+        page, filters = _inventory_page(request)
+    except InvalidCursor:
+        return redirect(request.path)
+    return render(request, "pages/inventory_list.html", {
+        "items": page.items,
+        "filters": filters,
+        "sorts": list(INVENTORY_SORTS),
+        "next_url": _page_url(request, page.next_cursor),
+        "prev_url": _page_url(request, page.prev_cursor),
+    })
+
+
+@group_required("Admin")
+def inventory_list_api(request):
+    """JSON variant of inventory_list; follow `next`/`prev` cursors to page."""
+    from .services.pagination import InvalidCursor
+    try:
+        page, filters = _inventory_page(request)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'results': [{
+            'id': i.id,
+            'sku': i.sku,
+            'product_id': i.product_id,
+            'product_name': i.product.name,
+            'quantity': i.quantity,
+            'reorder_point': i.reorder_point,
+            'low_stock': i.is_low_stock(),
+            'updated_at': i.updated_at.isoformat() if i.updated_at else None,
+        } for i in page.items],
+        'filters': filters,
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+    })
 
 @group_required("Admin")
 def inventory_create(request):
@@ -353,11 +483,77 @@ def inventory_delete(request, pk):
         return redirect("inventory_list")
     return render(request, "pages/inventory_form.html", {"form": None, "title": "Delete Inventory Item", "confirm": True})
 
+# Exports: Admin only
+@group_required("Admin")
+def export_data(request, dataset):
+    """Stream sales/products/inventory as CSV or NDJSON (optionally gzip-compressed).
+
+    Query params: format=csv|ndjson, gzip=1, start/end (YYYY-MM-DD), product (id or name).
+    """
+    from datetime import date
+    from django.http import StreamingHttpResponse
+    from .services.exports import DATASETS, FORMATS, stream_export, export_filename
+
+    if dataset not in DATASETS:
+        return JsonResponse({'error': f'Unknown dataset: {dataset}'}, status=404)
+    fmt = request.GET.get('format', 'csv').lower()
+    if fmt not in FORMATS:
+        return JsonResponse({'error': f'Unknown format: {fmt}'}, status=400)
+    compress = request.GET.get('gzip') in ('1', 'true', 'True')
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid start/end date (use YYYY-MM-DD)'}, status=400)
+
+    chunks = stream_export(dataset, fmt=fmt, compress=compress, start=start, end=end,
+                           product=request.GET.get('product') or None)
+    response = StreamingHttpResponse(chunks, content_type='application/gzip' if compress else FORMATS[fmt][0])
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(dataset, fmt, compress)}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
 # Sales: Admin only (Cashier should not access sales list page)
 @group_required("Admin")
 def sale_list(request):
-    sales = Sale.objects.select_related("product").all()
-    return render(request, "pages/sale_list.html", {"sales": sales})
+    from .services.pagination import InvalidCursor
+    try:
+        page, filters = _sale_page(request)
+    except InvalidCursor:
+        return redirect(request.path)
+    categories = Product.objects.order_by('category').values_list('category', flat=True).distinct()
+    return render(request, "pages/sale_list.html", {
+        "sales": page.items,
+        "filters": filters,
+        "categories": [c for c in categories if c],
+        "next_url": _page_url(request, page.next_cursor),
+        "prev_url": _page_url(request, page.prev_cursor),
+    })
+
+
+@group_required("Admin")
+def sale_list_api(request):
+    """JSON variant of sale_list; follow `next`/`prev` cursors to page."""
+    from .services.pagination import InvalidCursor
+    try:
+        page, filters = _sale_page(request)
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'results': [{
+            'id': s.id,
+            'date': s.date.isoformat(),
+            'product_id': s.product_id,
+            'product_name': s.product.name,
+            'units_sold': s.units_sold,
+            'revenue': float(s.revenue),
+            'order_id': s.order_id,
+        } for s in page.items],
+        'filters': filters,
+        'next': page.next_cursor,
+        'prev': page.prev_cursor,
+    })
 
 @group_required("Admin")
 @group_required("Admin", "Cashier")
@@ -389,20 +585,33 @@ def sale_delete(request, pk):
 
 # Sales Dashboard: any authenticated user
 @login_required
+@replica.analytics_reads
 def sales_dashboard(request):
     from django.db.models import Sum, Count
     from django.utils import timezone
     from datetime import timedelta
 
-    # Total sales and orders
-    total_sales = Sale.objects.aggregate(total_revenue=Sum('revenue'))['total_revenue'] or 0
-    total_orders = Sale.objects.count()
+    from .services.orders import order_counts_by_date
+    from .services.kpis import window_totals
+
+    # Use server local date to match how dates are stored/displayed
+    try:
+        today = timezone.localdate()
+    except Exception:
+        today = timezone.now().date()
+
+    # Revenue figures come from the DailyProductSales rollup (one row per
+    # product and day) and order counts from Order headers, instead of
+    # scanning every sale line. All-time and today's totals share one query.
+    kpi = window_totals({'all': (None, None), 'today': (today, today)}, orders=True)
+    total_sales = kpi['all']['revenue']
+    total_orders = kpi['all']['orders']
     avg_order = (total_sales / total_orders) if total_orders else 0
 
     # Top selling items (by units)
     top_items_qs = (
-        Sale.objects.values('product__name')
-        .annotate(units_sold=Sum('units_sold'), revenue=Sum('revenue'))
+        DailyProductSales.objects.values('product__name')
+        .annotate(units_sold=Sum('units'), revenue=Sum('revenue'))
         .order_by('-units_sold')[:5]
     )
     top_items = [{'product': t['product__name'], 'units': t['units_sold'], 'revenue': float(t['revenue'])} for t in top_items_qs]
@@ -436,20 +645,15 @@ def sales_dashboard(request):
 
     # Sales by category (sum units and revenue)
     cat_qs = (
-        Sale.objects.select_related('product')
-        .values('product__category')
-        .annotate(units=Sum('units_sold'), revenue=Sum('revenue'))
+        DailyProductSales.objects.values('product__category')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by()
     )
     category_sales = []
     for c in cat_qs:
         category_sales.append({'category': c['product__category'] or 'Uncategorized', 'quantity': int(c['units'] or 0), 'revenue': float(c['revenue'] or 0)})
 
     # Daily totals (last 7 days)
-    # Use server local date to match how dates are stored/displayed
-    try:
-        today = timezone.localdate()
-    except Exception:
-        today = timezone.now().date()
     start_date = today - timedelta(days=6)
     try:
         # Initialize all 7 days with zero values, even if no sales
@@ -459,7 +663,7 @@ def sales_dashboard(request):
             day_map[day] = {'revenue': 0.0, 'orders': 0}
         
         # Avoid DB-specific TruncDate by aggregating in Python which is portable across backends
-        sales_for_days = Sale.objects.filter(date__gte=start_date).values('date', 'revenue')
+        sales_for_days = DailyProductSales.objects.filter(date__gte=start_date).values('date', 'revenue')
         for rec in sales_for_days:
             d = rec.get('date')
             if d is None:
@@ -471,7 +675,9 @@ def sales_dashboard(request):
             if d in day_map:
                 entry = day_map[d]
                 entry['revenue'] += float(rec.get('revenue') or 0)
-                entry['orders'] += 1
+        for d, n in order_counts_by_date(start_date).items():
+            if d in day_map:
+                day_map[d]['orders'] += n
 
         daily_sales = [
             {'day': day, 'revenue': data['revenue'], 'orders': data['orders']}
@@ -486,7 +692,7 @@ def sales_dashboard(request):
     weekly_sales = []
     try:
         weekly_map = {}
-        sales_for_weeks = Sale.objects.filter(date__gte=start_week).values('date', 'revenue')
+        sales_for_weeks = DailyProductSales.objects.filter(date__gte=start_week).values('date', 'revenue')
         for rec in sales_for_weeks:
             d = rec.get('date')
             if d is None:
@@ -498,7 +704,10 @@ def sales_dashboard(request):
             week_start = d - timedelta(days=d.weekday())
             entry = weekly_map.setdefault(week_start, {'revenue': 0.0, 'orders': 0})
             entry['revenue'] += float(rec.get('revenue') or 0)
-            entry['orders'] += 1
+        for d, n in order_counts_by_date(start_week).items():
+            week_start = d - timedelta(days=d.weekday())
+            entry = weekly_map.setdefault(week_start, {'revenue': 0.0, 'orders': 0})
+            entry['orders'] += n
 
         weekly_sales = [
             {'week_start': wk, 'revenue': data['revenue'], 'orders': data['orders']}
@@ -509,17 +718,9 @@ def sales_dashboard(request):
         weekly_sales = []
 
     # Prepare context
-    # Compute explicit today totals so client can rely on server-defined "today".
-    # Use a direct DB aggregate to avoid DB-function issues (e.g. TruncDate failing on SQLite).
-    try:
-        today_agg = Sale.objects.filter(date=today).aggregate(today_revenue=Sum('revenue'), today_orders=Count('id'))
-        today_orders = int(today_agg.get('today_orders') or 0)
-        today_revenue = float(today_agg.get('today_revenue') or 0.0)
-    except Exception:
-        # Fallback to daily_sales if the aggregate fails
-        today_entry = next((d for d in daily_sales if d.get('day') == today), None) if daily_sales else None
-        today_orders = int(today_entry['orders']) if today_entry else 0
-        today_revenue = float(today_entry['revenue']) if today_entry else 0.0
+    # Explicit today totals so the client can rely on the server-defined "today"
+    today_orders = kpi['today']['orders']
+    today_revenue = kpi['today']['revenue']
     today_label = str(today)
     # Provide a server-side ISO timestamp so the client can use the server's notion of "now"
     server_today_iso = timezone.localtime().isoformat()
@@ -541,6 +742,7 @@ def sales_dashboard(request):
 
 
 @login_required
+@conditional.condition(versioning.SALES)
 def sales_today_api(request):
     """Return JSON with today's sales totals (orders, revenue) and server timestamp."""
     from django.utils import timezone
@@ -552,9 +754,10 @@ def sales_today_api(request):
         today = timezone.now().date()
 
     try:
-        agg = Sale.objects.filter(date=today).aggregate(today_revenue=Sum('revenue'), today_orders=Count('id'))
-        orders = int(agg.get('today_orders') or 0)
-        revenue = float(agg.get('today_revenue') or 0.0)
+        from .services.kpis import window_totals
+        kpi = window_totals({'today': (today, today)}, orders=True)['today']
+        orders = kpi['orders']
+        revenue = kpi['revenue']
     except Exception:
         orders = 0
         revenue = 0.0
@@ -562,9 +765,81 @@ def sales_today_api(request):
     server_today_iso = timezone.localtime().isoformat()
     return JsonResponse({'orders': orders, 'revenue': revenue, 'server_today_iso': server_today_iso})
 
+@login_required
+def sales_stream(request):
+    """Server-sent events with today's totals and newest orders, pushed after each sale.
+
+    Under ASGI the stream stays open. A WSGI worker answers with a short
+    long-poll (the browser reconnects) so dashboards never pin its threads.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from .services import live
+
+    if isinstance(request, ASGIRequest):
+        events = live.stream_async(getattr(settings, 'LIVE_STREAM_MAX_SECONDS', 600))
+    else:
+        events = live.stream_sync(getattr(settings, 'LIVE_STREAM_WSGI_SECONDS', 5))
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies (nginx) from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@conditional.condition(versioning.SALES, versioning.CATALOG)
+def hourly_demand_api(request):
+    """Hour-of-day x weekday demand heatmap, peak hours and the next day's hourly forecast.
+
+    Optional query params:
+      - product_id: one id or a comma-separated list
+      - category: restrict to one product category
+      - top: number of peak cells to return (default 5)
+      - date: forecast day (YYYY-MM-DD, default tomorrow); forecast=0 skips it
+    """
+    from datetime import date
+    from .services import intraday
+
+    try:
+        raw_ids = request.GET.get('product_id', '')
+        product_ids = [int(v) for v in raw_ids.split(',') if v.strip()]
+        top = max(1, min(50, int(request.GET.get('top', '5'))))
+        day = date.fromisoformat(request.GET['date']) if request.GET.get('date') else None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid product_id, top or date'}, status=400)
+    category = request.GET.get('category') or None
+
+    payload = intraday.heatmap(product_ids=product_ids, category=category, top=top)
+    payload['timezone'] = timezone.get_current_timezone_name()
+    if request.GET.get('forecast', '1') not in ('0', 'false', 'False'):
+        payload['forecast'] = intraday.hourly_forecast(product_ids=product_ids, category=category, day=day)
+    return JsonResponse(payload)
+
+def metrics_view(request):
+    """Request metrics for all workers in Prometheus text format.
+
+    Scrapers send ``Authorization: Bearer <METRICS_TOKEN>``; people need the
+    Admin (or Owner) role.
+    """
+    import hmac
+    from .services import metrics, roles
+
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    allowed = bool(token) and hmac.compare_digest(auth.encode(), f'Bearer {token}'.encode())
+    if not allowed:
+        user = request.user
+        allowed = user.is_authenticated and (user.is_superuser or roles.has_role(user, roles.ADMIN, roles.OWNER))
+    if not allowed:
+        return HttpResponseForbidden("You do not have permission to access this resource.")
+    response = HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-store'
+    return response
+
 # Forecast: any authenticated user
 @login_required
 @login_required
+@replica.analytics_reads
 def forecast_view(request):
     """
     Render the sales forecast dashboard with historical data and predictions.
@@ -615,7 +890,7 @@ def _forecast_view_impl(request, logger, json):
         import_error = exc
         def moving_average_forecast(window=3):
             return {'db_forecasts': {}}
-        def forecast_time_series(series, horizon=7, method='linear', window=3):
+        def forecast_time_series(series, horizon=7, method='linear', window=3, **kwargs):
             vals = [v for _, v in (series or [])]
             if not vals:
                 return {'forecast': [0] * horizon, 'upper': [0] * horizon, 'lower': [0] * horizon, 'confidence': 0, 'accuracy': 'Low'}
@@ -634,7 +909,7 @@ def _forecast_view_impl(request, logger, json):
             accuracy = 'High' if confidence >= 70 else 'Medium' if confidence >= 40 else 'Low'
             return {'forecast': preds, 'upper': upper, 'lower': lower, 'confidence': confidence, 'accuracy': accuracy}
         def aggregate_sales(period='daily', lookback=90):
-            # Fallback: aggregate sales directly from database
+            # Fallback: aggregate revenue from the daily rollup
             from datetime import date, timedelta
             from django.db.models import Sum
             
@@ -642,11 +917,11 @@ def _forecast_view_impl(request, logger, json):
             start = end - timedelta(days=lookback - 1)
             
             if period == 'daily':
-                qs = Sale.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue')).order_by('date')
+                qs = DailyProductSales.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue')).order_by('date')
                 return [(r['date'].isoformat(), int(r['total'] or 0)) for r in qs]
             elif period == 'weekly':
                 # Group by week
-                qs = Sale.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue'))
+                qs = DailyProductSales.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue'))
                 weekly = {}
                 for r in qs:
                     d = r['date']
@@ -656,7 +931,7 @@ def _forecast_view_impl(request, logger, json):
                 return [(k, v) for k, v in sorted(weekly.items())]
             elif period == 'monthly':
                 # Group by month
-                qs = Sale.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue'))
+                qs = DailyProductSales.objects.filter(date__gte=start, date__lte=end).values('date').annotate(total=Sum('revenue'))
                 monthly = {}
                 for r in qs:
                     d = r['date']
@@ -665,6 +940,12 @@ def _forecast_view_impl(request, logger, json):
                 return [(k, v) for k, v in sorted(monthly.items())]
             return []
 
+    try:
+        from .services.forecast_cache import get_or_compute as cached
+    except Exception:
+        logger.exception('Forecast cache unavailable; computing forecasts directly')
+        def cached(endpoint, params, compute, **kwargs):
+            return compute()
     # Initialize safe defaults for all variables
     data = []
     daily_series, weekly_series, monthly_series = [], [], []
@@ -673,9 +954,17 @@ def _forecast_view_impl(request, logger, json):
     monthly_fore = {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0}
     series_error = None
 
+    # Precomputed by `precompute_forecasts`; empty when missing or stale
+    try:
+        from .services.forecast_snapshots import latest as latest_snapshot
+        view_snapshot = latest_snapshot('store', 'forecast_view') or {}
+    except Exception:
+        logger.exception('Forecast snapshot lookup failed')
+        view_snapshot = {}
+
     # Build per-product forecasts using DB historical sales only
     try:
-        db_results = moving_average_forecast(window=3)
+        db_results = view_snapshot.get('products') or cached('forecast_view', {'part': 'products', 'window': 3}, lambda: moving_average_forecast(window=3))
         db_forecasts = db_results.get('db_forecasts', {}) if db_results else {}
         for pid, r in db_forecasts.items():
             try:
@@ -707,9 +996,11 @@ def _forecast_view_impl(request, logger, json):
 
     # Always use DB aggregate series for charts and forecasting
     try:
-        db_daily = aggregate_sales('daily', lookback=60)
-        db_weekly = aggregate_sales('weekly', lookback=12)
-        db_monthly = aggregate_sales('monthly', lookback=12)
+        db_daily, db_weekly, db_monthly = cached('forecast_view', {'part': 'series', 'lookback': [60, 12, 12]}, lambda: (
+            aggregate_sales('daily', lookback=60),
+            aggregate_sales('weekly', lookback=12),
+            aggregate_sales('monthly', lookback=12),
+        ))
 
         daily_series = db_daily or []
         weekly_series = db_weekly or []
@@ -720,13 +1011,16 @@ def _forecast_view_impl(request, logger, json):
         forecast_monthly_base = db_monthly or []
 
         # Use a compact 7-day horizon for the UI and chart (we only display next 7 days)
-        daily_fore = forecast_time_series(forecast_daily_base, horizon=7) or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0}
-        weekly_fore = forecast_time_series(forecast_weekly_base, horizon=12) or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0}
-        monthly_fore = forecast_time_series(forecast_monthly_base, horizon=6) or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0}
+        # Model fitting is the expensive part; reuse it until sales change
+        daily_fore, weekly_fore, monthly_fore = view_snapshot.get('forecasts') or cached('forecast_view', {'part': 'forecasts', 'horizons': [7, 12, 6]}, lambda: (
+            forecast_time_series(forecast_daily_base, horizon=7, state_key='revenue:daily', period='daily') or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0},
+            forecast_time_series(forecast_weekly_base, horizon=12, state_key='revenue:weekly', period='weekly') or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0},
+            forecast_time_series(forecast_monthly_base, horizon=6, state_key='revenue:monthly', period='monthly') or {'forecast': [], 'upper': [], 'lower': [], 'confidence': 0},
+        ))
 
 
 
-        # If any of the forecasts used a fallback (e.g., sklearn unavailable), log a warning so we can monitor frequency
+        # If any of the forecasts used a fallback, log a warning so we can monitor frequency
         try:
             if daily_fore.get('fallback') or weekly_fore.get('fallback') or monthly_fore.get('fallback'):
                 logger.warning('Forecasts used fallback: daily=%s weekly=%s monthly=%s', daily_fore.get('fallback_reason'), weekly_fore.get('fallback_reason'), monthly_fore.get('fallback_reason'))
@@ -821,14 +1115,18 @@ def _forecast_view_impl(request, logger, json):
     month_start = today.replace(day=1)
 
     try:
-        today_revenue = float(Sale.objects.filter(date=today).aggregate(total=Sum('revenue')).get('total') or 0.0)
-        this_week_revenue = float(Sale.objects.filter(date__gte=week_start, date__lte=today).aggregate(total=Sum('revenue')).get('total') or 0.0)
-        this_month_revenue = float(Sale.objects.filter(date__gte=month_start, date__lte=today).aggregate(total=Sum('revenue')).get('total') or 0.0)
+        # Every hero-tile window (and the previous periods used for growth
+        # badges below) in one conditional-aggregate query
+        from .services.kpis import window_totals, standard_windows
+        kpi = window_totals(standard_windows(today))
+        today_revenue = kpi['today']['revenue']
+        this_week_revenue = kpi['this_week']['revenue']
+        this_month_revenue = kpi['this_month']['revenue']
         # Also compute unit counts (units sold) for the same periods so we can
         # show "X units / PHPY" in the hero tiles for clarity.
-        today_units = int(Sale.objects.filter(date=today).aggregate(total=Sum('units_sold')).get('total') or 0)
-        this_week_units = int(Sale.objects.filter(date__gte=week_start, date__lte=today).aggregate(total=Sum('units_sold')).get('total') or 0)
-        this_month_units = int(Sale.objects.filter(date__gte=month_start, date__lte=today).aggregate(total=Sum('units_sold')).get('total') or 0)
+        today_units = kpi['today']['units']
+        this_week_units = kpi['this_week']['units']
+        this_month_units = kpi['this_month']['units']
     except Exception:
         # Fallback to the previously-computed unit-based summaries if revenue aggregation fails
         today_revenue = float(daily_summary.get('total', 0))
@@ -847,7 +1145,7 @@ def _forecast_view_impl(request, logger, json):
 
     # Yearly forecast: sum of next 12 months predicted by running forecast_time_series on monthly series
     try:
-        year_fore = forecast_time_series(monthly_series, horizon=12)
+        year_fore = forecast_time_series(monthly_series, horizon=12, state_key='revenue:monthly', period='monthly')
         year_forecast_total = int(sum(year_fore.get('forecast', []) or []))
         year_fore_upper = year_fore.get('upper', []) or []
         year_fore_lower = year_fore.get('lower', []) or []
@@ -918,34 +1216,13 @@ def _forecast_view_impl(request, logger, json):
     except Exception:
         next_year_label = 'Next Year' 
 
-    # Compute previous-period revenues to show growth/decline badges on hero cards
+    # Previous-period revenues for the growth/decline badges on hero cards
     try:
-        yesterday = today - timedelta(days=1)
-        yesterday_revenue = float(Sale.objects.filter(date=yesterday).aggregate(total=Sum('revenue')).get('total') or 0.0)
+        yesterday_revenue = kpi['yesterday']['revenue']
+        prev_week_revenue = kpi['prev_week']['revenue']
+        prev_month_revenue = kpi['prev_month']['revenue']
     except Exception:
-        yesterday_revenue = 0.0
-
-    try:
-        prev_week_start = week_start - timedelta(days=7)
-        prev_week_end = prev_week_start + timedelta(days=6)
-        prev_week_revenue = float(Sale.objects.filter(date__gte=prev_week_start, date__lte=prev_week_end).aggregate(total=Sum('revenue')).get('total') or 0.0)
-    except Exception:
-        prev_week_revenue = 0.0
-
-    try:
-        # previous month (month before current month)
-        if today.month == 1:
-            pm_year = today.year - 1
-            pm_month = 12
-        else:
-            pm_year = today.year
-            pm_month = today.month - 1
-        from calendar import monthrange
-        pm_start = today.replace(year=pm_year, month=pm_month, day=1)
-        pm_end = pm_start.replace(day=monthrange(pm_start.year, pm_start.month)[1])
-        prev_month_revenue = float(Sale.objects.filter(date__gte=pm_start, date__lte=pm_end).aggregate(total=Sum('revenue')).get('total') or 0.0)
-    except Exception:
-        prev_month_revenue = 0.0
+        yesterday_revenue = prev_week_revenue = prev_month_revenue = 0.0
 
     today_growth_pct = compute_growth(today_forecast_revenue, yesterday_revenue)
     week_growth_pct = compute_growth(week_forecast_revenue, prev_week_revenue)
@@ -1171,7 +1448,7 @@ def _forecast_view_impl(request, logger, json):
                     continue
             
             if daily_dates:
-                q = Sale.objects.filter(date__in=daily_dates).values('date').annotate(total_rev=Sum('revenue')).order_by('date')
+                q = DailyProductSales.objects.filter(date__in=daily_dates).values('date').annotate(total_rev=Sum('revenue')).order_by('date')
                 rev_map = {r['date'].isoformat(): int(round(float(r.get('total_rev') or 0.0))) for r in q}
                 # Include forecast data from the API payload computation (done earlier in view)
                 try:
@@ -1242,6 +1519,8 @@ def _forecast_view_impl(request, logger, json):
 from django.contrib.auth.decorators import login_required
 
 @login_required
+@replica.analytics_reads
+@conditional.condition(versioning.SALES, versioning.CATALOG)
 def forecast_data_api(request):
     """Return JSON with aggregated series and forecasts for daily/weekly/monthly and per-product summaries."""
     logger = logging.getLogger(__name__)
@@ -1249,7 +1528,8 @@ def forecast_data_api(request):
         user_info = None
         if hasattr(request, 'user') and request.user and hasattr(request.user, 'is_authenticated'):
             try:
-                groups = list(request.user.groups.values_list('name', flat=True))
+                from .services.roles import role_names
+                groups = sorted(role_names(request.user))
             except Exception:
                 groups = []
             user_info = {
@@ -1260,328 +1540,48 @@ def forecast_data_api(request):
         logger.info('forecast_data_api called; path=%s user=%s remote=%s x-requested-with=%s', request.path, user_info, request.META.get('REMOTE_ADDR'), request.META.get('HTTP_X_REQUESTED_WITH'))
     except Exception:
         logger.exception('Error logging forecast_data_api request info')
-    # Wrap main API logic so unexpected exceptions return a controlled JSON error
+    params = {k: request.GET.get(k) for k in ('start', 'end', 'product')}
     try:
-        try:
-            from .services.forecasting import aggregate_sales, forecast_time_series, moving_average_forecast
-        except Exception as e:
-            logger.exception('Forecast API import failed: %s', str(e))
-            return JsonResponse({'error': 'Forecasting libraries unavailable', 'details': str(e)}, status=500)
-
-        import json
-
-        # Build per-product forecasts from DB historical sales only
-        products = []
-        try:
-            db_results = moving_average_forecast(window=3)
-            db_forecasts = db_results.get('db_forecasts', {})
-            for pid, r in db_forecasts.items():
-                try:
-                    product_obj = Product.objects.get(pk=pid)
-                except Product.DoesNotExist:
-                    continue
-                conf = r.get('confidence', 0)
-                if conf and conf <= 1.0:
-                    conf = conf * 100
-                accuracy = r.get('accuracy') or ('High' if conf >= 70 else 'Medium' if conf >= 40 else 'Low')
-                history = r.get('history', []) or []
-                products.append({
-                    'product': product_obj.name,
-                    'product_id': pid,
-                    'forecast': int(r.get('forecast', 0)),
-                    'avg': float(r.get('avg', 0)),
-                    'trend': r.get('trend', 'unknown'),
-                    'confidence': int(conf or 0),
-                    'accuracy': accuracy,
-                    'last_7_days': int(sum([u for _, u in history[-7:]]))
-                })
-        except Exception as e:
-            logger.exception('Error building DB product forecasts: %s', str(e))
-            products = []
+        from .services.forecast_payloads import forecast_data_payload, PayloadError
     except Exception as e:
-        # Catch-all: return JSON error; include traceback when admin requests debug=1
-        import traceback, uuid
-        tb = traceback.format_exc()
-        error_id = uuid.uuid4().hex[:8]
-        logger.exception('Unexpected error in forecast_data_api (id=%s): %s\n%s', error_id, str(e), tb)
-        try:
-            is_admin = hasattr(request, 'user') and getattr(request.user, 'is_superuser', False)
-            if request.GET.get('debug') and is_admin:
-                return JsonResponse({'error': 'Internal Server Error', 'trace': tb, 'id': error_id}, status=500)
-        except Exception:
-            pass
-        return JsonResponse({'error': 'Internal Server Error', 'id': error_id}, status=500)
-
-    # Use DB aggregates for series (daily/weekly/monthly) — CSV is not used for forecasts
-    daily_series = aggregate_sales('daily', lookback=60)
-    weekly_series = aggregate_sales('weekly', lookback=12)
-    monthly_series = aggregate_sales('monthly', lookback=12)
-
-    # Optional filters from query params: start (YYYY-MM-DD), end (YYYY-MM-DD), product
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-    product_filter = request.GET.get('product')
-
-    def filter_series_by_range(series, granularity):
-        if not series or not (start or end):
-            return series
-        out = []
-        for label, val in series:
-            try:
-                if granularity == 'monthly':
-                    # label like 'YYYY-MM'
-                    lab_key = label
-                    if start:
-                        if lab_key < start[:7]:
-                            continue
-                    if end:
-                        if lab_key > end[:7]:
-                            continue
-                else:
-                    # daily/weekly ISO date
-                    lab_date = label
-                    if start and lab_date < start:
-                        continue
-                    if end and lab_date > end:
-                        continue
-                out.append((label, val))
-            except Exception:
-                continue
-        return out
+        logger.exception('Forecast API import failed: %s', str(e))
+        return JsonResponse({'error': 'Forecasting libraries unavailable', 'details': str(e)}, status=500)
 
-    daily_series = filter_series_by_range(daily_series, 'daily')
-    weekly_series = filter_series_by_range(weekly_series, 'weekly')
-    monthly_series = filter_series_by_range(monthly_series, 'monthly')
-
-    if product_filter:
-        products = [p for p in products if p.get('product') == product_filter]
-
-    # CRITICAL FIX: Generate forecasts from UNFILTERED series to ensure we have proper forecast
-    # We need to use the full historical data for forecast generation, not just the filtered range
-    try:
-        # Get unfiltered series for forecast generation
-        daily_series_unfiltered = aggregate_sales('daily', lookback=60)
-        weekly_series_unfiltered = aggregate_sales('weekly', lookback=12)
-        monthly_series_unfiltered = aggregate_sales('monthly', lookback=12)
-        
-        logger.info('API: Unfiltered daily_series length: %d, weekly: %d, monthly: %d', 
-                    len(daily_series_unfiltered) if daily_series_unfiltered else 0, 
-                    len(weekly_series_unfiltered) if weekly_series_unfiltered else 0, 
-                    len(monthly_series_unfiltered) if monthly_series_unfiltered else 0)
-        
-        # Generate forecasts from full historical data
-        daily_fore = forecast_time_series(daily_series_unfiltered, horizon=30)
-        weekly_fore = forecast_time_series(weekly_series_unfiltered, horizon=12)
-        monthly_fore = forecast_time_series(monthly_series_unfiltered, horizon=6)
-        
+    def compute():
         try:
-            logger.info('API: Generated forecasts - daily: %d, weekly: %d, monthly: %d', 
-                        len(daily_fore.get('forecast', []) or []), 
-                        len(weekly_fore.get('forecast', []) or []), 
-                        len(monthly_fore.get('forecast', []) or []))
-        except Exception as e:
-            logger.exception('Error logging forecast lengths: %s', e)
-        
-        # Ensure we always have arrays (even if empty)
-        daily_fore = {
-            'forecast': daily_fore.get('forecast') or [],
-            'upper': daily_fore.get('upper') or [],
-            'lower': daily_fore.get('lower') or [],
-            'confidence': daily_fore.get('confidence') or 0,
-            'accuracy': daily_fore.get('accuracy', '')
-        }
-        weekly_fore = {
-            'forecast': weekly_fore.get('forecast') or [],
-            'upper': weekly_fore.get('upper') or [],
-            'lower': weekly_fore.get('lower') or [],
-            'confidence': weekly_fore.get('confidence') or 0,
-            'accuracy': weekly_fore.get('accuracy', '')
-        }
-        monthly_fore = {
-            'forecast': monthly_fore.get('forecast') or [],
-            'upper': monthly_fore.get('upper') or [],
-            'lower': monthly_fore.get('lower') or [],
-            'confidence': monthly_fore.get('confidence') or 0,
-            'accuracy': monthly_fore.get('accuracy', '')
-        }
-
-        # Server-side fallback: if model returned empty or trivial forecasts (all zeros),
-        # compute a simple fallback using recent actuals so the API always provides a usable projection.
-        def _ensure_forecast_non_empty(fore, series, horizon, label='series'):
+            return forecast_data_payload(params)
+        except PayloadError as exc:
+            body = dict(exc.body)
             try:
-                preds = fore.get('forecast') or []
-                valid = sum(1 for v in preds if v is not None and v != 0)
-                if not preds or valid == 0:
-                    vals = [v for _, v in series]
-                    recent = vals[-14:] if vals else []
-                    if not recent:
-                        preds2 = [0] * horizon
-                    else:
-                        # simple slope + mean baseline
-                        baseline = sum(recent) / len(recent)
-                        slope = (recent[-1] - recent[0]) / max(1, len(recent) - 1)
-                        preds2 = [max(0, int(round(baseline + slope * (i + 1)))) for i in range(horizon)]
-                    fore['forecast'] = preds2
-                    fore['upper'] = [int(round(p * 1.2 + 10)) for p in preds2]
-                    fore['lower'] = [max(0, int(round(p * 0.8 - 10))) for p in preds2]
-                    # mark as fallback so clients can show a notice
-                    fore['fallback'] = True
-                else:
-                    fore['fallback'] = False
+                is_admin = hasattr(request, 'user') and getattr(request.user, 'is_superuser', False)
+                if exc.trace and request.GET.get('debug') and is_admin:
+                    body['trace'] = exc.trace
             except Exception:
-                fore['fallback'] = True
-            return fore
-
-        # Ensure we have non-empty forecasts for clients (daily:30, weekly:12, monthly:6)
-        # IMPORTANT: Use the UNFILTERED series for fallback generation so clients that request
-        # a narrow date range still receive a full forecast computed from the complete history.
-        daily_fore = _ensure_forecast_non_empty(daily_fore, daily_series_unfiltered, horizon=30, label='daily')
-        weekly_fore = _ensure_forecast_non_empty(weekly_fore, weekly_series_unfiltered, horizon=12, label='weekly')
-        monthly_fore = _ensure_forecast_non_empty(monthly_fore, monthly_series_unfiltered, horizon=6, label='monthly')
-    except Exception as e:
-        # If forecast computation fails, just log it and keep the default empty forecasts
-        # The view will still render with empty/fallback data
-        logger.warning('Forecast computation failed (will use defaults): %s', str(e))
-    try:
-        from .services.forecasting import compute_period_overview, generate_insight
+                pass
+            return JsonResponse(body, status=exc.status)
 
-        # Build summary for overview cards and AI insights
-        daily_summary = compute_period_overview(daily_series)
-        weekly_summary = compute_period_overview(weekly_series)
-        monthly_summary = compute_period_overview(monthly_series)
-
-        daily_insight = generate_insight('daily', daily_series, daily_fore)
-        weekly_insight = generate_insight('weekly', weekly_series, weekly_fore)
-        monthly_insight = generate_insight('monthly', monthly_series, monthly_fore)
-
-        # compute average unit price over the last 30 days so clients can scale unit-based series into revenue
+    result = None
+    if not (params['start'] or params['end']):
+        # Unfiltered requests are served from the precomputed snapshot when fresh
         try:
-            from django.utils import timezone as _tz
-            from datetime import timedelta as _td
-            try:
-                _today = _tz.localdate()
-            except Exception:
-                _today = _tz.now().date()
-            _lookback = 30
-            _start = _today - _td(days=_lookback)
-            _agg = Sale.objects.filter(date__gte=_start, date__lte=_today).aggregate(total_rev=Sum('revenue'), total_units=Sum('units_sold'))
-            _rev = float(_agg.get('total_rev') or 0.0)
-            _units = int(_agg.get('total_units') or 0)
-            avg_unit_price = (_rev / _units) if _units > 0 else 0.0
+            from .services.forecast_snapshots import latest
+            result = latest('store', 'forecast_data_api')
         except Exception:
-            avg_unit_price = 0.0
-
-        payload = {
-            'products': products,
-            'data_source': 'db',
-            'avg_unit_price': avg_unit_price,
-            'currency': '₱',
-            'summary': {
-                'daily': daily_summary,
-                'weekly': weekly_summary,
-                'monthly': monthly_summary
-            },
-            'ai_insights': [ins for ins in (daily_insight, weekly_insight, monthly_insight) if ins],
-            'daily': {
-                'labels': [d for d, _ in daily_series],
-                'actual': [v for _, v in daily_series],
-                'forecast': daily_fore['forecast'],
-                'upper': daily_fore['upper'],
-                'lower': daily_fore['lower'],
-                'confidence': daily_fore['confidence'],
-                'accuracy': daily_fore.get('accuracy', ''),
-                'fallback': bool(daily_fore.get('fallback', False))
-            },
-
-            'weekly': {
-                'labels': [d for d, _ in weekly_series],
-                'actual': [v for _, v in weekly_series],
-                'forecast': weekly_fore['forecast'],
-                'upper': weekly_fore['upper'],
-                'lower': weekly_fore['lower'],
-                'confidence': weekly_fore['confidence'],
-                'accuracy': weekly_fore.get('accuracy', ''),
-                'fallback': bool(weekly_fore.get('fallback', False))
-            },
-            'monthly': {
-                'labels': [d for d, _ in monthly_series],
-                'actual': [v for _, v in monthly_series],
-                'forecast': monthly_fore['forecast'],
-                'upper': monthly_fore['upper'],
-                'lower': monthly_fore['lower'],
-                'confidence': monthly_fore['confidence'],
-                'accuracy': monthly_fore.get('accuracy', ''),
-                'fallback': bool(monthly_fore.get('fallback', False))
-            }
-        }
-
-        # Also include server-side revenue series (now direct from DB since aggregate_sales returns revenue)
-        # No need to convert anymore since aggregate_sales() now returns revenue directly
+            logger.exception('Forecast snapshot lookup failed')
+        if result is not None and params['product']:
+            result = dict(result, products=[p for p in result.get('products', []) if p.get('product') == params['product']])
+    if result is None:
         try:
-            # Daily actuals are already in revenue form from aggregate_sales()
-            daily_dates = [d for d, _ in daily_series]
-            daily_actual = [v for _, v in daily_series]
-
-            logger.info('API: daily_revenue - dates: %d, actual values: %d, sample actual: %s', 
-                        len(daily_dates), len(daily_actual), daily_actual[:3] if daily_actual else 'EMPTY')
-
-            payload['daily_revenue'] = {
-                'labels': daily_dates,
-                'actual': daily_actual,
-                'forecast': daily_fore.get('forecast', []),
-                'upper': daily_fore.get('upper', []),
-                'lower': daily_fore.get('lower', []),
-                'confidence': daily_fore.get('confidence', 0),
-                'fallback': bool(daily_fore.get('fallback', False))
-            }
-            
-            # Log what we're returning (safely)
-            try:
-                logger.info('API: Payload daily_revenue contains - labels:%d, actual:%d, forecast:%d',
-                            len(payload['daily_revenue'].get('labels', [])),
-                            len(payload['daily_revenue'].get('actual', [])),
-                            len(payload['daily_revenue'].get('forecast', [])))
-            except Exception as e:
-                logger.exception('Error logging daily_revenue: %s', e)
-
-            # Weekly/monthly: values are already in revenue form
-            payload['weekly_revenue'] = {
-                'labels': [d for d, _ in weekly_series],
-                'actual': [v for _, v in weekly_series],
-                'forecast': weekly_fore.get('forecast', []),
-                'upper': weekly_fore.get('upper', []),
-                'lower': weekly_fore.get('lower', []),
-                'confidence': weekly_fore.get('confidence', 0),
-                'fallback': bool(weekly_fore.get('fallback', False))
-            }
-            payload['monthly_revenue'] = {
-                'labels': [d for d, _ in monthly_series],
-                'actual': [v for _, v in monthly_series],
-                'forecast': monthly_fore.get('forecast', []),
-                'upper': monthly_fore.get('upper', []),
-                'lower': monthly_fore.get('lower', []),
-                'confidence': monthly_fore.get('confidence', 0),
-                'fallback': bool(monthly_fore.get('fallback', False))
-            }
-
-            # Yearly: aggregated forecast across next 12 months (sum of monthly forecasts)
-            payload['yearly_revenue'] = {
-                'labels': [d for d, _ in monthly_series],
-                'actual': [v for _, v in monthly_series],
-                'forecast': year_fore.get('forecast', []),
-                'upper': year_fore.get('upper', []),
-                'lower': year_fore.get('lower', []),
-                'confidence': year_fore.get('confidence', 0),
-                'fallback': bool(year_fore.get('fallback', False))
-            }
+            from .services.forecast_cache import get_or_compute
         except Exception:
-            # Best-effort: if construction fails, fall back to plain series already present
-            pass
-
-        return JsonResponse(payload)
-    except Exception as out_exc:
-        logger.exception('Error building forecast API response: %s', str(out_exc))
-        return JsonResponse({'error': 'Failed to build forecast response', 'details': str(out_exc)}, status=500)
+            logger.exception('Forecast cache unavailable; computing forecast payload directly')
+            result = compute()
+        else:
+            # Successful payloads are cached until the next sales/catalog write
+            result = get_or_compute('forecast_data_api', params, compute, cacheable=lambda r: isinstance(r, dict))
+    if isinstance(result, dict):
+        return JsonResponse(result)
+    return result
 
 
 @login_required
@@ -1647,6 +1647,8 @@ def product_forecast(request):
 
 
 @login_required
+@replica.analytics_reads
+@conditional.condition(versioning.SALES, versioning.CATALOG)
 def product_forecast_api(request):
     """Return JSON payload with per-product multi-horizon forecasts and top-ranked lists.
     Optional query params:
@@ -1656,7 +1658,7 @@ def product_forecast_api(request):
     """
     logger = logging.getLogger(__name__)
     try:
-        from .services.forecasting import product_forecast_summary
+        from .services.forecast_payloads import product_forecast_payload, slice_product_payload
     except Exception as exc:
         logger.exception('Forecast helpers unavailable: %s', str(exc))
         return JsonResponse({'error': 'Forecasting helpers unavailable', 'details': str(exc)}, status=500)
@@ -1682,224 +1684,63 @@ def product_forecast_api(request):
     except Exception:
         max_price = None
 
-    products_payload = []
-    try:
-        # Build base queryset with optional filters
-        qs = Product.objects.all().order_by('name')
-        if category:
-            qs = qs.filter(category=category)
-        if search:
-            qs = qs.filter(name__icontains=search)
-        # Apply active filter
-        if active_only in ('1', 'true', 'True'):
-            qs = qs.filter(is_active=True)
-        # Apply price filters
-        if min_price is not None:
-            qs = qs.filter(price__gte=min_price)
-        if max_price is not None:
-            qs = qs.filter(price__lte=max_price)
-        # If in_stock filter requested, narrow queryset to products with inventory quantity > 0
-        if in_stock_only in ('1', 'true', 'True'):
-            qs = qs.filter(inventory_items__quantity__gt=0).distinct()
-
-        logger.debug('product_forecast_api: Processing %d products for horizon %d', qs.count(), horizon)
-        
-        # Compute per-product summaries
-        for p in qs:
-            try:
-                summ = product_forecast_summary(p.id, horizons=(1, 7, 30), lookback_days=180)
-                # pick forecast for requested horizon
-                h_key = f'h_{horizon}'
-                hinfo = summ['horizons'].get(h_key, {'forecast': 0, 'confidence': 0})
-                forecast_h = int(hinfo.get('forecast', 0))
-                
-                # Get past 7 and 30 days from the series returned by product_forecast_summary
-                vals = [v for _, v in summ.get('series', [])]
-                last_7 = int(sum(vals[-7:])) if len(vals) >= 7 else int(sum(vals)) if vals else 0
-                past_30 = int(sum(vals[-30:])) if len(vals) >= 30 else int(sum(vals)) if vals else 0
-                
-                # ALWAYS use database fallback for accurate Last 7 Days and Last 30 Days
-                # (don't wait for vals to be empty; the series may have zeros which is ambiguous)
-                try:
-                    from datetime import timedelta
-                    from django.utils import timezone as tz
-                    # Use Django's timezone-aware date function to match Sale model's timezone settings
-                    try:
-                        today = tz.localdate()
-                    except Exception:
-                        today = tz.now().date()
-                    week_ago = today - timedelta(days=6)  # inclusive of today = 7 days total
-                    month_ago = today - timedelta(days=29)  # inclusive of today = 30 days total
-                    
-                    # Query actual units sold from database for last 7 days
-                    last_7_sales = Sale.objects.filter(
-                        product_id=p.id,
-                        date__gte=week_ago,
-                        date__lte=today
-                    ).aggregate(total=Sum('units_sold'))
-                    last_7_db = int(last_7_sales.get('total') or 0)
-                    
-                    # Query actual units sold for last 30 days
-                    last_30_sales = Sale.objects.filter(
-                        product_id=p.id,
-                        date__gte=month_ago,
-                        date__lte=today
-                    ).aggregate(total=Sum('units_sold'))
-                    past_30_db = int(last_30_sales.get('total') or 0)
-                    
-                    # Prefer database values over series (more accurate for recent data)
-                    last_7 = last_7_db
-                    past_30 = past_30_db
-                except Exception as e:
-                    logger.exception('Fallback DB query for product %s last_7/past_30 failed: %s', p.id, e)
-                    # If DB query fails, use series values as fallback
-                    pass
-                
-                # growth: compare forecast for horizon to previous period
-                # Calculate trend from the summary (which compares last 7 to previous 7)
-                if horizon == 7:
-                    # For 7-day horizon, forecast should reflect trend vs previous 7 days
-                    # The API returns forecast_h which is based on last 7 days
-                    # Calculate what the growth rate would be vs. previous period
-                    denom = last_7 if last_7 > 0 else None
-                    
-                    # Get the trend factor from the summary (compares last 7 to prev 7)
-                    # Since forecast_7d uses last_7_vals and prev_7_vals, we can estimate growth
-                    try:
-                        from datetime import timedelta
-                        from django.utils import timezone as tz
-                        prev_week_ago = week_ago - timedelta(days=7)  # days 8-14
-                        prev_7_sales = Sale.objects.filter(
-                            product_id=p.id,
-                            date__gte=prev_week_ago,
-                            date__lt=week_ago
-                        ).aggregate(total=Sum('units_sold'))
-                        prev_7_db = int(prev_7_sales.get('total') or 0)
-                        
-                        if prev_7_db > 0:
-                            growth = round((last_7 - prev_7_db) / float(prev_7_db) * 100.0, 1)
-                        else:
-                            growth = 0.0
-                    except Exception:
-                        growth = 0.0
-                elif horizon == 30:
-                    denom = past_30 if past_30 > 0 else None
-                    try:
-                        from datetime import timedelta
-                        from django.utils import timezone as tz
-                        prev_month_ago = month_ago - timedelta(days=30)  # 30 days before the target period
-                        prev_30_sales = Sale.objects.filter(
-                            product_id=p.id,
-                            date__gte=prev_month_ago,
-                            date__lt=month_ago
-                        ).aggregate(total=Sum('units_sold'))
-                        prev_30_db = int(prev_30_sales.get('total') or 0)
-                        
-                        if prev_30_db > 0:
-                            growth = round((past_30 - prev_30_db) / float(prev_30_db) * 100.0, 1)
-                        else:
-                            growth = 0.0
-                    except Exception:
-                        growth = 0.0
-                else:
-                    denom = last_7 if last_7 > 0 else None
-                    try:
-                        from datetime import timedelta
-                        from django.utils import timezone as tz
-                        prev_week_ago = week_ago - timedelta(days=7)
-                        prev_7_sales = Sale.objects.filter(
-                            product_id=p.id,
-                            date__gte=prev_week_ago,
-                            date__lt=week_ago
-                        ).aggregate(total=Sum('units_sold'))
-                        prev_7_db = int(prev_7_sales.get('total') or 0)
-                        
-                        if prev_7_db > 0:
-                            growth = round((last_7 - prev_7_db) / float(prev_7_db) * 100.0, 1)
-                        else:
-                            growth = 0.0
-                    except Exception:
-                        growth = 0.0
-                price = float(p.price) if p.price is not None else 0.0
-                projected_revenue = round(forecast_h * price, 2)
-
-                in_stock = p.inventory_items.filter(quantity__gt=0).exists()
-                
-                # Log the first few products to help debug
-                if len(products_payload) < 3:
-                    logger.info('Product %s: forecast_h=%d, last_7=%d, past_30=%d, confidence=%f', 
-                               p.name, forecast_h, last_7, past_30, hinfo.get('confidence', 0))
-                
-                products_payload.append({
-                    'product_id': p.id,
-                    'product': p.name,
-                    'forecast_h': forecast_h,
-                    'confidence': float(hinfo.get('confidence', 0)),
-                    'trend': summ.get('trend', 'stable'),
-                    'last_7_days': last_7,
-                    'past_30_days': past_30,
-                    'avg': summ.get('avg', 0.0),
-                    'growth_rate': growth,
-                    'price': price,
-                    'projected_revenue': projected_revenue,
-                    'category': p.category or '',
-                    'is_active': bool(p.is_active),
-                    'in_stock': bool(in_stock)
-                })
-            except Exception:
-                logger.exception('Error computing product summary for product id %s', p.id)
-                continue
-    except Exception as e:
-        logger.exception('Error building product forecast payload: %s', str(e))
-        return JsonResponse({'error': 'Internal Server Error'}, status=500)
-
-    # Sort by forecast descending
-    products_sorted = sorted(products_payload, key=lambda x: x['forecast_h'], reverse=True)
-
-    # Summary aggregates (respecting filters)
-    total_forecast_units = sum(p['forecast_h'] for p in products_sorted)
-    total_projected_revenue = round(sum(p['projected_revenue'] for p in products_sorted), 2)
-
-    # Trending: sort by growth_rate descending
-    trending_sorted = sorted(products_payload, key=lambda x: x.get('growth_rate', 0.0), reverse=True)
-    
-    logger.info('product_forecast_api returning %d/%d top products for horizon %d, total forecast=%d', 
-               len(products_sorted[:top_n]), len(products_sorted), horizon, total_forecast_units)
-
-    result = {
-        'horizon': horizon,
-        'top': products_sorted[:top_n],
-        'trending': trending_sorted[:max(10, top_n)],
-        'best': products_sorted[0] if products_sorted else None,
-        'summary': {
-            'total_forecast_units': total_forecast_units,
-            'projected_revenue': total_projected_revenue,
-            'count': len(products_sorted)
-        }
+    params = {
+        'horizon': horizon, 'top': top_n, 'product_id': product_id, 'category': category,
+        'search': search, 'active': active_only, 'in_stock': in_stock_only,
+        'min_price': min_price, 'max_price': max_price,
     }
 
-    # If product_id requested, include detailed series and forecasts
-    if product_id:
+    result = None
+    # The plain per-category ranking is precomputed; other filters are computed on demand
+    if not (search or active_only or in_stock_only or min_price is not None or max_price is not None):
         try:
-            pid = int(product_id)
-            summ = product_forecast_summary(pid, horizons=(1, 7, 30), lookback_days=180)
-            result['product_detail'] = summ
+            from .services.forecast_snapshots import latest
+            ranking = latest('category', category or '', horizon)
+            if ranking is not None:
+                result = slice_product_payload(ranking, top_n)
+                if product_id:
+                    detail = None
+                    try:
+                        detail = latest('product', str(int(product_id)))
+                        if detail is None:
+                            from .services.forecasting import product_forecast_summary
+                            detail = product_forecast_summary(int(product_id), horizons=(1, 7, 30), lookback_days=180)
+                    except Exception:
+                        detail = None
+                    result['product_detail'] = detail
         except Exception:
-            result['product_detail'] = None
+            logger.exception('Product forecast snapshot lookup failed')
+            result = None
 
+    if result is None:
+        try:
+            from .services.forecast_cache import get_or_compute
+        except Exception:
+            logger.exception('Forecast cache unavailable; computing product forecasts directly')
+            result = product_forecast_payload(params)
+        else:
+            # Cached per filter set until the next sales/catalog write
+            result = get_or_compute('product_forecast_api', params, lambda: product_forecast_payload(params))
+    if result is None:
+        return JsonResponse({'error': 'Internal Server Error'}, status=500)
     return JsonResponse(result)
 
 
 # Admin: user management (Admin only)
 @group_required("Admin")
 def admin_user_list(request):
-    users = User.objects.all().prefetch_related('groups')
+    from .services.roles import role_matrix, ADMIN, CASHIER
+    users = list(User.objects.all())
+    # One membership query for the whole table instead of two per user
+    matrix = role_matrix([u.id for u in users])
     users_info = []
     for u in users:
+        names = matrix[u.id]
         users_info.append({
             'user': u,
-            'is_admin': u.groups.filter(name='Admin').exists(),
-            'is_cashier': u.groups.filter(name='Cashier').exists(),
+            'groups': sorted(names),
+            'is_admin': ADMIN in names,
+            'is_cashier': CASHIER in names,
         })
     return render(request, 'pages/admin_user_list.html', {'users': users_info})
 
@@ -2032,13 +1873,16 @@ def admin_toggle_group(request):
 
     # If AJAX request, return JSON for client-side updates
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        from .services import roles
+        # The membership signal has just invalidated the cached roles, so this reloads them
+        names = roles.role_names(user)
         return JsonResponse({
             'status': 'ok',
             'message': msg,
             'user_id': user.id,
             'group': group.name,
-            'is_admin': user.groups.filter(name='Admin').exists(),
-            'is_cashier': user.groups.filter(name='Cashier').exists(),
+            'is_admin': roles.ADMIN in names,
+            'is_cashier': roles.CASHIER in names,
         })
 
     return redirect('admin_user_list')
@@ -2046,6 +1890,7 @@ def admin_toggle_group(request):
 
 # Record sales by period (week/month) - Auto-summarize and printable
 @group_required("Admin")
+@replica.analytics_reads
 def record_sales_period(request):
     """Record sales summary for a week or month with printable option"""
     from datetime import timedelta
@@ -2221,65 +2066,35 @@ def create_sale(request):
             logger.warning('create_sale: No items in cart')
             return JsonResponse({'error': 'No items in cart'}, status=400)
         
-        # First, validate all items have sufficient inventory
-        for item in items:
-            try:
-                product = Product.objects.get(pk=item['id'])
-                inv = product.inventory_items.first()
-                
-                if inv and inv.quantity < item['quantity']:
-                    logger.warning(f'create_sale: Insufficient inventory for {product.name}')
-                    return JsonResponse({'error': f'Insufficient inventory for {product.name}. Available: {inv.quantity}, Requested: {item["quantity"]}'}, status=400)
-                
-                # Validate quantity is positive
-                if item['quantity'] <= 0:
-                    logger.warning(f'create_sale: Invalid quantity for {product.name}')
-                    return JsonResponse({'error': f'Invalid quantity for {product.name}'}, status=400)
-            except Product.DoesNotExist:
-                logger.error(f'create_sale: Product not found with id {item["id"]}')
-                return JsonResponse({'error': f'Product not found (id: {item["id"]})'}, status=404)
-        
-        # All validations passed, create sale records for each item
-        # Use a small retry for transient DB errors (e.g., SSL decryption failures)
+        from .services.checkout import checkout, CheckoutError
+
+        # The whole cart is validated and written in one transaction. Use a
+        # small retry for transient DB errors (e.g., SSL decryption failures);
+        # a failed attempt is rolled back so retrying cannot double-book.
         from django.db import close_old_connections
         from django.db.utils import InterfaceError, DatabaseError
 
-        for item in items:
-            product = Product.objects.get(pk=item['id'])
-            attempt = 0
-            while True:
+        attempt = 0
+        while True:
+            try:
+                order = checkout(items)
+                break
+            except CheckoutError as ce:
+                logger.warning('create_sale: cart rejected: %s', ce.line_errors)
+                return JsonResponse({'error': str(ce), 'line_errors': ce.line_errors}, status=ce.status)
+            except (InterfaceError, DatabaseError) as db_exc:
+                logger.warning('create_sale: DB error on write (attempt %s): %s', attempt + 1, str(db_exc))
                 try:
-                    sale = Sale.objects.create(
-                        product=product,
-                        units_sold=item['quantity'],
-                        revenue=float(item['price']) * item['quantity']
-                    )
-
-                    # Update inventory
-                    inv = product.inventory_items.first()
-                    if inv:
-                        inv.quantity -= item['quantity']
-                        inv.save()
-                        logger.info(f'create_sale: Updated inventory for {product.name}, new qty: {inv.quantity}')
-
-                    # success -> break retry loop
-                    break
-
-                except (InterfaceError, DatabaseError) as db_exc:
-                    # transient DB error (could be SSL/decryption); attempt to recover once
-                    logger.warning('create_sale: DB error on write (attempt %s): %s', attempt + 1, str(db_exc))
-                    # Close old connections and retry once
-                    try:
-                        close_old_connections()
-                    except Exception:
-                        logger.exception('create_sale: close_old_connections failed')
-                    attempt += 1
-                    if attempt >= 2:
-                        logger.exception('create_sale: DB write failed after retry: %s', str(db_exc))
-                        raise
-        
-        logger.info('create_sale: Sale recorded successfully')
-        return JsonResponse({'success': True, 'message': 'Sale recorded successfully'})
+                    close_old_connections()
+                except Exception:
+                    logger.exception('create_sale: close_old_connections failed')
+                attempt += 1
+                if attempt >= 2:
+                    logger.exception('create_sale: DB write failed after retry: %s', str(db_exc))
+                    raise
+
+        logger.info('create_sale: Sale recorded successfully (order %s)', order.pk)
+        return JsonResponse({'success': True, 'message': 'Sale recorded successfully', 'order_id': order.pk})
     except json.JSONDecodeError as e:
         logger.error('create_sale: JSON decode error: %s', str(e))
         logger.error(f'Request body: {request.body}')
@@ -2336,23 +2151,13 @@ def pending_cashier_reject(request):
     return redirect('pending_cashiers')
 
 @login_required
+@conditional.condition(versioning.SALES, versioning.CATALOG)
 def recent_orders_api(request):
-    """Return recent sales (last 50 orders) with product details, ordered by most recent first."""
+    """Return the 50 most recent orders (newest first) with their line items."""
     try:
-        # Get the 50 most recent sales, ordered by date (newest first)
-        recent_sales = Sale.objects.select_related('product').order_by('-date')[:50]
-        
-        orders = []
-        for sale in recent_sales:
-            orders.append({
-                'id': sale.id,
-                'product_name': sale.product.name,
-                'category': sale.product.category,
-                'units_sold': sale.units_sold,
-                'revenue': float(sale.revenue),
-                'date': sale.date.isoformat(),
-                'date_formatted': sale.date.strftime('%b %d, %I:%M %p')
-            })
+        # Order headers plus order-less sale lines, each counted as one order
+        from .services.orders import recent_orders
+        orders = recent_orders(50)
         
         return JsonResponse({'success': True, 'orders': orders})
     except Exception as e:
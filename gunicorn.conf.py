@@ -0,0 +1,16 @@
+"""gunicorn settings, picked up automatically when gunicorn starts in the project root.
+
+Command-line flags (start.sh, render.yaml) still take precedence.
+"""
+import os
+
+# Import the app (and warm numpy/pandas, URLs, templates) once in the master;
+# workers fork from it and share those pages copy-on-write. Startup checks in
+# koki_foodhub/wsgi.py then also run once instead of once per worker.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+
+def post_worker_init(worker):
+    # Background threads do not survive fork(); start them in every worker
+    from core.services.forecast_snapshots import start_scheduler
+    start_scheduler(server=True)
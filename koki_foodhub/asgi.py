@@ -2,6 +2,9 @@
 ASGI config for koki_foodhub project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by an ASGI server (e.g. ``uvicorn koki_foodhub.asgi:application``), the
+live sales stream (/api/sales/stream/) stays open without holding a thread per
+dashboard.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
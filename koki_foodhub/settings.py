@@ -61,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so latency and query counts cover the whole chain (see /metrics)
+    'core.middleware.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # If the DB is unavailable, return a friendly 503 page instead of
     # exposing raw db errors in templates. Keep this early in the chain so
@@ -77,6 +79,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Keeps clients that just wrote off the analytics replica (read-your-writes)
+    'core.middleware.replica.AnalyticsPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,6 +98,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",  # <-- add this line
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.roles",
             ],
         },
     },
@@ -245,6 +250,118 @@ else:
         }
     }
 
+# Optional read replica for dashboards, forecasts and sales reports
+# (core/services/replica.py, core/routers.py). In production set
+# ANALYTICS_DATABASE_URL to the replica's postgres URL; locally point
+# ANALYTICS_SQLITE_PATH at a second SQLite file (e.g. a copy of db.sqlite3).
+# Clients that wrote stay on the primary for ANALYTICS_STICKY_SECONDS; an
+# unreachable replica is retried after ANALYTICS_RETRY_SECONDS.
+ANALYTICS_DATABASE = "analytics"
+ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL", "")
+ANALYTICS_SQLITE_PATH = os.getenv("ANALYTICS_SQLITE_PATH", "")
+if ANALYTICS_DATABASE_URL and not DEBUG:
+    from urllib.parse import urlparse
+    _replica_url = urlparse(ANALYTICS_DATABASE_URL)
+    DATABASES[ANALYTICS_DATABASE] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _replica_url.path[1:] if _replica_url.path else 'koki_foodhub',
+        'USER': _replica_url.username or 'postgres',
+        'PASSWORD': _replica_url.password or '',
+        'HOST': _replica_url.hostname or 'localhost',
+        'PORT': _replica_url.port or 5432,
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            # Fail over to the primary quickly when the replica is down
+            'connect_timeout': 5,
+            'sslmode': os.getenv('PGSSLMODE', 'require'),
+        },
+        # Tests read and write a single database
+        'TEST': {'MIRROR': 'default'},
+    }
+elif ANALYTICS_SQLITE_PATH:
+    DATABASES[ANALYTICS_DATABASE] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ANALYTICS_SQLITE_PATH,
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.routers.AnalyticsRouter"]
+ANALYTICS_STICKY_SECONDS = int(os.getenv("ANALYTICS_STICKY_SECONDS", "15"))
+ANALYTICS_RETRY_SECONDS = int(os.getenv("ANALYTICS_RETRY_SECONDS", "30"))
+
+# Cache used for forecast results (see core/services/forecast_cache.py).
+# Local memory is per-process; with several gunicorn workers set CACHE_BACKEND
+# to "file" or "db" so workers share entries. The "db" backend needs
+# `python manage.py createcachetable`.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").lower()
+if CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / ".cache")),
+        }
+    }
+elif CACHE_BACKEND == "db":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": os.getenv("CACHE_LOCATION", "django_cache"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "koki-foodhub",
+        }
+    }
+
+# Seconds a cached forecast payload may live; entries are also invalidated as
+# soon as sales or catalog data change.
+FORECAST_CACHE_TIMEOUT = int(os.getenv("FORECAST_CACHE_TIMEOUT", "21600"))
+
+# Precomputed forecast snapshots (see `precompute_forecasts`). Views serve a
+# snapshot younger than FORECAST_SNAPSHOT_MAX_AGE seconds (0 disables) and
+# compute on demand otherwise. FORECAST_PRECOMPUTE_INTERVAL > 0 runs the
+# precompute in a background thread of each web process every N seconds.
+FORECAST_SNAPSHOT_MAX_AGE = int(os.getenv("FORECAST_SNAPSHOT_MAX_AGE", "3600"))
+FORECAST_PRECOMPUTE_INTERVAL = int(os.getenv("FORECAST_PRECOMPUTE_INTERVAL", "0"))
+
+# Seconds the serialized POS catalog may stay cached; catalog writes replace it
+# immediately by bumping the catalog data version.
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "86400"))
+
+# Seconds a user's group names stay cached for permission checks. Membership
+# and group changes bump the "roles" data version, which retires the entries
+# on every worker at once, so this only bounds how long unused entries live.
+ROLE_CACHE_TIMEOUT = int(os.getenv("ROLE_CACHE_TIMEOUT", "300"))
+
+# Live sales stream (/api/sales/stream/). Workers check the sales data version
+# every LIVE_POLL_INTERVAL seconds to pick up sales recorded by other workers.
+# Under WSGI each open stream holds a worker thread, so a stream waits at most
+# LIVE_STREAM_WSGI_SECONDS for the next sale and ends (the browser reconnects),
+# and only LIVE_WSGI_MAX_STREAMS per process wait at once; the rest are
+# answered immediately. For many concurrent dashboards serve the app with an
+# ASGI server (koki_foodhub/asgi.py), where a stream lasts up to
+# LIVE_STREAM_MAX_SECONDS without holding a thread.
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "2"))
+LIVE_STREAM_WSGI_SECONDS = int(os.getenv("LIVE_STREAM_WSGI_SECONDS", "5"))
+LIVE_WSGI_MAX_STREAMS = int(os.getenv("LIVE_WSGI_MAX_STREAMS", "2"))
+LIVE_STREAM_MAX_SECONDS = int(os.getenv("LIVE_STREAM_MAX_SECONDS", "600"))
+
+# Request metrics served at /metrics (Prometheus text format). Each worker
+# writes its totals into METRICS_DIR (must be shared by all workers of a
+# server; defaults to a directory under the system temp dir). Scrapers
+# authenticate with "Authorization: Bearer $METRICS_TOKEN"; otherwise the
+# endpoint is limited to Admin users.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Columnar cache of pizzaplace.csv used by the CSV forecasting helpers
+# (core/services/csv_store.py). Rebuilt automatically when the CSV changes;
+# defaults to a directory under the system temp dir.
+CSV_CACHE_DIR = os.getenv("CSV_CACHE_DIR", "")
+
 
 
 # Password validation
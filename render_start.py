@@ -6,7 +6,6 @@ Runs migrations and starts the app
 import os
 import sys
 import subprocess
-import django
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'koki_foodhub.settings')
@@ -15,31 +14,11 @@ print("\n" + "="*60)
 print("🚀 RENDER DEPLOYMENT - STARTING UP")
 print("="*60)
 
-# Run migrations
-print("\n→ Running database migrations...")
-result = subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '2'], 
-                       capture_output=False, text=True)
+# One-time setup; skips migrate/collectstatic/etc. when nothing changed since the last deploy
+print("\n→ Running prestart...")
+result = subprocess.run([sys.executable, 'manage.py', 'prestart'], capture_output=False, text=True)
 if result.returncode != 0:
-    print("⚠️  Migration warning (continuing anyway)")
-
-# Initialize Django
-django.setup()
-
-# Create admin user
-print("\n→ Creating admin user...")
-from django.contrib.auth import get_user_model
-User = get_user_model()
-
-try:
-    admin = User.objects.get(username='admin')
-    print("✅ Admin user already exists")
-except User.DoesNotExist:
-    password = os.getenv('ADMIN_PASSWORD', 'admin123')
-    email = os.getenv('ADMIN_EMAIL', 'admin@koki-foodhub.com')
-    User.objects.create_superuser('admin', email, password)
-    print(f"✅ Admin user created (username: admin)")
-
-print(f"📊 Total users: {User.objects.count()}")
+    print("⚠️  Prestart warning (continuing anyway)")
 
 print("\n" + "="*60)
 print("✅ INITIALIZATION COMPLETE")
@@ -51,7 +30,9 @@ os.execvp('gunicorn', [
     'gunicorn',
     '--bind', f'0.0.0.0:{os.getenv("PORT", "10000")}',
     '--workers', '2',
-    '--worker-class', 'sync',
+    # Threaded workers: a live sales stream holds a thread, not a whole worker
+    '--worker-class', 'gthread',
+    '--threads', os.getenv('GUNICORN_THREADS', '8'),
     '--timeout', '60',
     '--access-logfile', '-',
     '--error-logfile', '-',
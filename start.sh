@@ -8,35 +8,12 @@ echo "=========================================="
 # Change to project directory  
 cd /opt/render/project/src
 
-# Run migrations with explicit verbose output
+# One-time setup (migrate, cache table, static files, admin user, image
+# derivatives, forecast snapshots). Steps whose fingerprint is unchanged since
+# the last deploy are skipped, so a plain restart only pays a few queries.
 echo ""
-echo "→ Running migrations..."
-python manage.py migrate --verbosity 2
-
-# Create admin user
-echo ""
-echo "→ Checking/creating admin user..."
-python << END
-import os
-import django
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'koki_foodhub.settings')
-django.setup()
-
-from django.contrib.auth import get_user_model
-User = get_user_model()
-
-admin_user = User.objects.filter(username='admin').first()
-if admin_user:
-    print("✅ Admin user already exists")
-else:
-    password = os.getenv('ADMIN_PASSWORD', 'admin123')
-    email = os.getenv('ADMIN_EMAIL', 'admin@koki-foodhub.com')
-    User.objects.create_superuser('admin', email, password)
-    print("✅ Admin user created!")
-
-print(f"📊 Total users in database: {User.objects.count()}")
-END
+echo "→ Running prestart..."
+python manage.py prestart
 
 echo ""
 echo "=========================================="
@@ -58,10 +35,13 @@ if [ "${USE_RUNSERVER:-false}" = "true" ]; then
     exec python manage.py runserver 0.0.0.0:${PORT:-8000} --noreload
 else
     echo "→ Starting gunicorn"
+    # Threaded workers: a live sales stream (/api/sales/stream/) holds a thread, not a whole worker.
+    # gunicorn.conf.py preloads the app so workers fork with warmed imports.
     exec gunicorn \
         --bind 0.0.0.0:${PORT:-10000} \
         --workers 2 \
-        --worker-class sync \
+        --worker-class gthread \
+        --threads ${GUNICORN_THREADS:-8} \
         --timeout 60 \
         --access-logfile - \
         --error-logfile - \